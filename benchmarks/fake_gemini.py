@@ -0,0 +1,405 @@
+"""Offline stand-in for the Gemini API.
+
+Speaks enough of the Files API (resumable upload, get, list, delete),
+``models.get``, ``generateContent`` and ``streamGenerateContent`` (SSE) for an
+unmodified ``genai.Client`` pointed at it with ``GEMINI_BASE_URL``. Upload
+bandwidth, the ``PROCESSING`` delay, token streaming rate and failures are
+configurable, so the real pipeline can be benchmarked without network access
+or API costs.
+
+    python benchmarks/fake_gemini.py --port 8089 --tokens-per-second 400 --processing-delay 2
+    GEMINI_BASE_URL=http://127.0.0.1:8089 GEMINI_API_KEY=fake python main.py recording.wav
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+API_PATH = re.compile(r"^/(?:upload/)?v1\w*/")
+SENTENCES = [
+    "Let's start with the quarterly numbers.",
+    "I think we should revisit the timeline before committing.",
+    "The migration finished over the weekend without issues.",
+    "Can you share the slides after the call?",
+    "We still need a decision on the vendor contract.",
+    "Customer feedback has been mostly positive this month.",
+    "I'll follow up with the design team tomorrow.",
+    "That sounds reasonable, let's go with option two.",
+]
+
+
+@dataclass
+class FakeGeminiConfig:
+    upload_bandwidth: float = 0.0       # bytes/s per upload, 0 = unlimited
+    processing_delay: float = 0.0       # seconds a file stays PROCESSING
+    tokens_per_second: float = 0.0      # streaming rate, 0 = as fast as possible
+    first_token_delay: float = 0.0      # seconds before the first chunk
+    chunk_tokens: int = 50              # tokens per streamed chunk
+    segments: int = 200                 # transcript segments per response
+    speakers: int = 3
+    error_rate: float = 0.0             # share of generate calls answered with error_status
+    error_status: int = 503
+    upload_error_rate: float = 0.0      # share of upload starts answered with error_status
+    disconnect_rate: float = 0.0        # share of streams cut off halfway
+    seed: int = 0
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _timestamp(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _tokens(text):
+    # Rough token estimate, good enough for usage metadata
+    return max(len(text) // 4, 1)
+
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), config=None):
+        super().__init__(address, FakeGeminiHandler)
+        self.config = config or FakeGeminiConfig()
+        self.random = random.Random(self.config.seed)
+        self.lock = threading.Lock()
+        self.files = {}
+        self.pending_uploads = {}
+        self.stats = {"uploads": 0, "uploaded_bytes": 0, "streams": 0, "generates": 0, "errors": 0, "disconnects": 0}
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        # Serve from a daemon thread; returns self for chaining
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-gemini", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def roll(self, rate):
+        with self.lock:
+            return rate > 0 and self.random.random() < rate
+
+    def count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def file_resource(self, file_id):
+        entry = self.files[file_id]
+        state = "ACTIVE" if time.monotonic() >= entry["ready_at"] else "PROCESSING"
+        return {
+            "name": f"files/{file_id}",
+            "displayName": entry["display_name"],
+            "mimeType": entry["mime_type"],
+            "sizeBytes": str(entry["size"]),
+            "createTime": _timestamp(entry["created"]),
+            "updateTime": _timestamp(entry["created"]),
+            "expirationTime": _timestamp(entry["created"] + timedelta(hours=48)),
+            "uri": f"{self.url}/v1beta/files/{file_id}",
+            "state": state,
+            "source": "UPLOADED",
+        }
+
+    def transcript(self):
+        # Synthetic diarized transcript in the response schema's shape
+        with self.lock:
+            rnd = random.Random(self.random.random())
+        segments = []
+        for i in range(self.config.segments):
+            seconds = i * 7
+            segments.append({
+                "timestamp": f"{seconds // 60:02d}:{seconds % 60:02d}",
+                "speaker": f"Speaker {i % self.config.speakers + 1}",
+                "text": " ".join(rnd.choice(SENTENCES) for _ in range(rnd.randint(1, 3))),
+            })
+        return json.dumps(segments)
+
+    def response_text(self, body):
+        # Shape the answer after the requested response schema
+        config = body.get("generationConfig") or {}
+        schema = config.get("responseSchema") or {}
+        kind = str(schema.get("type", "")).upper()
+        if kind == "ARRAY":
+            return self.transcript()
+        if kind == "OBJECT":
+            result = {}
+            for key, prop in (schema.get("properties") or {}).items():
+                if str(prop.get("type", "")).upper() == "ARRAY":
+                    result[key] = [SENTENCES[i % len(SENTENCES)] for i in range(3)]
+                else:
+                    result[key] = SENTENCES[0]
+            return json.dumps(result)
+        return "## Meeting Overview\n" + " ".join(SENTENCES[:3])
+
+    def prompt_tokens(self, body):
+        # Audio files count roughly 1 token per KB; text parts by length
+        audio = text = 0
+        for content in body.get("contents") or []:
+            for part in content.get("parts") or []:
+                if "fileData" in part:
+                    file_id = part["fileData"].get("fileUri", "").rsplit("/", 1)[-1]
+                    entry = self.files.get(file_id)
+                    audio += entry["size"] // 1000 if entry else 0
+                elif "text" in part:
+                    text += _tokens(part["text"])
+        return audio, text
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeGeminiServer
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output readable
+
+    # --- helpers -------------------------------------------------------
+
+    def _path(self):
+        return urlsplit(self.path).path
+
+    def _read_body(self, bandwidth=0.0):
+        length = int(self.headers.get("Content-Length") or 0)
+        data = bytearray()
+        started = time.monotonic()
+        while len(data) < length:
+            block = self.rfile.read(min(65536, length - len(data)))
+            if not block:
+                break
+            data.extend(block)
+            if bandwidth:
+                # Sleep until the bytes so far fit the configured bandwidth
+                delay = len(data) / bandwidth - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+        return bytes(data)
+
+    def _json_body(self):
+        raw = self._read_body()
+        return json.loads(raw) if raw else {}
+
+    def _send_json(self, payload, status=200, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, message):
+        self.server.count("errors")
+        statuses = {400: "INVALID_ARGUMENT", 404: "NOT_FOUND", 429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}
+        self._send_json({"error": {"code": status, "message": message, "status": statuses.get(status, "UNKNOWN")}}, status)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    # --- routes --------------------------------------------------------
+
+    def do_GET(self):
+        path = API_PATH.sub("/", self._path())
+        if path == "/_stats":
+            with self.server.lock:
+                return self._send_json({**self.server.stats, "config": asdict(self.server.config)})
+        if path == "/files":
+            with self.server.lock:
+                files = [self.server.file_resource(file_id) for file_id in self.server.files]
+            return self._send_json({"files": files} if files else {})
+        match = re.fullmatch(r"/files/([\w-]+)", path)
+        if match:
+            with self.server.lock:
+                if match.group(1) not in self.server.files:
+                    return self._send_error(404, f"File {match.group(1)} not found")
+                return self._send_json(self.server.file_resource(match.group(1)))
+        match = re.fullmatch(r"/models/([\w.\-]+)", path)
+        if match:
+            return self._send_json({
+                "name": f"models/{match.group(1)}",
+                "displayName": match.group(1),
+                "inputTokenLimit": 1048576,
+                "outputTokenLimit": 65536,
+                "supportedActions": ["generateContent", "streamGenerateContent"],
+            })
+        self._send_error(404, f"Unknown path {self.path}")
+
+    def do_DELETE(self):
+        match = re.fullmatch(r"/files/([\w-]+)", API_PATH.sub("/", self._path()))
+        if not match:
+            return self._send_error(404, f"Unknown path {self.path}")
+        with self.server.lock:
+            removed = self.server.files.pop(match.group(1), None)
+        if removed is None:
+            return self._send_error(404, f"File {match.group(1)} not found")
+        self._send_json({})
+
+    def do_POST(self):
+        command = self.headers.get("X-Goog-Upload-Command", "").lower()
+        raw_path = self._path()
+        if raw_path.startswith("/_upload/"):
+            return self._upload_chunk(raw_path.rsplit("/", 1)[-1], command)
+        if "start" in command:
+            return self._upload_start()
+
+        path = API_PATH.sub("/", raw_path)
+        if path.endswith(":streamGenerateContent"):
+            return self._stream_generate()
+        if path.endswith(":generateContent"):
+            return self._generate()
+        self._send_error(404, f"Unknown path {self.path}")
+
+    def _upload_start(self):
+        body = self._json_body()
+        if self.server.roll(self.server.config.upload_error_rate):
+            return self._send_error(self.server.config.error_status, "Injected upload error")
+
+        file_info = body.get("file") or {}
+        file_id = uuid.uuid4().hex[:16]
+        with self.server.lock:
+            self.server.pending_uploads[file_id] = {
+                "display_name": file_info.get("displayName") or file_id,
+                "mime_type": file_info.get("mimeType") or self.headers.get("X-Goog-Upload-Header-Content-Type", "application/octet-stream"),
+                "expected": int(self.headers.get("X-Goog-Upload-Header-Content-Length") or 0),
+                "received": 0,
+            }
+        self._send_json({}, headers={
+            "X-Goog-Upload-URL": f"{self.server.url}/_upload/{file_id}",
+            "X-Goog-Upload-Status": "active",
+        })
+
+    def _upload_chunk(self, file_id, command):
+        data = self._read_body(bandwidth=self.server.config.upload_bandwidth)
+        with self.server.lock:
+            pending = self.server.pending_uploads.get(file_id)
+            if pending is not None:
+                pending["received"] += len(data)
+                self.server.stats["uploaded_bytes"] += len(data)
+        if pending is None:
+            return self._send_error(404, f"Upload {file_id} not found")
+
+        if "finalize" not in command:
+            return self._send_json({}, headers={"X-Goog-Upload-Status": "active"})
+
+        with self.server.lock:
+            pending = self.server.pending_uploads.pop(file_id)
+            self.server.files[file_id] = {
+                "display_name": pending["display_name"],
+                "mime_type": pending["mime_type"],
+                "size": pending["received"],
+                "created": _now(),
+                "ready_at": time.monotonic() + self.server.config.processing_delay,
+            }
+            self.server.stats["uploads"] += 1
+            resource = self.server.file_resource(file_id)
+        self._send_json({"file": resource}, headers={"X-Goog-Upload-Status": "final"})
+
+    def _usage(self, body, text):
+        audio, prompt_text = self.server.prompt_tokens(body)
+        output = _tokens(text)
+        details = [{"modality": "TEXT", "tokenCount": prompt_text}]
+        if audio:
+            details.append({"modality": "AUDIO", "tokenCount": audio})
+        return {
+            "promptTokenCount": audio + prompt_text,
+            "candidatesTokenCount": output,
+            "totalTokenCount": audio + prompt_text + output,
+            "promptTokensDetails": details,
+        }
+
+    def _candidate(self, text, finished):
+        candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+        if finished:
+            candidate["finishReason"] = "STOP"
+        return candidate
+
+    def _generate(self):
+        body = self._json_body()
+        self.server.count("generates")
+        config = self.server.config
+        if self.server.roll(config.error_rate):
+            return self._send_error(config.error_status, "Injected generate error")
+        if config.first_token_delay:
+            time.sleep(config.first_token_delay)
+        text = self.server.response_text(body)
+        if config.tokens_per_second:
+            time.sleep(_tokens(text) / config.tokens_per_second)
+        self._send_json({
+            "candidates": [self._candidate(text, True)],
+            "usageMetadata": self._usage(body, text),
+            "modelVersion": "fake-gemini",
+        })
+
+    def _stream_generate(self):
+        body = self._json_body()
+        self.server.count("streams")
+        config = self.server.config
+        if self.server.roll(config.error_rate):
+            return self._send_error(config.error_status, "Injected stream error")
+        disconnect = self.server.roll(config.disconnect_rate)
+
+        text = self.server.response_text(body)
+        chunk_chars = max(config.chunk_tokens * 4, 1)
+        pieces = [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)] or [""]
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        if config.first_token_delay:
+            time.sleep(config.first_token_delay)
+        for i, piece in enumerate(pieces):
+            if disconnect and i >= len(pieces) // 2:
+                # Drop the connection without the terminating chunk
+                self.server.count("disconnects")
+                self.close_connection = True
+                return
+            last = i == len(pieces) - 1
+            event = {"candidates": [self._candidate(piece, last)], "modelVersion": "fake-gemini"}
+            if last:
+                event["usageMetadata"] = self._usage(body, text)
+            self._write_chunk(f"data: {json.dumps(event)}\r\n\r\n".encode("utf-8"))
+            if config.tokens_per_second and not last:
+                time.sleep(_tokens(piece) / config.tokens_per_second)
+        self._write_chunk(b"")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an offline fake Gemini API server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    defaults = FakeGeminiConfig()
+    for name, value in asdict(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    config = FakeGeminiConfig(**{name: getattr(args, name) for name in asdict(defaults)})
+    server = FakeGeminiServer((args.host, args.port), config)
+    print(f"Fake Gemini listening on {server.url} (GEMINI_BASE_URL={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
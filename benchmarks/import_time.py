@@ -0,0 +1,86 @@
+"""Import-time report for the CLI and web entry points.
+
+Runs each entry module in a fresh interpreter with ``-X importtime`` and
+reports the total import cost and the most expensive top-level packages.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget-ms 800 --top 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+ENTRY_POINTS = {
+    "main.py": "import main",
+    "run.py": "import run",
+}
+
+
+def measure(statement, runs=3):
+    # Best of N runs; returns (total_ms, {top-level package: cumulative_ms})
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, os.path.join(ROOT, "src"), env.get("PYTHONPATH")]))
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", statement],
+            cwd=ROOT, env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"'{statement}' failed:\n{result.stderr[-2000:]}")
+
+        packages = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            fields = line[len("import time:"):].split("|")
+            try:
+                cumulative_us = int(fields[1].strip())
+            except ValueError:
+                continue  # header row
+            name = fields[2]
+            # Top-level imports have no extra indentation after the separator
+            if name.startswith(" ") and not name.startswith("  "):
+                packages[name.strip()] = packages.get(name.strip(), 0) + cumulative_us / 1000
+
+        total = sum(packages.values())
+        if best is None or total < best[0]:
+            best = (total, packages)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import time of the entry points.")
+    parser.add_argument("--top", type=int, default=10, help="Number of packages to list per entry point.")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per entry point; the fastest is reported.")
+    parser.add_argument("--budget-ms", type=float, help="Fail if any entry point exceeds this total.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args()
+
+    report = {}
+    for entry, statement in ENTRY_POINTS.items():
+        total, packages = measure(statement, runs=args.runs)
+        top = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        report[entry] = {"total_ms": round(total, 1), "top": [{"module": m, "cumulative_ms": round(ms, 1)} for m, ms in top]}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for entry, data in report.items():
+            print(f"{entry}: {data['total_ms']:.1f} ms")
+            for item in data["top"]:
+                print(f"  {item['cumulative_ms']:9.1f} ms  {item['module']}")
+
+    if args.budget_ms is not None:
+        over = [entry for entry, data in report.items() if data["total_ms"] > args.budget_ms]
+        if over:
+            print(f"Import-time budget of {args.budget_ms:.0f} ms exceeded by: {', '.join(over)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
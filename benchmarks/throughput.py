@@ -0,0 +1,244 @@
+"""End-to-end throughput of the real pipeline against the fake Gemini server.
+
+Starts ``fake_gemini.py`` in-process, points the service at it with
+``GEMINI_BASE_URL`` and runs jobs through the CLI (one ``main.py`` process per
+job) or the web app (gunicorn, N concurrent uploads to ``/upload``). Reports
+jobs/minute, p50/p95/p99 job latency and peak RSS.
+
+    python benchmarks/throughput.py cli --jobs 8 --concurrency 4
+    python benchmarks/throughput.py web --jobs 20 --concurrency 5 --workers 2 --tokens-per-second 500
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_gemini import FakeGeminiConfig, FakeGeminiServer  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def write_wav(path, seconds, sample_rate=16000):
+    # Silent 16-bit mono WAV; only the size matters to the fake server
+    frames = int(seconds * sample_rate)
+    with open(path, "wb") as f:
+        f.write(b"RIFF" + struct.pack("<I", 36 + frames * 2) + b"WAVE")
+        f.write(b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16))
+        f.write(b"data" + struct.pack("<I", frames * 2))
+        f.write(b"\0" * (frames * 2))
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def base_env(fake_url, workdir):
+    env = dict(os.environ)
+    env.update({
+        "GEMINI_BASE_URL": fake_url,
+        "GEMINI_API_KEY": "fake-key",
+        "OUTPUT_DIR": os.path.join(workdir, "transcripts"),
+        "UPLOAD_FOLDER": os.path.join(workdir, "uploads"),
+        "SUMMARY_PATH": os.path.join(workdir, "summaries"),
+        "AUDIO_STORAGE_ENABLED": "false",
+        "TRANSCRIPT_STORAGE_ENABLED": "false",
+        "SUMMARY_STORAGE_ENABLED": "false",
+        "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.path.join(ROOT, "src"), env.get("PYTHONPATH")])),
+    })
+    return env
+
+
+def run_cli_job(audio_path, env, summary):
+    # One main.py process per job; wait4 gives the child's peak RSS
+    command = [sys.executable, "main.py", audio_path] + (["--summary"] if summary else [])
+    started = time.monotonic()
+    proc = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = proc.stderr.read()
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    elapsed = time.monotonic() - started
+    # The CLI logs failures instead of exiting non-zero
+    ok = proc.returncode == 0 and b"Saved to" in stderr
+    return {"ok": ok, "seconds": elapsed, "rss_kb": rusage.ru_maxrss,
+            "error": None if ok else stderr.decode(errors="replace")[-500:]}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def post_upload(url, audio_path):
+    # multipart/form-data POST of one file, as the browser form does
+    boundary = uuid.uuid4().hex
+    with open(audio_path, "rb") as f:
+        data = f.read()
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{os.path.basename(audio_path)}\"\r\n"
+        f"Content-Type: audio/wav\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    request = urllib.request.Request(url, data=body, method="POST",
+                                     headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    started = time.monotonic()
+    try:
+        with urllib.request.urlopen(request, timeout=900) as response:
+            page = response.read()
+        # The result page links the saved transcript
+        ok = b'href="/download/' in page
+        error = None if ok else "no transcript in response"
+    except urllib.error.HTTPError as e:
+        ok, error = False, f"HTTP {e.code}"
+    except OSError as e:
+        ok, error = False, str(e)
+    return {"ok": ok, "seconds": time.monotonic() - started, "error": error}
+
+
+def process_tree_peak_rss_kb(pid):
+    # Sum of VmHWM over the server and its workers (Linux only)
+    def children(parent):
+        try:
+            with open(f"/proc/{parent}/task/{parent}/children") as f:
+                return [int(p) for p in f.read().split()]
+        except OSError:
+            return []
+
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children(current))
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return total or None
+
+
+def run_web(args, env, audio_paths):
+    port = free_port()
+    env = {**env, "PORT": str(port), "HOST": "127.0.0.1", "GUNICORN_WORKERS": str(args.workers)}
+    command = [sys.executable, "-m", "gunicorn", "--config", "gunicorn_config.py", "run:app"]
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for_port(port):
+            raise RuntimeError("Web app did not start; is gunicorn installed?")
+        url = f"http://127.0.0.1:{port}/upload"
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(lambda path: post_upload(url, path), audio_paths))
+        wall = time.monotonic() - started
+        peak_rss_kb = process_tree_peak_rss_kb(server.pid)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    return results, wall, peak_rss_kb
+
+
+def run_cli(args, env, audio_paths):
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda path: run_cli_job(path, env, args.summary), audio_paths))
+    wall = time.monotonic() - started
+    return results, wall, max((r["rss_kb"] for r in results), default=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end throughput against a fake Gemini server.")
+    parser.add_argument("mode", choices=["cli", "web"], help="Drive the CLI or the web app.")
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=2, help="Gunicorn workers (web mode).")
+    parser.add_argument("--audio-seconds", type=float, default=60, help="Length of each synthetic recording.")
+    parser.add_argument("--summary", action="store_true", help="Also generate a summary per job (CLI mode).")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    defaults = FakeGeminiConfig()
+    fake = parser.add_argument_group("fake server")
+    for name in ("upload_bandwidth", "processing_delay", "tokens_per_second", "first_token_delay",
+                 "segments", "error_rate", "disconnect_rate"):
+        value = getattr(defaults, name)
+        fake.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    config = FakeGeminiConfig(**{name: getattr(args, name) for name in (
+        "upload_bandwidth", "processing_delay", "tokens_per_second", "first_token_delay",
+        "segments", "error_rate", "disconnect_rate")})
+    server = FakeGeminiServer(config=config).start()
+    workdir = tempfile.mkdtemp(prefix="gts-throughput-")
+    try:
+        audio_paths = []
+        for i in range(args.jobs):
+            path = os.path.join(workdir, f"recording_{i}.wav")
+            write_wav(path, args.audio_seconds)
+            audio_paths.append(path)
+
+        env = base_env(server.url, workdir)
+        runner = run_web if args.mode == "web" else run_cli
+        results, wall, peak_rss_kb = runner(args, env, audio_paths)
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies = [r["seconds"] for r in results if r["ok"]]
+    report = {
+        "mode": args.mode,
+        "jobs": args.jobs,
+        "concurrency": args.concurrency,
+        "succeeded": len(latencies),
+        "failed": len(results) - len(latencies),
+        "wall_seconds": round(wall, 3),
+        "jobs_per_minute": round(len(latencies) / wall * 60, 2) if wall else None,
+        "p50_seconds": percentile(latencies, 50),
+        "p95_seconds": percentile(latencies, 95),
+        "p99_seconds": percentile(latencies, 99),
+        "peak_rss_mb": round(peak_rss_kb / 1024, 1) if peak_rss_kb else None,
+        "fake_server": server.stats,
+        "errors": sorted({r["error"] for r in results if r["error"]})[:5],
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{args.mode}: {report['succeeded']}/{args.jobs} jobs in {report['wall_seconds']}s "
+          f"({report['jobs_per_minute']} jobs/min, concurrency {args.concurrency})")
+    for pct in (50, 95, 99):
+        value = report[f"p{pct}_seconds"]
+        print(f"  p{pct}: {value:.3f}s" if value is not None else f"  p{pct}: n/a")
+    print(f"  peak RSS: {report['peak_rss_mb']} MB")
+    for error in report["errors"]:
+        print(f"  error: {error}")
+
+
+if __name__ == "__main__":
+    main()
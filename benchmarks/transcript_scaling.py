@@ -0,0 +1,219 @@
+"""Time and memory scaling of transcript processing on long transcripts.
+
+Generates synthetic diarized transcripts (100k segments is roughly an
+8-hour meeting) and measures, per input size:
+
+- ``process_response``: JSON parse + formatting of the raw model output
+- ``format_transcript``: formatting of already parsed segments
+- ``apply_speaker_mapping``: the speaker rename used by the web app and
+  ``SummaryGenerator`` prompts
+- ``render_upload``: rendering ``index.html`` as ``/upload`` does (needs the
+  web app's dependencies; skipped otherwise)
+
+Wall time is the best of ``--repeat`` runs; peak memory comes from a
+separate ``tracemalloc`` run. Results can be saved as a baseline and later
+runs compared against it.
+
+    python benchmarks/transcript_scaling.py --sizes 1000,10000,100000
+    python benchmarks/transcript_scaling.py --save-baseline baseline.json
+    python benchmarks/transcript_scaling.py --baseline baseline.json --tolerance 0.25
+"""
+import argparse
+import gc
+import json
+import logging
+import math
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
+
+WORDS = (
+    "the project timeline budget customer release migration review design team meeting "
+    "decision vendor contract numbers quarter feedback follow up tomorrow option agree "
+    "question issue deploy test plan risk scope priority sprint roadmap update metrics"
+).split()
+
+
+def synthetic_segments(count, speakers=12, seed=0):
+    # Diarized segments; 12 speakers so "Speaker 1" and "Speaker 10" coexist
+    rnd = random.Random(seed)
+    segments = []
+    seconds = 0
+    for _ in range(count):
+        speaker = f"Speaker {rnd.randint(1, speakers)}"
+        words = [rnd.choice(WORDS) for _ in range(rnd.randint(5, 30))]
+        if rnd.random() < 0.1:
+            # Speakers address each other by label, which the mapping must rename too
+            words.insert(0, f"Speaker {rnd.randint(1, speakers)},")
+        segments.append({
+            "timestamp": f"{seconds // 60:02d}:{seconds % 60:02d}",
+            "speaker": speaker,
+            "text": " ".join(words).capitalize() + ".",
+        })
+        seconds += rnd.randint(0, 1)
+    return segments
+
+
+def speaker_mapping(speakers=12):
+    return {f"Speaker {i}": f"Person {chr(64 + i)}" for i in range(1, speakers + 1)}
+
+
+def build_cases():
+    # name -> (setup(size) -> args, func(*args)); imports are deferred so missing deps only skip a case
+    from gemini_transcription_service.transcript_processor import TranscriptProcessor, apply_speaker_mapping
+
+    processor = TranscriptProcessor()
+    mapping = speaker_mapping()
+    cases = {
+        "process_response": (
+            lambda n: (json.dumps(synthetic_segments(n)),),
+            processor.process_response,
+        ),
+        "format_transcript": (
+            lambda n: (synthetic_segments(n),),
+            processor.format_transcript,
+        ),
+        "apply_speaker_mapping": (
+            lambda n: (processor.format_transcript(synthetic_segments(n)), mapping),
+            apply_speaker_mapping,
+        ),
+    }
+
+    try:
+        from flask import render_template
+        from gemini_transcription_service.webapp.app import app
+    except Exception as e:
+        print(f"Skipping render_upload: {e}", file=sys.stderr)
+    else:
+        def render_upload(transcript):
+            with app.test_request_context("/upload", method="POST"):
+                return render_template("index.html", transcript=transcript,
+                                       download_filename="recording_transcript.txt",
+                                       original_filepath="uploads/recording.wav")
+
+        cases["render_upload"] = (
+            lambda n: (processor.format_transcript(synthetic_segments(n)),),
+            render_upload,
+        )
+    return cases
+
+
+def measure(func, args, repeat):
+    # Best wall time of `repeat` runs, then one traced run for peak memory
+    best = math.inf
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run(sizes, repeat, only=None):
+    results = {}
+    for name, (setup, func) in build_cases().items():
+        if only and name not in only:
+            continue
+        results[name] = {}
+        for size in sizes:
+            seconds, peak = measure(func, setup(size), repeat)
+            results[name][str(size)] = {"seconds": seconds, "peak_bytes": peak}
+    return results
+
+
+def scaling_exponent(entries):
+    # Slope of log(time) over log(size) between the two largest sizes; ~1.0 is linear
+    sizes = sorted(entries, key=int)
+    if len(sizes) < 2:
+        return None
+    small, large = sizes[-2], sizes[-1]
+    t_small, t_large = entries[small]["seconds"], entries[large]["seconds"]
+    if t_small <= 0 or t_large <= 0:
+        return None
+    return math.log(t_large / t_small) / math.log(int(large) / int(small))
+
+
+def compare(results, baseline, tolerance, memory_tolerance, min_seconds=0.01):
+    # Regressions beyond the tolerances, as printable strings; timings below min_seconds are too noisy to judge
+    regressions = []
+    for name, entries in results.items():
+        for size, current in entries.items():
+            previous = baseline.get("results", {}).get(name, {}).get(size)
+            if not previous:
+                continue
+            if current["seconds"] > max(previous["seconds"] * (1 + tolerance), min_seconds):
+                regressions.append(f"{name}[{size}] time {previous['seconds']:.4f}s -> {current['seconds']:.4f}s")
+            if current["peak_bytes"] > previous["peak_bytes"] * (1 + memory_tolerance):
+                regressions.append(f"{name}[{size}] peak {previous['peak_bytes'] / 2**20:.1f}MB -> {current['peak_bytes'] / 2**20:.1f}MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling benchmark for transcript processing.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated segment counts.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case; the fastest is reported.")
+    parser.add_argument("--only", help="Comma-separated case names to run.")
+    parser.add_argument("--save-baseline", help="Write results to this JSON file.")
+    parser.add_argument("--baseline", help="Compare against this JSON file and fail on regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown.")
+    parser.add_argument("--memory-tolerance", type=float, default=0.10, help="Allowed relative peak memory growth.")
+    parser.add_argument("--min-seconds", type=float, default=0.01, help="Ignore slowdowns of cases faster than this.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args()
+
+    # Per-call INFO logs would dominate the output
+    logging.disable(logging.INFO)
+    sizes = [int(size) for size in args.sizes.split(",")]
+    only = set(args.only.split(",")) if args.only else None
+    results = run(sizes, args.repeat, only)
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+        "scaling": {name: scaling_exponent(entries) for name, entries in results.items()},
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for name, entries in results.items():
+            exponent = report["scaling"][name]
+            print(f"{name}" + (f" (scaling exponent {exponent:.2f})" if exponent is not None else ""))
+            for size, entry in entries.items():
+                per_k = entry["seconds"] / int(size) * 1000
+                print(f"  {int(size):>8} segments  {entry['seconds'] * 1000:10.2f} ms  "
+                      f"{per_k * 1000:8.3f} ms/1k  peak {entry['peak_bytes'] / 2**20:8.2f} MB")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.memory_tolerance, args.min_seconds)
+        if regressions:
+            print("Regressions against baseline:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -52,4 +52,109 @@ Feature: CLI Audio Transcription
     Given I have a valid audio file
     When I run the transcription command with the file path
     Then the transcription should be successful
-    And the transcript should be saved to a file
\ No newline at end of file
+    And the transcript should be saved to a file
+  @cli
+  Scenario: Transcription job is traced end to end
+    Given I have a valid audio file
+    And trace export to a local file is enabled
+    When I run the transcription command with the file path
+    Then the trace file should contain "transcript.process" and "transcript.save" spans inside one "transcription.job" span
+
+  @cli
+  Scenario: Watchdog reports a stage that overruns its threshold
+    Given a transcription stream stage has been running longer than its threshold
+    When the watchdog checks running stages
+    Then the stuck stage should be reported with its progress and stack trace
+
+  @cli
+  Scenario: Async jobs share one event loop up to the concurrency limit
+    Given I have 5 valid audio files
+    When I transcribe them with the async service at a concurrency of 2
+    Then every async job should produce a transcript
+    And at most 2 async jobs should have been streaming at once
+    And every file uploaded by the async jobs should have been deleted
+
+  @cli
+  Scenario: Async jobs keep file and database writes off the event loop
+    Given I have 2 valid audio files
+    And the job history is stored in a temporary database
+    And the threads that write job outputs are recorded
+    When I transcribe them with the async service at a concurrency of 2
+    Then every async job should produce a transcript
+    And no job output or job record should have been written on the event loop thread
+
+  @cli
+  Scenario: Async job that exceeds its timeout is stopped and cleaned up
+    Given I have 1 valid audio files
+    When I transcribe them with the async service and a timeout shorter than the stream
+    Then the async job should fail with a transcription timeout
+    And every file uploaded by the async jobs should have been deleted
+
+  @cli
+  Scenario: One service runs concurrent jobs in worker threads
+    Given I have 4 valid audio files
+    When one transcription service runs them in 4 threads at once
+    Then each concurrent job should return the transcript of its own file
+    And all 4 jobs should have been streaming at once
+    And every file uploaded by the concurrent jobs should have been deleted once
+
+  @cli
+  Scenario: One service runs concurrent jobs in gevent greenlets
+    Given I have 4 valid audio files
+    When one transcription service runs them in 4 greenlets at once
+    Then each concurrent job should return the transcript of its own file
+    And all 4 jobs should have been streaming at once
+    And every file uploaded by the concurrent jobs should have been deleted once
+
+  @cli
+  Scenario: Ctrl+C during the transcription stream deletes the upload
+    Given I have 1 valid audio files
+    When I press Ctrl+C while the transcription is streaming
+    Then the job should stop with KeyboardInterrupt
+    And every file uploaded by the concurrent jobs should have been deleted once
+
+  @cli
+  Scenario: Cancelling a job closes a stream that is waiting for its next chunk
+    Given a Gemini stream that sends nothing until it is closed
+    When the job is cancelled while the transcription waits on the stream
+    Then the stream should be closed right away
+    And the transcription should stop with JobCancelledError
+
+  @cli
+  Scenario: Cancelling a job shuts down the connection of a Gemini stream
+    Given a Gemini server that holds its stream open before the first chunk
+    When the job is cancelled while the transcription waits on the server
+    Then the transcription should stop with JobCancelledError
+    And the stream's connection should be shut down right away
+
+  @cli
+  Scenario: A long stream is collected in linear time
+    Given a Gemini stream of 20000 chunks of 300 characters
+    When the transcription reads the whole stream
+    Then it should return all 6000000 characters within 3 seconds
+
+  @cli
+  Scenario: Concurrent jobs for same-named recordings never overwrite each other
+    Given the job history is stored in a temporary database
+    And I have 4 valid audio files named "meeting.wav"
+    When one transcription service runs them in 4 threads at once
+    Then each job should have saved its transcript under its own name
+    And the job history should list 4 completed jobs with their input hashes and transcripts
+
+  @cli
+  Scenario: Orphan sweeper deletes uploads of dead jobs and keeps those of running ones
+    Given the Files API holds uploads of running, crashed and finished jobs
+    When the orphan sweeper runs with 2 deletes at a time
+    Then it should delete the crashed job's upload and the old uploads nobody holds
+    And it should report 13000 reclaimed bytes
+    And no more than 2 deletes should have run at once
+    And only the leases of running jobs should remain
+
+  @cli
+  Scenario: A job leases its upload before Gemini has processed it
+    Given the Files API takes a while to process uploads
+    When I transcribe a recording in the background
+    Then its upload should be leased while Gemini is still processing it
+    When the job is cancelled during the processing wait
+    Then the upload should be deleted and its lease released
+
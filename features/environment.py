@@ -10,9 +10,6 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 # Import mocks
 from features.mocks import (
-    mock_upload_file,
-    mock_delete_uploaded_file,
-    mock_stream_transcription,
     mock_gemini_client,
     mock_summary_generator,
     MOCK_TRANSCRIPT_TEXT,
@@ -45,6 +42,14 @@ def after_all(context):
     if hasattr(context, 'fixtures_path') and os.path.exists(context.fixtures_path):
         shutil.rmtree(context.fixtures_path)
 
+def before_scenario(context, scenario):
+    """Give each scenario its own output directory."""
+    context.output_dir = tempfile.mkdtemp(prefix="scenario-", dir=context.temp_path)
+
+def after_scenario(context, scenario):
+    """Remove the files a scenario wrote (transcripts, usage sidecars)."""
+    shutil.rmtree(context.output_dir, ignore_errors=True)
+
 def before_feature(context, feature):
     """Set up the environment for a specific feature."""
     # Store patchers
@@ -77,26 +82,13 @@ def before_feature(context, feature):
     gcs_client_patcher.start()
     context.patches.append(gcs_client_patcher)
     
-    # Mock storage functions
-    upload_patcher = patch('src.gemini_transcription_service.storage_handler.upload_file', 
-                        side_effect=mock_upload_file)
-    delete_patcher = patch('src.gemini_transcription_service.storage_handler.delete_uploaded_file', 
-                        side_effect=mock_delete_uploaded_file)
-    
     # Mock upload method
     handler_upload_patcher = patch('src.gemini_transcription_service.storage_handler.StorageHandler.upload_file')
     mock_handler_upload = handler_upload_patcher.start()
     mock_handler_upload.return_value = "mock://storage/file.txt"
+    context.patches.append(handler_upload_patcher)
     
-    context.patches.extend([upload_patcher, delete_patcher, handler_upload_patcher])
-    upload_patcher.start()
-    delete_patcher.start()
-    
-    # Mock transcription
-    stream_patcher = patch('src.gemini_transcription_service.transcription_logic.stream_transcription', 
-                         side_effect=mock_stream_transcription)
-    context.patches.append(stream_patcher)
-    stream_patcher.start()
+    # Gemini file uploads and the transcription stream run for real against the mocked client
     
     # Set env vars
     os.environ['GEMINI_API_KEY'] = 'test_api_key'
@@ -36,6 +36,15 @@ Brief discussion about well-being and project planning.
 * Review project progress in the next meeting
 """
 
+# Structured summary
+MOCK_SUMMARY_SECTIONS = {
+    "overview": "Brief discussion about well-being and project planning.",
+    "discussion_points": ["Personal well-being", "Project planning and schedule", "Upcoming meetings"],
+    "decisions": ["Proceed with the project as planned"],
+    "action_items": ["Speaker 2 to work on the project after meetings"],
+    "follow_up": ["Review project progress in the next meeting"]
+}
+
 class MockResponse:
     """Mock response for Gemini transcription."""
     def __init__(self, text=MOCK_TRANSCRIPT_JSON):
@@ -76,9 +85,14 @@ def mock_summary_generator():
     
     # Mock methods
     mock_generator.generate_summary.return_value = MOCK_SUMMARY_TEXT
+    mock_generator.generate_summary_sections.return_value = dict(MOCK_SUMMARY_SECTIONS)
     
     improved_summary = "# Improved " + MOCK_SUMMARY_TEXT
     mock_generator.regenerate_summary.return_value = improved_summary
+    mock_generator.regenerate_summary_section.return_value = {
+        **MOCK_SUMMARY_SECTIONS,
+        "action_items": ["Speaker 2 to finish the project plan by Friday"]
+    }
     
     def mock_save_summary(summary, input_path=None, output_dir=None):
         if not summary:
@@ -131,25 +145,6 @@ def mock_upload_file(client, file_path, store_audio=False):
     
     return mock_file
 
-def mock_delete_uploaded_file(client, file):
-    """Mock the file deletion function."""
-    return True
-
-def mock_stream_transcription(client, model, contents, config, file_path, model_name=None):
-    """Mock the streaming transcription function with both parameter styles."""
-    # Error scenario
-    if getattr(mock_stream_transcription, "return_error", False):
-        return ""
-    
-    # Check file exists
-    if not os.path.exists(file_path) and not file_path.startswith('/nonexistent'):
-        return ""
-    
-    return MOCK_TRANSCRIPT_JSON
-
-# Error flag
-mock_stream_transcription.return_error = False
-
 def mock_summary_response():
     """Create a mock response for summary generation."""
     mock_response = MagicMock()
@@ -193,4 +188,45 @@ def mock_gemini_client():
     
     mock_client.files = mock_files
     
-    return mock_client
\ No newline at end of file
+    return mock_client
+def concurrent_gemini_client(sleep):
+    """Gemini client whose transcripts name their recording; each stream is held open with
+    sleep(0.2) so concurrent jobs overlap. Returns the client and its stream statistics."""
+    import threading
+    from types import SimpleNamespace
+
+    client = MagicMock()
+    lock = threading.Lock()
+    stats = SimpleNamespace(streaming=0, max_streaming=0, uploads=[])
+
+    def upload(file, config):
+        name = os.path.basename(file)
+        uploaded = MagicMock()
+        uploaded.name = f"files/{name}"
+        uploaded.uri = f"mock://{name}"
+        uploaded.mime_type = config["mime_type"]
+        uploaded.state.name = "ACTIVE"
+        with lock:
+            stats.uploads.append(uploaded.name)
+        return uploaded
+
+    def generate_content_stream(model, contents, config):
+        name = contents[0].parts[0].file_data.file_uri.removeprefix("mock://")
+        def chunks():
+            with lock:
+                stats.streaming += 1
+                stats.max_streaming = max(stats.max_streaming, stats.streaming)
+            try:
+                sleep(0.2)
+                chunk = MagicMock()
+                chunk.text = json.dumps([{"timestamp": "00:00", "speaker": "Speaker 1", "text": f"Recording {name}"}])
+                chunk.usage_metadata = None
+                yield chunk
+            finally:
+                with lock:
+                    stats.streaming -= 1
+        return chunks()
+
+    client.files.upload.side_effect = upload
+    client.models.generate_content_stream.side_effect = generate_content_stream
+    return client, stats
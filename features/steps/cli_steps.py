@@ -3,11 +3,12 @@ import tempfile
 from unittest.mock import patch, MagicMock
 from behave import given, when, then
 import sys
+import time
 import logging
 from io import StringIO
 
 # Import mock transcript data
-from features.mocks import MOCK_TRANSCRIPT_TEXT, MOCK_TRANSCRIPT_JSON
+from features.mocks import MOCK_TRANSCRIPT_TEXT, MOCK_TRANSCRIPT_JSON, concurrent_gemini_client
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('cli_test')
@@ -120,7 +121,8 @@ def step_impl(context):
                 context.result = (None, None, None)
                 return
             
-            output_dir = getattr(context, 'custom_output_dir', None)
+            # Never the working directory: the scenario's outputs are removed after it
+            output_dir = getattr(context, 'custom_output_dir', None) or context.output_dir
             
             try:
                 context.result = service.run(context.audio_file_path, output_dir_override=output_dir)
@@ -208,4 +210,607 @@ def step_impl(context):
     error = context.stderr.getvalue() if hasattr(context, 'stderr') else ""
     assert "error" in error.lower() or context.result[0] is None, "Application did not report an error"
     assert context.result is not None, "Application crashed instead of handling the error"
-    logger.info("Verified graceful error handling")
\ No newline at end of file
+    logger.info("Verified graceful error handling")
+@given('trace export to a local file is enabled')
+def step_impl(context):
+    # Spans are appended to a JSONL file for this scenario only
+    context.trace_path = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+    os.environ['TRACE_EXPORT_PATH'] = context.trace_path
+    context.add_cleanup(os.environ.pop, 'TRACE_EXPORT_PATH', None)
+
+@then('the trace file should contain "{first}" and "{second}" spans inside one "{root}" span')
+def step_impl(context, first, second, root):
+    import json
+    with open(context.trace_path) as f:
+        spans = [json.loads(line) for line in f if line.strip()]
+
+    roots = [s for s in spans if s['name'] == root]
+    assert len(roots) == 1, f"Expected one {root} span, got {[s['name'] for s in spans]}"
+    job = roots[0]
+    assert job['parent_id'] is None, "Job span should be the root of the trace"
+    assert job['attributes'].get('file') == os.path.basename(context.audio_file_path)
+
+    for name in (first, second):
+        children = [s for s in spans if s['name'] == name]
+        assert children, f"No {name} span exported"
+        assert all(s['trace_id'] == job['trace_id'] for s in children), f"{name} span is not part of the job trace"
+
+@given('a transcription stream stage has been running longer than its threshold')
+def step_impl(context):
+    from src.gemini_transcription_service import watchdog
+    context.watchdog = watchdog
+    context.stage_cm = watchdog.stage("transcription.stream", file="meeting.wav")
+    context.stage = context.stage_cm.__enter__()
+    context.add_cleanup(context.stage_cm.__exit__, None, None, None)
+    watchdog.progress(context.stage, chunks=42, chars=1234)
+    # Pretend the stage started well before its threshold
+    context.stage.started -= context.stage.threshold + 1
+
+@when('the watchdog checks running stages')
+def step_impl(context):
+    with patch.object(context.watchdog.logger, 'warning') as warning:
+        context.watchdog._check()
+    context.watchdog_messages = [call.args[0] for call in warning.call_args_list]
+
+@then('the stuck stage should be reported with its progress and stack trace')
+def step_impl(context):
+    assert len(context.watchdog_messages) == 1, f"Expected one report, got {context.watchdog_messages}"
+    message = context.watchdog_messages[0]
+    assert "Stage transcription.stream running for" in message, message
+    assert "chunks=42" in message and "chars=1234" in message, message
+    # The stack of the stuck thread, which is this one
+    assert "cli_steps.py" in message, message
+
+def async_gemini_client(context, delay):
+    # Stand-in for genai.Client whose .aio API streams the mock transcript after `delay` seconds
+    from unittest.mock import AsyncMock
+    import asyncio
+
+    client = MagicMock()
+    context.async_uploads = []
+    context.streaming = 0
+    context.max_streaming = 0
+
+    async def upload(file, config):
+        uploaded = MagicMock()
+        uploaded.name = f"files/{len(context.async_uploads)}"
+        uploaded.uri = f"mock://{uploaded.name}"
+        uploaded.mime_type = config["mime_type"]
+        uploaded.state.name = "ACTIVE"
+        context.async_uploads.append(uploaded.name)
+        return uploaded
+
+    async def generate_content_stream(model, contents, config):
+        async def chunks():
+            context.streaming += 1
+            context.max_streaming = max(context.max_streaming, context.streaming)
+            try:
+                await asyncio.sleep(delay)
+                chunk = MagicMock()
+                chunk.text = MOCK_TRANSCRIPT_JSON
+                yield chunk
+            finally:
+                context.streaming -= 1
+        return chunks()
+
+    client.aio.files.upload = AsyncMock(side_effect=upload)
+    client.aio.files.delete = AsyncMock()
+    client.aio.models.generate_content_stream = AsyncMock(side_effect=generate_content_stream)
+    return client
+
+@given('I have {count:d} valid audio files')
+def step_impl(context, count):
+    directory = tempfile.mkdtemp(dir=context.temp_path)
+    context.audio_paths = []
+    for index in range(count):
+        path = os.path.join(directory, f"meeting_{index}.wav")
+        with open(path, 'wb') as f:
+            f.write(b'RIFF\x24\x00\x00\x00WAVEfmt ')
+        context.audio_paths.append(path)
+    context.async_output_dir = os.path.join(directory, "transcripts")
+
+@given('I have {count:d} valid audio files named "{name}"')
+def step_impl(context, count, name):
+    # Same file name in different folders, all transcribed into one output folder
+    directory = tempfile.mkdtemp(dir=context.temp_path)
+    context.audio_paths = []
+    for index in range(count):
+        os.makedirs(os.path.join(directory, str(index)))
+        path = os.path.join(directory, str(index), name)
+        with open(path, 'wb') as f:
+            f.write(b'RIFF\x24\x00\x00\x00WAVEfmt ' + bytes([index]))
+        context.audio_paths.append(path)
+    context.async_output_dir = os.path.join(directory, "transcripts")
+
+@given('the job history is stored in a temporary database')
+def step_impl(context):
+    os.environ['JOB_STORE_ENABLED'] = 'true'
+    os.environ['JOB_STORE_PATH'] = os.path.join(tempfile.mkdtemp(dir=context.temp_path), 'jobs.db')
+    context.add_cleanup(os.environ.pop, 'JOB_STORE_ENABLED', None)
+    context.add_cleanup(os.environ.pop, 'JOB_STORE_PATH', None)
+
+@given('the threads that write job outputs are recorded')
+def step_impl(context):
+    # asyncio.run drives the jobs on this thread, so this is the event loop thread
+    import threading
+    from src.gemini_transcription_service import transcribe, job_store
+    context.loop_thread = threading.current_thread()
+    context.write_threads = []
+    for target, name in ((transcribe, 'save_usage_sidecar'), (transcribe, 'record_usage'), (job_store, 'record_finish')):
+        def record(*args, _original=getattr(target, name), _name=name, **kwargs):
+            context.write_threads.append((_name, threading.current_thread()))
+            return _original(*args, **kwargs)
+        patcher = patch.object(target, name, side_effect=record)
+        patcher.start()
+        context.add_cleanup(patcher.stop)
+
+@when('I transcribe them with the async service at a concurrency of {concurrency:d}')
+def step_impl(context, concurrency):
+    import asyncio
+    from src.gemini_transcription_service.transcribe import AsyncTranscriptionService
+
+    context.async_client = async_gemini_client(context, delay=0.05)
+    service = AsyncTranscriptionService(client=context.async_client)
+    context.async_results = asyncio.run(service.run_many(
+        context.audio_paths, concurrency=concurrency, output_dir_override=context.async_output_dir
+    ))
+
+@when('I transcribe them with the async service and a timeout shorter than the stream')
+def step_impl(context):
+    import asyncio
+    from src.gemini_transcription_service.transcribe import AsyncTranscriptionService
+
+    context.async_client = async_gemini_client(context, delay=5)
+    service = AsyncTranscriptionService(client=context.async_client)
+    context.async_results = asyncio.run(service.run_many(
+        context.audio_paths, output_dir_override=context.async_output_dir, timeout=0.1
+    ))
+
+@then('every async job should produce a transcript')
+def step_impl(context):
+    assert len(context.async_results) == len(context.audio_paths)
+    for path, result in zip(context.audio_paths, context.async_results):
+        assert not isinstance(result, BaseException), f"Job for {path} failed: {result!r}"
+        transcript, output_path, _ = result
+        assert "Speaker 1" in transcript, transcript
+        assert os.path.exists(output_path), f"No transcript file for {path}"
+
+@then('at most {limit:d} async jobs should have been streaming at once')
+def step_impl(context, limit):
+    assert context.max_streaming == limit, f"Expected {limit} concurrent streams, saw {context.max_streaming}"
+
+@then('the async job should fail with a transcription timeout')
+def step_impl(context):
+    from src.gemini_transcription_service.exceptions import TranscriptionTimeoutError
+    [result] = context.async_results
+    assert isinstance(result, TranscriptionTimeoutError), f"Expected a timeout, got {result!r}"
+
+@then('every file uploaded by the async jobs should have been deleted')
+def step_impl(context):
+    deleted = [call.kwargs["name"] for call in context.async_client.aio.files.delete.call_args_list]
+    assert context.async_uploads, "No files were uploaded"
+    assert sorted(deleted) == sorted(context.async_uploads), f"Uploaded {context.async_uploads}, deleted {deleted}"
+
+def run_in_threads(context, count, sleep):
+    from concurrent.futures import ThreadPoolExecutor
+    from src.gemini_transcription_service import jobs
+    from src.gemini_transcription_service.transcribe import TranscriptionService
+
+    client, stats = concurrent_gemini_client(sleep)
+    service = TranscriptionService()
+    with patch('src.gemini_transcription_service.transcribe.get_gemini_client', return_value=client), \
+            ThreadPoolExecutor(max_workers=count) as pool:
+        context.concurrent_results = list(pool.map(
+            lambda path: service.run(path, output_dir_override=context.async_output_dir), context.audio_paths
+        ))
+    context.max_streaming = stats.max_streaming
+    context.concurrent_uploads = stats.uploads
+    context.concurrent_deleted = [call.kwargs["name"] for call in client.files.delete.call_args_list]
+    context.jobs_left = len(jobs.active_jobs())
+
+@when('one transcription service runs them in {count:d} threads at once')
+def step_impl(context, count):
+    import time
+    run_in_threads(context, count, time.sleep)
+
+# Runs in a fresh interpreter patched like a gunicorn gevent worker
+GEVENT_JOBS = """
+from gevent import monkey
+monkey.patch_all()
+
+import sys, json, time
+from unittest.mock import patch
+from gevent.pool import Pool
+from features.mocks import concurrent_gemini_client
+from src.gemini_transcription_service import jobs
+from src.gemini_transcription_service.transcribe import TranscriptionService
+
+paths, output_dir, count = json.loads(sys.argv[1]), sys.argv[2], int(sys.argv[3])
+client, stats = concurrent_gemini_client(time.sleep)
+service = TranscriptionService()
+with patch('src.gemini_transcription_service.transcribe.get_gemini_client', return_value=client):
+    results = list(Pool(count).imap(lambda path: service.run(path, output_dir_override=output_dir), paths))
+print(json.dumps({
+    "results": results,
+    "max_streaming": stats.max_streaming,
+    "uploads": stats.uploads,
+    "deleted": [call.kwargs["name"] for call in client.files.delete.call_args_list],
+    "jobs_left": len(jobs.active_jobs()),
+}))
+"""
+
+@when('one transcription service runs them in {count:d} greenlets at once')
+def step_impl(context, count):
+    import json
+    import subprocess
+    try:
+        import gevent  # noqa: F401
+    except ImportError:
+        context.scenario.skip("gevent is not installed")
+        return
+
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.join(root, "src"), root]))
+    process = subprocess.run(
+        [sys.executable, "-c", GEVENT_JOBS, json.dumps(context.audio_paths), context.async_output_dir, str(count)],
+        cwd=root, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert process.returncode == 0, process.stderr[-2000:]
+    outcome = json.loads(process.stdout.strip().splitlines()[-1])
+    context.concurrent_results = outcome["results"]
+    context.max_streaming = outcome["max_streaming"]
+    context.concurrent_uploads = outcome["uploads"]
+    context.concurrent_deleted = outcome["deleted"]
+    context.jobs_left = outcome["jobs_left"]
+
+@then('each concurrent job should return the transcript of its own file')
+def step_impl(context):
+    for path, (transcript, output_path, _) in zip(context.audio_paths, context.concurrent_results):
+        name = os.path.basename(path)
+        assert transcript and f"Recording {name}" in transcript, f"Job for {name} returned: {transcript}"
+        with open(output_path) as f:
+            assert f"Recording {name}" in f.read(), f"Transcript file {output_path} is not for {name}"
+
+@then('each job should have saved its transcript under its own name')
+def step_impl(context):
+    paths = [output_path for _, output_path, _ in context.concurrent_results]
+    assert len(set(paths)) == len(paths), f"Jobs shared transcript files: {paths}"
+    saved = sorted(name for name in os.listdir(context.async_output_dir) if name.endswith('.txt'))
+    assert saved == sorted(os.path.basename(path) for path in paths), f"Saved {saved}, returned {paths}"
+    leftovers = [name for name in os.listdir(context.async_output_dir) if name.endswith('.tmp')]
+    assert not leftovers, f"Temporary files left behind: {leftovers}"
+
+@then('the job history should list {count:d} completed jobs with their input hashes and transcripts')
+def step_impl(context, count):
+    from src.gemini_transcription_service import job_store
+    from src.gemini_transcription_service.job_store import file_sha256
+    history = job_store.get_store().list()
+    assert len(history) == count, f"Expected {count} jobs, found {len(history)}"
+    assert all(job['status'] == 'completed' for job in history), [job['status'] for job in history]
+    assert sorted(job['input_sha256'] for job in history) == sorted(file_sha256(path) for path in context.audio_paths)
+    assert sorted(job['transcript_path'] for job in history) == sorted(path for _, path, _ in context.concurrent_results)
+    for job in history:
+        assert job['stages'].get('transcription.stream', 0) >= 0.2, f"Stream timing missing: {job['stages']}"
+
+@then('all {count:d} jobs should have been streaming at once')
+def step_impl(context, count):
+    assert context.max_streaming == count, f"Expected {count} concurrent streams, saw {context.max_streaming}"
+
+@then('every file uploaded by the concurrent jobs should have been deleted once')
+def step_impl(context):
+    deleted = context.concurrent_deleted
+    assert sorted(deleted) == sorted(context.concurrent_uploads), f"Uploaded {context.concurrent_uploads}, deleted {deleted}"
+    assert len(deleted) == len(context.audio_paths)
+    assert context.jobs_left == 0, f"{context.jobs_left} jobs left registered"
+
+@when('I press Ctrl+C while the transcription is streaming')
+def step_impl(context):
+    import _thread
+    import threading
+    from src.gemini_transcription_service import jobs
+    from src.gemini_transcription_service.transcribe import TranscriptionService
+
+    # A stream that would take 50 s; SIGINT arrives in the main thread after 0.3 s
+    client, stats = concurrent_gemini_client(lambda seconds: time.sleep(50))
+    timer = threading.Timer(0.3, _thread.interrupt_main)
+    started = time.monotonic()
+    timer.start()
+    context.interrupted = False
+    try:
+        with patch('src.gemini_transcription_service.transcribe.get_gemini_client', return_value=client):
+            TranscriptionService().run(context.audio_paths[0], output_dir_override=context.async_output_dir)
+    except KeyboardInterrupt:
+        context.interrupted = True
+    finally:
+        timer.cancel()
+    context.interrupt_seconds = time.monotonic() - started
+    context.concurrent_uploads = stats.uploads
+    context.concurrent_deleted = [call.kwargs["name"] for call in client.files.delete.call_args_list]
+    context.jobs_left = len(jobs.active_jobs())
+
+@then('the job should stop with KeyboardInterrupt')
+def step_impl(context):
+    assert context.interrupted, "run() did not raise KeyboardInterrupt"
+    assert context.interrupt_seconds < 5, f"Job took {context.interrupt_seconds:.1f}s to stop"
+
+@given('the Files API holds uploads of running, crashed and finished jobs')
+def step_impl(context):
+    import json
+    import threading
+    from datetime import datetime, timedelta, timezone
+    from src.gemini_transcription_service import jobs
+
+    control_dir = tempfile.mkdtemp(dir=context.temp_path)
+    os.environ['JOB_CONTROL_DIR'] = control_dir
+    context.add_cleanup(os.environ.pop, 'JOB_CONTROL_DIR', None)
+    now = datetime.now(timezone.utc)
+
+    def stored(name, minutes, mime_type='audio/wav', size=1000):
+        file = MagicMock()
+        file.name = name
+        file.mime_type = mime_type
+        file.size_bytes = size
+        file.create_time = now - timedelta(minutes=minutes)
+        return file
+
+    context.stored_files = [
+        stored('files/running-here', 120),
+        stored('files/running-elsewhere', 120),
+        stored('files/crashed', 2, size=5000),
+        stored('files/young', 5),
+        stored('files/document', 600, mime_type='application/pdf'),
+    ] + [stored(f'files/old-{index}', 180 + index, size=2000) for index in range(4)]
+
+    # A job running in this process, and one in another worker of which only the locked lease is visible
+    context.running_job = jobs.register('meeting.wav')
+    jobs.attach_upload(context.running_job, context.stored_files[0])
+    context.add_cleanup(jobs.unregister, context.running_job)
+    context.other_job = jobs.register('other.wav')
+    jobs.attach_upload(context.other_job, context.stored_files[1])
+    with jobs._lock:
+        jobs._jobs.pop(context.other_job.id)
+    context.add_cleanup(jobs.unregister, context.other_job)
+    # A worker killed mid-job: its lease is still there, but nobody holds the lock
+    with open(os.path.join(control_dir, 'ffffffffffffffffffffffffffffffff.lease'), 'w') as f:
+        json.dump({'file': 'files/crashed', 'pid': 999999, 'started': 0}, f)
+
+    client = MagicMock()
+    client.files.list.return_value = iter(context.stored_files)
+    lock = threading.Lock()
+    context.deletes = {'active': 0, 'max': 0, 'names': []}
+
+    def delete(name):
+        with lock:
+            context.deletes['active'] += 1
+            context.deletes['max'] = max(context.deletes['max'], context.deletes['active'])
+            context.deletes['names'].append(name)
+        time.sleep(0.1)
+        with lock:
+            context.deletes['active'] -= 1
+
+    client.files.delete.side_effect = delete
+    context.sweep_client = client
+
+@when('the orphan sweeper runs with {concurrency:d} deletes at a time')
+def step_impl(context, concurrency):
+    from src.gemini_transcription_service import orphan_sweeper
+    context.sweep = orphan_sweeper.sweep(client=context.sweep_client, min_age=3600, concurrency=concurrency)
+
+@then('it should delete the crashed job\'s upload and the old uploads nobody holds')
+def step_impl(context):
+    expected = ['files/crashed'] + [f'files/old-{index}' for index in range(4)]
+    assert sorted(context.deletes['names']) == sorted(expected), context.deletes['names']
+    assert context.sweep['files'] == 5 and context.sweep['failed'] == 0, context.sweep
+    assert context.sweep['in_flight'] == 2, context.sweep
+
+@then('it should report {size:d} reclaimed bytes')
+def step_impl(context, size):
+    assert context.sweep['bytes'] == size, context.sweep
+
+@then('no more than {concurrency:d} deletes should have run at once')
+def step_impl(context, concurrency):
+    assert context.deletes['max'] == concurrency, f"Up to {context.deletes['max']} deletes at once"
+
+@then('only the leases of running jobs should remain')
+def step_impl(context):
+    left = sorted(name for name in os.listdir(os.environ['JOB_CONTROL_DIR']) if name.endswith('.lease'))
+    assert left == sorted(f'{job.id}.lease' for job in (context.running_job, context.other_job)), left
+
+@then('no job output or job record should have been written on the event loop thread')
+def step_impl(context):
+    names = {name for name, _ in context.write_threads}
+    assert names == {'save_usage_sidecar', 'record_usage', 'record_finish'}, f"Writes not seen: {names}"
+    on_loop = [name for name, thread in context.write_threads if thread is context.loop_thread]
+    assert not on_loop, f"Written on the event loop thread: {on_loop}"
+
+@given('a Gemini stream that sends nothing until it is closed')
+def step_impl(context):
+    # Stands in for an HTTP response waiting on a slow model: only close() ends the wait
+    import threading
+
+    class SilentStream:
+        def __init__(self):
+            self.closed = threading.Event()
+
+        def __iter__(self):
+            return self
+
+        def __next__(self):
+            self.closed.wait(30)
+            raise StopIteration
+
+        def close(self):
+            self.closed.set()
+
+    context.silent_stream = SilentStream()
+    context.silent_client = MagicMock()
+    context.silent_client.models.generate_content_stream.return_value = context.silent_stream
+
+@when('the job is cancelled while the transcription waits on the stream')
+def step_impl(context):
+    import threading
+    from src.gemini_transcription_service.jobs import CancelToken
+    from src.gemini_transcription_service.transcription_logic import stream_transcription
+
+    token = CancelToken()
+    context.stream_error = None
+
+    def transcribe():
+        try:
+            stream_transcription(context.silent_client, "gemini-2.5-flash", [], None, "meeting.wav", cancel=token)
+        except BaseException as e:
+            context.stream_error = e
+
+    worker = threading.Thread(target=transcribe)
+    worker.start()
+    time.sleep(0.2)
+    started = time.monotonic()
+    token.cancel("request")
+    context.close_seconds = time.monotonic() - started if context.silent_stream.closed.wait(5) else None
+    worker.join(5)
+
+@then('the stream should be closed right away')
+def step_impl(context):
+    assert context.close_seconds is not None, "Stream was never closed"
+    assert context.close_seconds < 0.1, f"Stream closed after {context.close_seconds:.2f}s"
+
+@then('the transcription should stop with JobCancelledError')
+def step_impl(context):
+    from src.gemini_transcription_service.exceptions import JobCancelledError
+    assert isinstance(context.stream_error, JobCancelledError), f"Unexpected result: {context.stream_error!r}"
+
+@given('a Gemini server that holds its stream open before the first chunk')
+def step_impl(context):
+    # An unmodified genai.Client streaming over HTTP: its generator blocks reading the socket
+    from google.genai.client import Client
+    from benchmarks.fake_gemini import FakeGeminiServer, FakeGeminiConfig
+    from src.gemini_transcription_service import clients
+
+    context.fake_gemini = FakeGeminiServer(config=FakeGeminiConfig(first_token_delay=30)).start()
+    context.add_cleanup(context.fake_gemini.stop)
+    with patch('google.genai.Client', Client):
+        context.stream_client = clients._new_gemini_client('fake-key', None, context.fake_gemini.url)
+
+@when('the job is cancelled while the transcription waits on the server')
+def step_impl(context):
+    import threading
+    from src.gemini_transcription_service.jobs import CancelToken
+    from src.gemini_transcription_service.transcription_logic import stream_transcription
+
+    token = CancelToken()
+    context.stream_error = None
+
+    def transcribe():
+        try:
+            stream_transcription(context.stream_client, "gemini-2.5-flash", "Transcribe", None, "meeting.wav", cancel=token)
+        except BaseException as e:
+            context.stream_error = e
+
+    before = set(threading.enumerate())
+    worker = threading.Thread(target=transcribe, daemon=True)
+    worker.start()
+    deadline = time.monotonic() + 5
+    while not context.fake_gemini.stats['streams'] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.2)
+    context.pumps = [thread for thread in threading.enumerate()
+                     if thread.name == 'transcription-stream' and thread not in before]
+    assert context.pumps, "The stream was not read on a helper thread"
+    started = time.monotonic()
+    token.cancel("request")
+    worker.join(5)
+    for pump in context.pumps:
+        pump.join(5)
+    context.close_seconds = time.monotonic() - started
+
+@then('the stream\'s connection should be shut down right away')
+def step_impl(context):
+    stuck = [pump for pump in context.pumps if pump.is_alive()]
+    assert not stuck, "The helper thread is still blocked reading the stream"
+    assert context.close_seconds < 1, f"Stream closed after {context.close_seconds:.2f}s"
+
+@given('a Gemini stream of {count:d} chunks of {size:d} characters')
+def step_impl(context, count, size):
+    from types import SimpleNamespace
+    context.long_stream = [SimpleNamespace(text=f"{index % 10}" * size, usage_metadata=None) for index in range(count)]
+    context.long_client = MagicMock()
+    context.long_client.models.generate_content_stream.return_value = iter(context.long_stream)
+
+@when('the transcription reads the whole stream')
+def step_impl(context):
+    from src.gemini_transcription_service.transcription_logic import stream_transcription
+    started = time.monotonic()
+    context.long_output = stream_transcription(context.long_client, "gemini-2.5-flash", [], None, "meeting.wav")
+    context.stream_seconds = time.monotonic() - started
+
+@then('it should return all {chars:d} characters within {limit:d} seconds')
+def step_impl(context, chars, limit):
+    assert len(context.long_output) == chars, f"Got {len(context.long_output)} characters"
+    assert context.long_output == "".join(chunk.text for chunk in context.long_stream)
+    assert context.stream_seconds < limit, f"Stream took {context.stream_seconds:.2f}s"
+
+@given('the Files API takes a while to process uploads')
+def step_impl(context):
+    control_dir = tempfile.mkdtemp(dir=context.temp_path)
+    os.environ['JOB_CONTROL_DIR'] = control_dir
+    context.add_cleanup(os.environ.pop, 'JOB_CONTROL_DIR', None)
+    uploaded = MagicMock()
+    uploaded.name = 'files/slow-processing'
+    uploaded.state.name = 'PROCESSING'
+    context.processing_client = MagicMock()
+    context.processing_client.files.upload.return_value = uploaded
+    context.processing_client.files.get.return_value = uploaded
+    patcher = patch('src.gemini_transcription_service.transcribe.get_gemini_client', return_value=context.processing_client)
+    patcher.start()
+    context.add_cleanup(patcher.stop)
+
+@when('I transcribe a recording in the background')
+def step_impl(context):
+    import threading
+    from src.gemini_transcription_service import jobs
+    from src.gemini_transcription_service.transcribe import TranscriptionService
+
+    audio_path = os.path.join(tempfile.mkdtemp(dir=context.temp_path), 'slow.wav')
+    with open(audio_path, 'wb') as f:
+        f.write(b'RIFF\x24\x00\x00\x00WAVEfmt ')
+    context.processing_token = jobs.CancelToken()
+    context.processing_error = None
+
+    def run():
+        try:
+            TranscriptionService().run(audio_path, output_dir_override=context.output_dir, cancel=context.processing_token)
+        except BaseException as e:
+            context.processing_error = e
+
+    context.processing_job = threading.Thread(target=run, daemon=True)
+    context.processing_job.start()
+    # A failed scenario must not leave the job polling forever
+    context.add_cleanup(context.processing_token.cancel, "test ended")
+
+@then('its upload should be leased while Gemini is still processing it')
+def step_impl(context):
+    from src.gemini_transcription_service import jobs
+    deadline = time.monotonic() + 2
+    while time.monotonic() < deadline:
+        alive, _ = jobs.leased_files(remove_stale=False)
+        if 'files/slow-processing' in alive:
+            break
+        time.sleep(0.02)
+    else:
+        raise AssertionError("Upload not leased during the processing wait")
+    context.processing_client.files.delete.assert_not_called()
+
+@when('the job is cancelled during the processing wait')
+def step_impl(context):
+    context.processing_token.cancel("request")
+    context.processing_job.join(5)
+
+@then('the upload should be deleted and its lease released')
+def step_impl(context):
+    from src.gemini_transcription_service import jobs
+    from src.gemini_transcription_service.exceptions import JobCancelledError
+    assert isinstance(context.processing_error, JobCancelledError), f"Unexpected result: {context.processing_error!r}"
+    deleted = [call.kwargs['name'] for call in context.processing_client.files.delete.call_args_list]
+    assert 'files/slow-processing' in deleted, f"Upload not deleted: {deleted}"
+    alive, stale = jobs.leased_files(remove_stale=False)
+    assert not alive and not stale, f"Leases left: {alive | stale}"
@@ -1,6 +1,8 @@
 from behave import given, when, then
 import os
+import json
 import tempfile
+from unittest.mock import patch, MagicMock
 
 class MockSummarizationService:
     def __init__(self, available=True):
@@ -22,6 +24,15 @@ class MockSummarizationService:
     def set_error_mode(self, error_mode):
         self.error_mode = error_mode
 
+def web_client(context):
+    # Flask test client; summary scenarios can run before any web feature created one
+    if not hasattr(context, 'client'):
+        from src.gemini_transcription_service.webapp.app import app
+        app.config['TESTING'] = True
+        app.config['UPLOAD_FOLDER'] = context.temp_path
+        context.client = app.test_client()
+    return context.client
+
 @given('I have a valid transcript file')
 def step_impl_valid_transcript_file(context):
     # Create temp dir and file with valid content
@@ -128,8 +139,114 @@ def step_impl_receive_service_failure_error(context):
     assert hasattr(context, 'error_message') and context.error_message is not None, "No error message was captured for service failure"
     assert "Summarization service unavailable" in context.error_message or "Simulated service error" in context.error_message
 
+@when('I request a streamed summary from the web app')
+def step_impl_request_streamed_summary(context):
+    # Stream from the endpoint with a generator that yields in pieces
+    with open(context.transcript_file_path, "r") as f:
+        transcript_text = f.read()
+
+    mock_generator = MagicMock()
+    mock_generator.generate_summary_stream.return_value = iter(["# Meeting Overview\n", "Short ", "discussion."])
+    mock_generator.save_summary_to_file.return_value = os.path.join(context.temp_dir, "valid_summary.txt")
+
+    with patch('src.gemini_transcription_service.webapp.app.SummaryGenerator', return_value=mock_generator):
+        response = web_client(context).post('/generate-summary/stream', json={'transcript': transcript_text})
+        context.stream_status = response.status_code
+        context.stream_events = [json.loads(line) for line in response.data.decode('utf-8').splitlines() if line.strip()]
+
+@then('I should receive summary chunks before the final download link')
+def step_impl_receive_summary_chunks(context):
+    # Verify event order and the assembled summary
+    assert context.stream_status == 200, f"Unexpected status: {context.stream_status}"
+    types = [event['type'] for event in context.stream_events]
+    assert types == ['chunk', 'chunk', 'chunk', 'done'], f"Unexpected events: {types}"
+    assert context.stream_events[-1]['summary'] == "## Meeting Overview\nShort discussion."
+    assert context.stream_events[-1]['download_filename'] == "valid_summary.txt"
+
+@then('the streamed summary should have the same sections as a structured one')
+def step_impl_streamed_sections(context):
+    # The done event carries the sections the blocking endpoints return
+    from src.gemini_transcription_service.summary_generator import format_summary
+    done = context.stream_events[-1]
+    assert done['sections'] == {'overview': 'Short discussion.'}, f"Unexpected sections: {done['sections']}"
+    assert done['summary'] == format_summary(done['sections'])
+
+@when('I build the streaming summary prompts')
+def step_impl_build_stream_prompts(context):
+    from src.gemini_transcription_service.summary_generator import SummaryGenerator
+    with open(context.transcript_file_path, "r") as f:
+        transcript_text = f.read()
+    generator = SummaryGenerator(client=MagicMock())
+    context.prompts = [
+        generator._summary_prompt(transcript_text),
+        generator._regenerate_prompt(transcript_text, "## Meeting Overview\nOld.", "Shorter"),
+    ]
+
+@then('every prompt should ask for each summary section heading')
+def step_impl_prompts_have_headings(context):
+    from src.gemini_transcription_service.summary_generator import SUMMARY_SECTIONS
+    for prompt in context.prompts:
+        for heading, _ in SUMMARY_SECTIONS.values():
+            assert f"## {heading}" in prompt, f"Prompt is missing {heading}"
+
+@when('I request regeneration of the "{section}" section from the web app')
+def step_impl_request_section_regeneration(context, section):
+    # Post feedback for one section against the mocked generator
+    from features.mocks import mock_summary_generator, MOCK_SUMMARY_TEXT
+    with open(context.transcript_file_path, "r") as f:
+        transcript_text = f.read()
+
+    context.mock_generator = mock_summary_generator()
+    with patch('src.gemini_transcription_service.webapp.app.SummaryGenerator', return_value=context.mock_generator):
+        response = web_client(context).post('/regenerate-summary', json={
+            'original_transcript': transcript_text,
+            'previous_summary': MOCK_SUMMARY_TEXT,
+            'feedback': 'Add a deadline',
+            'section': section,
+            'input_path': context.transcript_file_path
+        })
+    context.regenerate_status = response.status_code
+    context.regenerate_data = response.get_json()
+
+@then('only the "{section}" section should change')
+def step_impl_only_section_changed(context, section):
+    # The generator was asked for one section and the rest is untouched
+    from features.mocks import MOCK_SUMMARY_SECTIONS
+    assert context.regenerate_status == 200, f"Unexpected status: {context.regenerate_status}"
+    assert context.regenerate_data['success'], context.regenerate_data
+    assert context.mock_generator.regenerate_summary_section.call_args.kwargs['section'] == section
+    context.mock_generator.regenerate_summary.assert_not_called()
+
+    sections = context.regenerate_data['sections']
+    for key, value in MOCK_SUMMARY_SECTIONS.items():
+        if key == section:
+            assert sections[key] != value, f"Section {key} was not regenerated"
+        else:
+            assert sections[key] == value, f"Section {key} changed unexpectedly"
+    assert "by Friday" in context.regenerate_data['summary']
+
 def after_scenario(context, scenario):
     # Cleanup temp files
     if hasattr(context, 'temp_dir') and os.path.exists(context.temp_dir):
         import shutil
-        shutil.rmtree(context.temp_dir) 
\ No newline at end of file
+        shutil.rmtree(context.temp_dir) 
+@when('I request regeneration of the "{section}" section with a list as the overview')
+def step_impl_request_invalid_sections(context, section):
+    from features.mocks import mock_summary_generator, MOCK_SUMMARY_TEXT
+    context.mock_generator = mock_summary_generator()
+    with patch('src.gemini_transcription_service.webapp.app.SummaryGenerator', return_value=context.mock_generator):
+        response = web_client(context).post('/regenerate-summary', json={
+            'original_transcript': "[Speaker 1 00:01]: Hello.",
+            'previous_summary': MOCK_SUMMARY_TEXT,
+            'sections': {'overview': ['a']},
+            'feedback': 'Shorter',
+            'section': section,
+        })
+    context.regenerate_status = response.status_code
+    context.regenerate_data = response.get_json()
+
+@then('the regeneration should be rejected with invalid summary sections')
+def step_impl_invalid_sections_rejected(context):
+    assert context.regenerate_status == 400, f"Unexpected status: {context.regenerate_status}"
+    assert context.regenerate_data['error'] == 'Invalid summary sections'
+    context.mock_generator.regenerate_summary_section.assert_not_called()
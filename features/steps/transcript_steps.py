@@ -3,7 +3,10 @@ import re
 import os
 import tempfile
 from behave import given, when, then
-from src.gemini_transcription_service.transcript_processor import TranscriptProcessor
+from unittest.mock import MagicMock
+from src.gemini_transcription_service.transcript_processor import TranscriptProcessor, apply_speaker_mapping
+from src.gemini_transcription_service.transcription_logic import stream_transcription
+from src.gemini_transcription_service.usage import UsageRecord
 
 @given('I have a structured JSON transcript from Gemini')
 def step_impl(context):
@@ -157,3 +160,115 @@ def step_impl(context):
         content = f.read()
     
     assert content.strip() == context.formatted_transcript.strip(), "File content doesn't match expected transcript"
+
+
+@given('I have a formatted transcript with ten or more speakers')
+def step_impl(context):
+    # "Speaker 1" is a prefix of "Speaker 10" and "Speaker 11"
+    context.formatted_transcript = """[Speaker 1 00:05]: Welcome everyone.
+[Speaker 10 00:12]: Thanks, Speaker 1.
+[Speaker 11 00:18]: Speaker 10 and I agree.
+[Speaker 1 00:25]: Great."""
+
+@when('I apply a speaker mapping for "{speaker_id}"')
+def step_impl(context, speaker_id):
+    # Map a single speaker to a real name
+    context.processed_result = apply_speaker_mapping(context.formatted_transcript, {speaker_id: "Alice"})
+
+@when('I apply a speaker mapping that maps "{numbered}" to a number and "{speaker_id}" to "{name}"')
+def step_impl(context, numbered, speaker_id, name):
+    # As decoded from JSON such as {"Speaker 10": 5}
+    context.processed_result = apply_speaker_mapping(context.formatted_transcript, {numbered: 5, speaker_id: name, 7: "Bob"})
+
+@then('"{numbered}" should keep its label and "{speaker_id}" should read "{name}"')
+def step_impl(context, numbered, speaker_id, name):
+    lines = context.processed_result.split('\n')
+    assert lines[0] == f"[{name} 00:05]: Welcome everyone.", f"Unexpected line: {lines[0]}"
+    assert lines[1] == f"[{numbered} 00:12]: Thanks, {speaker_id}.", f"Unexpected line: {lines[1]}"
+
+@then('only "{speaker_id}" should be renamed')
+def step_impl(context, speaker_id):
+    # Only the labels are renamed; mentions in the text are what was said
+    lines = context.processed_result.split('\n')
+    assert lines[0] == "[Alice 00:05]: Welcome everyone.", f"Unexpected line: {lines[0]}"
+    assert lines[1] == "[Speaker 10 00:12]: Thanks, Speaker 1.", f"Unexpected line: {lines[1]}"
+    assert lines[2] == "[Speaker 11 00:18]: Speaker 10 and I agree.", f"Unexpected line: {lines[2]}"
+    assert lines[3] == "[Alice 00:25]: Great.", f"Unexpected line: {lines[3]}"
+
+
+@given('I have a formatted transcript whose text mentions the speaker IDs')
+def step_impl(context):
+    context.formatted_transcript = """[A 00:01]: I met Tom and A friend.
+[Tom]: Hello [A 00:02]: there.
+and A few more
+Notes taken by Tom"""
+
+@when('I apply a speaker mapping of "A" to "Alice" and "Tom" to "Thomas"')
+def step_impl(context):
+    context.processed_result = apply_speaker_mapping(context.formatted_transcript, {'A': 'Alice', 'Tom': 'Thomas'})
+
+@then('only the speaker headers should be renamed')
+def step_impl(context):
+    assert context.processed_result == """[Alice 00:01]: I met Tom and A friend.
+[Thomas]: Hello [A 00:02]: there.
+and A few more
+Notes taken by Tom""", f"Unexpected transcript: {context.processed_result}"
+
+
+@given('I have a formatted transcript with a missing and a fractional timestamp')
+def step_impl(context):
+    # The last turn has a continuation line, which belongs to it
+    context.formatted_transcript = """[Speaker 1 00:01]: hi
+[Speaker 2 ]: there
+[Speaker 3 00:02.5]: x
+[Speaker 1 1:02:03]: back again,
+and more"""
+
+@when('I split the transcript into segments')
+def step_impl(context):
+    from src.gemini_transcription_service.transcript_processor import parse_transcript
+    context.segments = parse_transcript(context.formatted_transcript)
+
+@then('I should get these segments')
+def step_impl(context):
+    expected = [{'speaker': row['speaker'], 'timestamp': row['timestamp'], 'text': row['text']} for row in context.table]
+    actual = [dict(segment, text=segment['text'].replace('\n', ' ')) for segment in context.segments]
+    assert actual == expected, f"Unexpected segments: {context.segments}"
+
+
+@given('a transcription stream whose last chunk reports {prompt:d} prompt tokens including {audio:d} audio tokens and {output:d} output tokens')
+def step_impl(context, prompt, audio, output):
+    # Counts are cumulative; only the last chunk's usage should be used
+    first = MagicMock(text='[{"speaker": "Speaker 1", ', usage_metadata=None)
+    last = MagicMock(text='"text": "Hello."}]')
+    last.usage_metadata = MagicMock(
+        prompt_token_count=prompt,
+        cached_content_token_count=None,
+        candidates_token_count=output,
+        thoughts_token_count=None,
+        total_token_count=prompt + output,
+        prompt_tokens_details=[
+            MagicMock(modality="AUDIO", token_count=audio),
+            MagicMock(modality="TEXT", token_count=prompt - audio),
+        ],
+    )
+    context.client = MagicMock()
+    context.client.models.generate_content_stream.return_value = iter([first, last])
+
+@when('I stream the transcription with usage accounting for model "{model}"')
+def step_impl(context, model):
+    context.usage = UsageRecord()
+    context.processed_result = stream_transcription(
+        client=context.client, model=model, contents=[], config=None, file_path="meeting.wav", usage=context.usage
+    )
+
+@then('the usage record should contain {prompt:d} prompt, {audio:d} audio and {output:d} output tokens')
+def step_impl(context, prompt, audio, output):
+    usage = context.usage
+    assert usage.calls == 1, f"Expected one call, got {usage.calls}"
+    assert (usage.prompt_tokens, usage.audio_tokens, usage.output_tokens) == (prompt, audio, output), f"Unexpected usage: {usage}"
+
+@then('the estimated cost should be {cost:f} USD')
+def step_impl(context, cost):
+    # Uses the default price table
+    assert abs(context.usage.cost() - cost) < 1e-9, f"Expected {cost}, got {context.usage.cost()}"
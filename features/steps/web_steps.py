@@ -409,4 +409,978 @@ def step_impl(context):
     content = context.response.data.decode('utf-8')
     assert 'form' in content.lower(), "Form not found for retry"
     assert 'upload' in content.lower(), "Upload option not found for retry"
-    logger.info("Retry capability verified")
\ No newline at end of file
+    logger.info("Retry capability verified")
+@when('I request the metrics endpoint')
+def step_impl(context):
+    # Scrape metrics like Prometheus would
+    context.response = context.client.get('/metrics')
+
+@then('I should see the pipeline metrics')
+def step_impl(context):
+    # Check content type and metric families
+    assert context.response.status_code == 200, f"Unexpected status code: {context.response.status_code}"
+    assert context.response.mimetype == 'text/plain', f"Unexpected mimetype: {context.response.mimetype}"
+
+    content = context.response.data.decode('utf-8')
+    for name in ['gts_upload_seconds', 'gts_processing_wait_seconds', 'gts_stream_first_chunk_seconds',
+                 'gts_stream_seconds', 'gts_summary_seconds', 'gts_errors_total']:
+        assert f"# TYPE {name} " in content, f"Metric {name} not found"
+    logger.info("Metrics endpoint verified")
+
+@given('request profiling is enabled with a token')
+def step_impl(context):
+    # Profiles go to a scenario-local directory
+    context.profile_dir = tempfile.mkdtemp()
+    for key, value in {'PROFILE_TOKEN': 'test-profile-token', 'PROFILE_DIR': context.profile_dir}.items():
+        os.environ[key] = value
+        context.add_cleanup(os.environ.pop, key, None)
+
+@when('I request the home page with the profiling header')
+def step_impl(context):
+    context.response = context.client.get('/', headers={'X-Profile': 'all', 'X-Profile-Token': 'test-profile-token'})
+
+@then('a pstats and a collapsed-stack profile should be written for the request')
+def step_impl(context):
+    import pstats
+    assert context.response.status_code == 200, f"Unexpected status code: {context.response.status_code}"
+
+    files = os.listdir(context.profile_dir)
+    prof = [name for name in files if name.endswith('.prof')]
+    collapsed = [name for name in files if name.endswith('.collapsed')]
+    assert len(prof) == 1 and len(collapsed) == 1, f"Unexpected profile files: {files}"
+    assert 'GET' in prof[0], f"Profile not named after the request: {prof[0]}"
+
+    # The pstats file must load and cover the view function
+    stats = pstats.Stats(os.path.join(context.profile_dir, prof[0]))
+    assert any(func[2] == 'index' for func in stats.stats), "View function missing from profile"
+
+@given('every transcription job slot is busy')
+def step_impl(context):
+    # One slot, held by a "running job", in a scenario-local slot directory
+    import src.gemini_transcription_service.webapp.app as app_module
+    from src.gemini_transcription_service.admission import AdmissionController
+    controller = AdmissionController(capacity=1, directory=tempfile.mkdtemp())
+    context.busy_slot = controller.try_acquire()
+    assert context.busy_slot is not None, "Could not take the only job slot"
+    context.add_cleanup(context.busy_slot.release)
+    patcher = patch.object(app_module, 'get_controller', return_value=controller)
+    patcher.start()
+    context.add_cleanup(patcher.stop)
+
+@when('I check the health and readiness endpoints')
+def step_impl(context):
+    context.health_response = context.client.get('/healthz')
+    context.ready_response = context.client.get('/readyz')
+
+@then('the service should be live but not ready')
+def step_impl(context):
+    assert context.health_response.status_code == 200, f"Unexpected /healthz status: {context.health_response.status_code}"
+    assert context.ready_response.status_code == 503, f"Unexpected /readyz status: {context.ready_response.status_code}"
+    status = context.ready_response.get_json()
+    assert status == {'ready': False, 'in_flight': 1, 'capacity': 1}, f"Unexpected readiness: {status}"
+    assert context.ready_response.headers.get('Retry-After'), "Retry-After missing from /readyz"
+
+@when('I upload a valid audio file while saturated')
+def step_impl(context):
+    # No API mocks: a rejected upload must never reach the transcription service
+    with patch('src.gemini_transcription_service.webapp.app.TranscriptionService') as mock_service:
+        data = {'file': (io.BytesIO(b'RIFF' + b'\0' * 1024), 'test_saturated.wav')}
+        context.response = context.client.post('/upload', data=data, content_type='multipart/form-data')
+        context.service_called = mock_service.called
+
+@then('the upload should be rejected with Retry-After')
+def step_impl(context):
+    assert context.response.status_code == 503, f"Unexpected status code: {context.response.status_code}"
+    assert context.response.headers.get('Retry-After') == os.getenv('ADMISSION_RETRY_AFTER', '30')
+    assert not context.service_called, "Transcription ran despite saturation"
+    assert not any(name.startswith('test_saturated') for name in os.listdir(context.temp_path)), "Rejected upload was saved"
+
+@given('gunicorn runs {workers} {worker_class} workers with {threads} threads and {connections} connections each')
+def step_impl(context, workers, worker_class, threads, connections):
+    settings = {'GUNICORN_WORKERS': workers, 'GUNICORN_WORKER_CLASS': worker_class,
+                'GUNICORN_THREADS': threads, 'GUNICORN_WORKER_CONNECTIONS': connections}
+    patcher = patch.dict(os.environ, settings)
+    patcher.start()
+    context.add_cleanup(patcher.stop)
+
+@then('admission control should allow {capacity:d} concurrent jobs')
+def step_impl(context, capacity):
+    from src.gemini_transcription_service.admission import AdmissionController
+    os.environ.pop('MAX_CONCURRENT_JOBS', None)
+    controller = AdmissionController(directory=tempfile.mkdtemp(dir=context.temp_path))
+    assert controller.capacity == capacity, f"Capacity: {controller.capacity}"
+
+@given('another worker holds one of {capacity:d} job slots')
+def step_impl(context, capacity):
+    # Two controllers on one slot directory stand in for two gunicorn workers
+    from src.gemini_transcription_service.admission import AdmissionController
+    directory = tempfile.mkdtemp()
+    context.other_worker = AdmissionController(capacity=capacity, directory=directory)
+    context.this_worker = AdmissionController(capacity=capacity, directory=directory)
+    context.other_slot = context.other_worker.try_acquire()
+    assert context.other_slot is not None, "Could not take a job slot"
+    context.add_cleanup(context.other_slot.release)
+
+@when('this worker checks its readiness')
+def step_impl(context):
+    from src.gemini_transcription_service import admission
+    with patch.object(admission.fcntl, 'flock', wraps=admission.fcntl.flock) as flock:
+        context.readiness = context.this_worker.status()
+        context.probe_flocks = flock.call_count
+
+@then('it should see {count:d} job in flight without locking any slot')
+def step_impl(context, count):
+    assert context.readiness['in_flight'] == count, f"Unexpected readiness: {context.readiness}"
+    assert context.readiness['ready'], f"Unexpected readiness: {context.readiness}"
+    assert context.probe_flocks == 0, f"Readiness probe took {context.probe_flocks} locks"
+
+@then('a job slot should still be free for this worker')
+def step_impl(context):
+    slot = context.this_worker.try_acquire()
+    assert slot is not None and slot.index != context.other_slot.index, "No free job slot"
+    slot.release()
+
+@when("the other worker's job ends")
+def step_impl(context):
+    context.other_slot.release()
+
+@then('this worker should see no jobs in flight')
+def step_impl(context):
+    assert context.this_worker.in_flight() == 0, "Released slot still counted"
+
+def post_audio_bytes(context, data, filename):
+    # Multipart upload of in-memory bytes; the transcription service is mocked out
+    from src.gemini_transcription_service.webapp.uploads import save_upload
+    context.saved_uploads = []
+
+    def record_save(file, path):
+        context.saved_uploads.append(save_upload(file, path))
+        return context.saved_uploads[-1]
+
+    with patch('src.gemini_transcription_service.webapp.app.TranscriptionService') as mock_service, \
+            patch('src.gemini_transcription_service.webapp.app.save_upload', side_effect=record_save):
+        mock_service.return_value.run.side_effect = lambda path, **kwargs: (
+            MOCK_TRANSCRIPT_TEXT, path + '_transcript.txt', None)
+        context.response = context.client.post('/upload', data={'file': (io.BytesIO(data), filename)},
+                                               content_type='multipart/form-data', follow_redirects=True)
+        context.service_calls = mock_service.return_value.run.call_args_list
+
+@given('the upload size limit is {size:d} KB')
+def step_impl(context, size):
+    from src.gemini_transcription_service.webapp.app import app
+    for key, value in {'MAX_UPLOAD_BYTES': size * 1024, 'MAX_CONTENT_LENGTH': None}.items():
+        # MAX_CONTENT_LENGTH off, so the streaming check itself has to stop the upload
+        context.add_cleanup(app.config.__setitem__, key, app.config[key])
+        app.config[key] = value
+
+@when('I upload a {size:d} KB audio file')
+def step_impl(context, size):
+    context.sent_bytes = os.urandom(size * 1024)
+    post_audio_bytes(context, context.sent_bytes, 'recording.wav')
+
+@when('I upload a {size:d} KB audio file and keep it')
+def step_impl(context, size):
+    from src.gemini_transcription_service.webapp.app import app
+    context.add_cleanup(app.config.__setitem__, 'KEEP_LOCAL_AUDIO', app.config['KEEP_LOCAL_AUDIO'])
+    app.config['KEEP_LOCAL_AUDIO'] = True
+    context.sent_bytes = os.urandom(size * 1024)
+    post_audio_bytes(context, context.sent_bytes, 'streamed.wav')
+
+@then('I should see an error message about the file size')
+def step_impl(context):
+    content = context.response.data.decode('utf-8')
+    assert 'File is too large' in content, "Size limit message not shown"
+    assert not context.service_calls, "Oversized upload reached the transcription service"
+
+@then('the saved upload should match the sent bytes and hash')
+def step_impl(context):
+    import hashlib
+    assert len(context.service_calls) == 1, "Upload was not transcribed"
+    saved_path = context.service_calls[0].args[0]
+    with open(saved_path, 'rb') as f:
+        assert f.read() == context.sent_bytes, "Saved upload differs from the sent bytes"
+    assert os.path.dirname(os.path.abspath(saved_path)) == os.path.abspath(context.temp_path)
+    expected = (len(context.sent_bytes), hashlib.sha256(context.sent_bytes).hexdigest())
+    assert context.saved_uploads == [expected], f"Unexpected size/hash: {context.saved_uploads}"
+    os.remove(saved_path)
+
+@then('no partial upload should be left behind')
+def step_impl(context):
+    leftovers = [name for name in os.listdir(context.temp_path) if name.endswith('.part')]
+    assert not leftovers, f"Partial uploads left behind: {leftovers}"
+
+@given('pipelined uploads are enabled')
+def step_impl(context):
+    from src.gemini_transcription_service.webapp.app import app
+    context.add_cleanup(app.config.__setitem__, 'PIPELINED_UPLOAD', app.config['PIPELINED_UPLOAD'])
+    app.config['PIPELINED_UPLOAD'] = True
+
+@given('the Gemini Files API accepts resumable uploads')
+def step_impl(context):
+    # Resumable session that keeps the pieces it is sent; HTTP stays blocked by the environment
+    received = context.piped_bytes = bytearray()
+
+    class FakeSession:
+        granularity = 16 * 1024
+
+        def __init__(self, display_name, mime_type, size=None):
+            self.file = MagicMock()
+            self.file.name = f"files/{display_name}"
+            self.file.state.name = "PROCESSING"
+
+        def start(self):
+            return self
+
+        def send(self, data, finalize=False):
+            received.extend(data)
+            return self.file if finalize else None
+
+        def cancel(self):
+            pass
+
+    patcher = patch('src.gemini_transcription_service.upload_tee.GeminiUploadSession', FakeSession)
+    patcher.start()
+    context.add_cleanup(patcher.stop)
+
+@then('the job should get the pipelined Gemini file holding the sent bytes')
+def step_impl(context):
+    assert len(context.service_calls) == 1, "Upload was not transcribed"
+    uploaded_file = context.service_calls[0].kwargs.get('uploaded_file')
+    assert uploaded_file is not None and uploaded_file.name == 'files/recording.wav', f"Unexpected file: {uploaded_file}"
+    assert bytes(context.piped_bytes) == context.sent_bytes, "Gemini received different bytes"
+
+@then('the job should upload the recording itself')
+def step_impl(context):
+    assert len(context.service_calls) == 1, "Upload was not transcribed"
+    assert context.service_calls[0].kwargs.get('uploaded_file') is None, "Failed pipelined upload was handed to the job"
+
+@given('resumable uploads use {size:d} KB chunks')
+def step_impl(context, size):
+    os.environ['UPLOAD_CHUNK_MB'] = str(size / 1024)
+    context.add_cleanup(os.environ.pop, 'UPLOAD_CHUNK_MB', None)
+
+def put_chunk(context, start, checksum=None):
+    import hashlib
+    end = min(start + context.chunk_size, len(context.sent_bytes))
+    chunk = context.sent_bytes[start:end]
+    return context.client.put(f"/uploads/{context.upload_id}", data=chunk, headers={
+        'Content-Range': f"bytes {start}-{end - 1}/{len(context.sent_bytes)}",
+        'X-Chunk-SHA256': checksum or hashlib.sha256(chunk).hexdigest(),
+    })
+
+@when('I start a resumable upload of a {size:d} KB audio file')
+def step_impl(context, size):
+    context.sent_bytes = os.urandom(size * 1024)
+    response = context.client.post('/uploads', json={'filename': 'all day.wav', 'size': len(context.sent_bytes)})
+    assert response.status_code == 201, f"Unexpected status code: {response.status_code}"
+    session = response.get_json()
+    assert session['offset'] == 0
+    context.upload_id, context.chunk_size = session['upload_id'], session['chunk_size']
+
+@when('I send the first chunk')
+def step_impl(context):
+    response = put_chunk(context, 0)
+    assert response.status_code == 200 and response.get_json()['offset'] == context.chunk_size
+
+@when('I send the second chunk with a corrupted checksum')
+def step_impl(context):
+    context.response = put_chunk(context, context.chunk_size, checksum='0' * 64)
+
+@then('the chunk should be rejected and the upload should resume from {offset:d} bytes')
+def step_impl(context, offset):
+    assert context.response.status_code == 422, f"Unexpected status code: {context.response.status_code}"
+    assert context.response.get_json()['offset'] == offset
+    # A client reconnecting later asks the server where to continue
+    status = context.client.get(f"/uploads/{context.upload_id}").get_json()
+    assert status['offset'] == offset, f"Unexpected offset after rejection: {status}"
+    # Skipping ahead is refused with the offset to continue from
+    ahead = put_chunk(context, offset + context.chunk_size)
+    assert ahead.status_code == 409 and ahead.get_json()['offset'] == offset
+
+@when('I send the remaining chunks from the reported offset')
+def step_impl(context):
+    offset = context.client.get(f"/uploads/{context.upload_id}").get_json()['offset']
+    while offset < len(context.sent_bytes):
+        response = put_chunk(context, offset)
+        assert response.status_code == 200, f"Chunk at {offset} failed: {response.get_json()}"
+        offset = response.get_json()['offset']
+
+@when('I finalize the resumable upload')
+def step_impl(context):
+    from src.gemini_transcription_service.webapp.app import app
+    context.add_cleanup(app.config.__setitem__, 'KEEP_LOCAL_AUDIO', app.config['KEEP_LOCAL_AUDIO'])
+    app.config['KEEP_LOCAL_AUDIO'] = True
+    with patch('src.gemini_transcription_service.webapp.app.TranscriptionService') as mock_service:
+        mock_service.return_value.run.side_effect = lambda path, **kwargs: (
+            MOCK_TRANSCRIPT_TEXT, path + '_transcript.txt', None)
+        context.response = context.client.post(f"/uploads/{context.upload_id}/finalize")
+        context.service_calls = mock_service.return_value.run.call_args_list
+
+@then('the transcription should run on the assembled recording')
+def step_impl(context):
+    assert context.response.status_code == 200, f"Unexpected status code: {context.response.status_code}"
+    assert len(context.service_calls) == 1, "Transcription did not start on finalize"
+    saved_path = context.service_calls[0].args[0]
+    assert os.path.basename(saved_path).startswith('all_day_'), f"Unexpected upload name: {saved_path}"
+    with open(saved_path, 'rb') as f:
+        assert f.read() == context.sent_bytes, "Assembled upload differs from the sent bytes"
+    os.remove(saved_path)
+
+@then('the upload session should be gone')
+def step_impl(context):
+    response = context.client.get(f"/uploads/{context.upload_id}")
+    assert response.status_code == 404, f"Session still exists: {response.status_code}"
+
+@when('the last chunk is sent again while the upload is being finalized')
+def step_impl(context):
+    import hashlib
+    import threading
+    from src.gemini_transcription_service.webapp import resumable
+    session = resumable.UploadSession(context.temp_path, context.upload_id)
+    context.final_path = os.path.join(context.temp_path, f"finalized_{context.upload_id}.wav")
+    context.add_cleanup(lambda: os.path.exists(context.final_path) and os.remove(context.final_path))
+    hashing, proceed = threading.Event(), threading.Event()
+    sha256 = hashlib.sha256
+
+    class HeldSha256:
+        # finalize's checksum pass waits here, with the session locked
+        def __init__(self):
+            self.digest = sha256()
+
+        def update(self, data):
+            hashing.set()
+            proceed.wait(5)
+            self.digest.update(data)
+
+        def hexdigest(self):
+            return self.digest.hexdigest()
+
+    results = {}
+    last_start = (len(context.sent_bytes) - 1) // context.chunk_size * context.chunk_size
+    with patch.object(resumable.hashlib, 'sha256', side_effect=lambda: HeldSha256()):
+        finalizer = threading.Thread(target=lambda: results.setdefault('finalize', session.finalize(context.final_path)))
+        finalizer.start()
+        assert hashing.wait(5), "Finalize did not start"
+    late = threading.Thread(target=lambda: results.setdefault('chunk', put_chunk(context, last_start)))
+    late.start()
+    time.sleep(0.2)
+    proceed.set()
+    finalizer.join(5)
+    late.join(5)
+    context.finalize_result = results.get('finalize')
+    context.response = results['chunk']
+
+@then('the late chunk should be refused with 409')
+def step_impl(context):
+    assert context.response.status_code == 409, f"Unexpected status code: {context.response.status_code}"
+
+@then('the finalized recording should hold the sent bytes')
+def step_impl(context):
+    assert context.finalize_result and context.finalize_result[0] == len(context.sent_bytes)
+    with open(context.final_path, 'rb') as f:
+        assert f.read() == context.sent_bytes, "Finalized upload was changed by the late chunk"
+
+@then('finalizing the upload again should be refused with 409')
+def step_impl(context):
+    from src.gemini_transcription_service.webapp.resumable import UploadSession, UploadError
+    session = UploadSession(context.temp_path, context.upload_id)
+    session._meta = {'filename': 'all day.wav', 'size': len(context.sent_bytes), 'sha256': None}
+    try:
+        session.finalize(context.final_path + '.again')
+    except UploadError as e:
+        assert e.status == 409, f"Unexpected status: {e.status}"
+    else:
+        raise AssertionError("Second finalize succeeded")
+
+@when('I start a resumable upload with the sha256 {sha256}')
+def step_impl(context, sha256):
+    import json
+    context.response = context.client.post('/uploads', json={'filename': 'meeting.wav', 'size': 1024, 'sha256': json.loads(sha256)})
+
+@then('the upload should be refused as invalid')
+def step_impl(context):
+    assert context.response.status_code == 400, f"Unexpected status code: {context.response.status_code}"
+    assert 'sha256' in context.response.get_json()['error']
+
+@given('the Gemini stream keeps producing chunks until it is closed')
+def step_impl(context):
+    # A long transcription: one tiny chunk every 50 ms, for up to a minute
+    import threading
+    client = MagicMock()
+    uploaded = MagicMock()
+    uploaded.name = 'files/long-meeting'
+    uploaded.uri = 'mock://long-meeting'
+    uploaded.mime_type = 'audio/wav'
+    uploaded.state.name = 'ACTIVE'
+    client.files.upload.return_value = uploaded
+    context.stream_started = threading.Event()
+    context.stream_closed = threading.Event()
+
+    def generate_content_stream(model, contents, config):
+        def chunks():
+            context.stream_started.set()
+            try:
+                for _ in range(1200):
+                    time.sleep(0.05)
+                    chunk = MagicMock()
+                    chunk.text = '['
+                    chunk.usage_metadata = None
+                    yield chunk
+            finally:
+                context.stream_closed.set()
+        return chunks()
+
+    client.models.generate_content_stream.side_effect = generate_content_stream
+    context.gemini_client = client
+    patcher = patch('src.gemini_transcription_service.transcribe.get_gemini_client', return_value=client)
+    patcher.start()
+    context.add_cleanup(patcher.stop)
+
+@when('I upload a valid audio file as job "{job_id}"')
+def step_impl(context, job_id):
+    # The upload blocks until the job ends, so it runs on its own thread and test client
+    import threading
+    from src.gemini_transcription_service.webapp.app import app
+
+    def post():
+        data = {'file': (io.BytesIO(b'RIFF' + b'\0' * 1024), 'long_meeting.wav'), 'job_id': job_id}
+        context.response = app.test_client().post('/upload', data=data, content_type='multipart/form-data',
+                                                  follow_redirects=True)
+
+    context.upload_thread = threading.Thread(target=post)
+    context.upload_thread.start()
+
+@when('I cancel job "{job_id}" while it is streaming')
+def step_impl(context, job_id):
+    assert context.stream_started.wait(10), "Transcription stream never started"
+    started = time.monotonic()
+    context.cancel_response = context.client.post(f'/jobs/{job_id}/cancel')
+    assert context.cancel_response.status_code == 202, f"Unexpected status code: {context.cancel_response.status_code}"
+    context.upload_thread.join(10)
+    context.cancel_seconds = time.monotonic() - started
+    assert not context.upload_thread.is_alive(), "Upload request still running after the cancel"
+
+@then('the upload should return to the page with "{message}"')
+def step_impl(context, message):
+    assert context.response.status_code == 200, f"Unexpected status code: {context.response.status_code}"
+    assert message in context.response.data.decode('utf-8'), f"'{message}' not shown"
+    assert context.cancel_seconds < 2, f"Job took {context.cancel_seconds:.1f}s to stop"
+
+@then('the Gemini stream should have been closed')
+def step_impl(context):
+    assert context.stream_closed.wait(2), "Stream still open after the job was cancelled"
+
+@then('the uploaded Gemini file should have been deleted')
+def step_impl(context):
+    from src.gemini_transcription_service import jobs
+    context.gemini_client.files.delete.assert_called_once_with(name='files/long-meeting')
+    assert not jobs.active_jobs(), f"Jobs left registered: {jobs.active_jobs()}"
+
+@when('I cancel job "{job_id}" while it is not running here')
+def step_impl(context, job_id):
+    os.environ['JOB_CONTROL_DIR'] = tempfile.mkdtemp()
+    context.add_cleanup(os.environ.pop, 'JOB_CONTROL_DIR', None)
+    context.cancel_response = context.client.post(f'/jobs/{job_id}/cancel')
+
+@then('the cancel should be accepted')
+def step_impl(context):
+    assert context.cancel_response.status_code == 202, f"Unexpected status code: {context.cancel_response.status_code}"
+    assert context.cancel_response.get_json()['success'] is True
+
+@then('a job started as "{job_id}" should see the cancel')
+def step_impl(context, job_id):
+    from src.gemini_transcription_service import jobs
+    job = jobs.register('meeting.wav', job_id=job_id)
+    try:
+        assert job.id == job_id
+        assert job.cancel.cancelled and job.cancel.reason == 'request', "Marker from the other worker not seen"
+    finally:
+        jobs.unregister(job)
+    assert not os.listdir(os.environ['JOB_CONTROL_DIR']), "Cancel marker not removed with the job"
+
+@given('a job is watched for its client disconnecting')
+def step_impl(context):
+    import socket
+    from src.gemini_transcription_service.jobs import CancelToken
+    from src.gemini_transcription_service.webapp.disconnect import DisconnectWatcher
+    context.server_sock, context.client_sock = socket.socketpair()
+    context.add_cleanup(context.server_sock.close)
+    context.token = CancelToken()
+    context.watcher = DisconnectWatcher(context.server_sock, context.token, interval=0.05)
+    context.watcher.start()
+    context.add_cleanup(context.watcher.stop)
+    time.sleep(0.2)
+    assert not context.token.cancelled, "Cancelled while the client was still connected"
+
+@when('the client closes its connection')
+def step_impl(context):
+    context.client_sock.close()
+
+@then('the job should be cancelled because the client disconnected')
+def step_impl(context):
+    context.watcher.join(2)
+    assert context.token.cancelled and context.token.reason == 'disconnect', f"Token: {context.token.reason}"
+
+@given('the Gemini API returns a transcript for each recording')
+def step_impl(context):
+    from features.mocks import concurrent_gemini_client
+    context.gemini_client, _ = concurrent_gemini_client(lambda seconds: None)
+    patcher = patch('src.gemini_transcription_service.transcribe.get_gemini_client', return_value=context.gemini_client)
+    patcher.start()
+    context.add_cleanup(patcher.stop)
+
+@when('I upload "{filename}" as job "{job_id}" and wait for the result')
+def step_impl(context, filename, job_id):
+    import hashlib
+    body = b'RIFF' + os.urandom(2048)
+    context.upload_sha256 = hashlib.sha256(body).hexdigest()
+    data = {'file': (io.BytesIO(body), filename), 'job_id': job_id}
+    context.response = context.client.post('/upload', data=data, content_type='multipart/form-data')
+    assert context.response.status_code == 200, f"Unexpected status code: {context.response.status_code}"
+
+@then('job "{job_id}" should be recorded as completed with the upload\'s hash')
+def step_impl(context, job_id):
+    response = context.client.get(f'/jobs/{job_id}')
+    assert response.status_code == 200, f"Unexpected status code: {response.status_code}"
+    context.job = response.get_json()['job']
+    assert context.job['status'] == 'completed', context.job
+    assert context.job['input_sha256'] == context.upload_sha256
+    assert 'upload' in context.job['stages'] and 'transcription.stream' in context.job['stages'], context.job['stages']
+    assert not any(key.endswith('_path') for key in context.job), "Server paths exposed"
+
+@then('the job\'s transcript should download by the name in its record')
+def step_impl(context):
+    name = context.job['downloads']['transcript']
+    assert name in context.response.data.decode('utf-8'), "Result page links a different file"
+    response = context.client.get(f'/download/{name}')
+    assert response.status_code == 200, f"Unexpected status code: {response.status_code}"
+    assert b'Recording' in response.data
+
+@then('job "{job_id}" should still be the record of "{filename}"')
+def step_impl(context, job_id, filename):
+    job = context.client.get(f'/jobs/{job_id}').get_json()['job']
+    assert job['input_name'].startswith(os.path.splitext(filename)[0]), job
+    assert job == context.job, f"Job record changed: {job}"
+
+@then('the job list should show "{filename}" as a completed job with a fresh ID')
+def step_impl(context, filename):
+    history = context.client.get('/jobs?status=completed&limit=5').get_json()['jobs']
+    assert len(history) == 2, history
+    newest = history[0]
+    assert newest['input_name'].startswith(os.path.splitext(filename)[0]), newest
+    assert newest['id'] != context.job['id'] and newest['input_sha256'] == context.upload_sha256, newest
+
+@then('the job list should show job "{job_id}" first')
+def step_impl(context, job_id):
+    response = context.client.get('/jobs?status=completed&limit=5')
+    assert response.status_code == 200, f"Unexpected status code: {response.status_code}"
+    assert response.get_json()['jobs'][0]['id'] == job_id
+    assert context.client.get('/jobs?status=unknown').status_code == 400
+    assert context.client.get('/jobs/0000000000000000000000000000dead').status_code == 404
+
+@given('uploads are stored in the sharded layout')
+def step_impl(context):
+    os.environ['STORAGE_LAYOUT'] = 'sharded'
+    context.add_cleanup(os.environ.pop, 'STORAGE_LAYOUT', None)
+
+@then('the transcript should be stored in a dated shard of the transcripts area')
+def step_impl(context):
+    content = context.response.data.decode('utf-8')
+    match = re.search(r'/download/(transcripts/\d{4}/\d{2}/\d{2}/[0-9a-f]{2}/[^"]+_transcript\.txt)', content)
+    assert match, "Result page does not link a sharded transcript"
+    context.download_path = match.group(1)
+    assert time.strftime('%Y/%m/%d', time.gmtime()) in context.download_path
+    assert not os.path.exists(os.path.join(context.temp_path, os.path.basename(context.download_path))), "Transcript saved in the top folder"
+
+@then('the sharded transcript should download')
+def step_impl(context):
+    response = context.client.get(f'/download/{context.download_path}')
+    assert response.status_code == 200, f"Unexpected status code: {response.status_code}"
+    assert b'Recording' in response.data
+    escaped = context.client.get('/download/..%2F..%2Fetc%2Fpasswd', follow_redirects=True)
+    assert b'root:x:0:0' not in escaped.data and 'attachment' not in escaped.headers.get('Content-Disposition', '')
+
+@given('the day changes from "{first}" to "{second}" once the upload is stored')
+def step_impl(context, first, second):
+    # Only the upload's own path is chosen on the first day
+    from src.gemini_transcription_service.webapp import storage_layout
+    days = iter([first])
+    patcher = patch.object(storage_layout, 'today', side_effect=lambda: next(days, second))
+    patcher.start()
+    context.add_cleanup(patcher.stop)
+
+@then('the transcript should be stored in the "{day}" shard of the transcripts area')
+def step_impl(context, day):
+    content = context.response.data.decode('utf-8')
+    match = re.search(r'/download/(transcripts/\d{4}/\d{2}/\d{2}/[0-9a-f]{2}/[^"]+_transcript\.txt)', content)
+    assert match, "Result page does not link a sharded transcript"
+    assert match.group(1).startswith(f"transcripts/{day}/"), f"Transcript stored under another day: {match.group(1)}"
+    context.transcript_shard = match.group(1).split('/')[4]
+    context.input_path = re.search(r'const originalFilePath = "([^"]+)"', content).group(1)
+
+@then('its summary should be stored in the "{day}" shard of the summaries area')
+def step_impl(context, day):
+    from features.mocks import mock_summary_generator
+    with patch('src.gemini_transcription_service.webapp.app.SummaryGenerator', return_value=mock_summary_generator()):
+        response = context.client.post('/generate-summary', json={
+            'transcript': MOCK_TRANSCRIPT_TEXT, 'input_path': context.input_path})
+    assert response.status_code == 200, f"Unexpected status code: {response.status_code}"
+    name = response.get_json()['download_filename']
+    assert name.startswith(f"summaries/{day}/{context.transcript_shard}/"), f"Summary stored elsewhere: {name}"
+
+@given('an upload folder with files of different ages')
+def step_impl(context):
+    # name -> (size in KB, age in hours, hours since last download)
+    context.janitor_root = tempfile.mkdtemp(dir=context.temp_path)
+    files = {
+        'old_call.wav': (64, 30, 30),
+        'fresh_call.wav': (64, 1, 1),
+        'recent_call.wav': (64, 0, 0),
+        'stale_transcript.txt': (32, 200, 200),
+        'busy_transcript.txt': (32, 200, 2),
+        'weekly_summary.txt': (32, 100, 50),
+        '.upload-1234.part': (64, 30, 30),
+    }
+    now = time.time()
+    for name, (size, age, last_used) in files.items():
+        path = os.path.join(context.janitor_root, name)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size * 1024)
+        os.utime(path, (now - last_used * 3600, now - age * 3600))
+    os.makedirs(os.path.join(context.janitor_root, '.sessions', 'abc'))
+    with open(os.path.join(context.janitor_root, '.sessions', 'abc', 'data.part'), 'wb') as f:
+        f.write(b'x' * 1024)
+
+@when('the janitor runs with {hours:d} hour audio retention and a {quota:d} KB quota')
+def step_impl(context, hours, quota):
+    from src.gemini_transcription_service.webapp import janitor
+    env = {'RETENTION_AUDIO_HOURS': str(hours), 'STORAGE_QUOTA_MB': str(quota / 1024), 'JANITOR_GRACE_SECONDS': '1800'}
+    with patch.dict(os.environ, env):
+        context.sweep = janitor.sweep(context.janitor_root)
+
+@then('the janitor should have removed {names}')
+def step_impl(context, names):
+    expected = [name.strip().strip('"') for name in names.replace(' and ', ', ').split(',')]
+    left = set(os.listdir(context.janitor_root))
+    for name in expected:
+        assert name not in left, f"{name} was kept"
+    assert context.sweep['files'] == len(expected), context.sweep
+
+@then('it should have kept {names}')
+def step_impl(context, names):
+    expected = [name.strip().strip('"') for name in names.replace(' and ', ', ').split(',')]
+    left = set(os.listdir(context.janitor_root))
+    for name in expected:
+        assert name in left, f"{name} was removed"
+    assert os.path.exists(os.path.join(context.janitor_root, '.sessions', 'abc', 'data.part')), "Upload session removed"
+
+@given('transcripts are indexed for search')
+def step_impl(context):
+    os.environ['SEARCH_INDEX_ENABLED'] = 'true'
+    os.environ['SEARCH_INDEX_PATH'] = os.path.join(tempfile.mkdtemp(dir=context.temp_path), 'search.db')
+    context.add_cleanup(os.environ.pop, 'SEARCH_INDEX_ENABLED', None)
+    context.add_cleanup(os.environ.pop, 'SEARCH_INDEX_PATH', None)
+    context.corpus_dir = os.path.join(context.temp_path, f'corpus_{uuid.uuid4().hex[:8]}')
+
+@given('{count:d} saved transcripts of routine meetings')
+def step_impl(context, count):
+    from src.gemini_transcription_service.transcript_processor import TranscriptProcessor
+    processor = TranscriptProcessor()
+    topics = ['budget review', 'hiring plan', 'office move', 'quarterly numbers', 'customer feedback']
+    for index in range(count):
+        lines = [f"[Speaker {turn % 3 + 1} 00:{turn:02d}]: Update {turn} on the {topics[(index + turn) % len(topics)]} for team {index}."
+                 for turn in range(40)]
+        processor.save_transcript_to_file("\n".join(lines), f"routine_{index}.wav", context.corpus_dir)
+
+@given('a saved transcript where "{speaker}" says "{text}"')
+def step_impl(context, speaker, text):
+    from src.gemini_transcription_service.transcript_processor import TranscriptProcessor
+    transcript = f"[Bob 00:05]: Morning everyone.\n[{speaker} 12:34]: {text}\n[Bob 12:50]: Sounds good."
+    context.decision_path = TranscriptProcessor().save_transcript_to_file(transcript, "planning.wav", context.corpus_dir)
+
+@when('I search for "{query}" spoken by "{speaker}"')
+def step_impl(context, query, speaker):
+    context.search = context.client.get('/search', query_string={'q': query, 'speaker': speaker})
+    assert context.search.status_code == 200, f"Unexpected status code: {context.search.status_code}"
+
+@when('I search for "{query}"')
+def step_impl(context, query):
+    context.search = context.client.get('/search', query_string={'q': query})
+    assert context.search.status_code == 200, f"Unexpected status code: {context.search.status_code}"
+
+@then('the first hit should be segment {position:d} of the planning transcript by "{speaker}" at {timestamp}')
+def step_impl(context, position, speaker, timestamp):
+    hit = context.search.get_json()['results'][0]
+    assert hit['transcript'].endswith('planning_transcript.txt'), hit
+    assert (hit['segment'], hit['speaker'], hit['timestamp']) == (position, speaker, timestamp), hit
+
+@then('its snippet should show "{html}"')
+def step_impl(context, html):
+    snippet = context.search.get_json()['results'][0]['snippet']
+    assert html in snippet, snippet
+
+@then('the search should have answered in under {limit:d} ms')
+def step_impl(context, limit):
+    took = context.search.get_json()['took_ms']
+    assert took < limit, f"Search took {took} ms"
+
+@then('there should be no hits')
+def step_impl(context):
+    assert context.search.get_json()['results'] == [], context.search.get_json()
+
+@when('the planning transcript is removed by the janitor')
+def step_impl(context):
+    from src.gemini_transcription_service.webapp import janitor
+    entry = janitor.Entry(context.decision_path, 'transcripts', os.path.getsize(context.decision_path), 0, 0)
+    assert janitor._remove(entry, 'ttl')
+
+
+@when('I upload a recording of a meeting with {turns:d} turns')
+def step_impl(context, turns):
+    context.long_transcript = "\n".join(
+        f"[Speaker {turn % 4 + 1} {turn // 60:02d}:{turn % 60:02d}]: Point number {turn} of the long meeting."
+        for turn in range(turns))
+
+    def run(path, output_dir_override=None, **kwargs):
+        output_path = os.path.join(output_dir_override, f"{os.path.splitext(os.path.basename(path))[0]}_transcript.txt")
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(context.long_transcript)
+        return context.long_transcript, output_path, None
+
+    with patch('src.gemini_transcription_service.webapp.app.TranscriptionService') as mock_service:
+        mock_service.return_value.run.side_effect = run
+        context.response = context.client.post('/upload', data={'file': (io.BytesIO(b'RIFF' + os.urandom(64)), 'long_meeting.wav')},
+                                               content_type='multipart/form-data', follow_redirects=True)
+    assert context.response.status_code == 200, f"Unexpected status code: {context.response.status_code}"
+
+@then('the result page should embed only the first {count:d} segments')
+def step_impl(context, count):
+    content = context.response.data.decode('utf-8')
+    assert 'id="transcript-viewer"' in content and 'data-total="1000"' in content
+    assert f'Point number {count - 1} of' in content, "First page missing"
+    assert f'Point number {count} of' not in content, "Page embeds more than the first page"
+    context.transcript_file = re.search(r'data-file="([^"]+)"', content).group(1)
+
+@then('the transcript API should return segments {first:d} to {last:d} with speaker counts')
+def step_impl(context, first, last):
+    response = context.client.get(f'/transcripts/{context.transcript_file}/segments',
+                                  query_string={'offset': first, 'limit': last - first + 1})
+    assert response.status_code == 200, f"Unexpected status code: {response.status_code}"
+    page = response.get_json()
+    assert page['total'] == 1000 and page['offset'] == first
+    assert [segment['index'] for segment in page['segments']] == list(range(first, last + 1))
+    assert page['segments'][0] == {'index': first, 'speaker': f'Speaker {first % 4 + 1}', 'timestamp': '06:40',
+                                   'text': f'Point number {first} of the long meeting.'}, page['segments'][0]
+    assert page['speakers'] == {f'Speaker {number}': 250 for number in range(1, 5)}, page['speakers']
+
+@then('the transcript API should not serve files outside the upload folder')
+def step_impl(context):
+    assert context.client.get('/transcripts/..%2F..%2Fetc%2Fpasswd/segments').status_code == 404
+    assert context.client.get('/transcripts/missing_transcript.txt/segments').status_code == 404
+    # Nor any other file in it: recordings, partial uploads and resumable sessions are never read whole
+    others = ['meeting_transcript_call.wav', '.upload-meeting_transcript.txt.part',
+              os.path.join('.sessions', '0' * 32, 'data.part'), 'notes.txt']
+    for name in others:
+        path = os.path.join(context.temp_path, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('[Speaker 1 00:00]: not a transcript')
+        context.add_cleanup(os.remove, path)
+        url_name = name.replace(os.sep, '/')
+        assert context.client.get(f'/transcripts/{url_name}/segments').status_code == 404, f"Served {name}"
+        response = context.client.post('/apply-speaker-mapping', json={'transcript_file': url_name,
+                                                                        'speaker_mapping': {'Speaker 1': 'Alice'}})
+        assert response.status_code == 400, f"Read {name} as a transcript"
+
+@when('I name "{speaker}" "{name}" and download the modified transcript')
+def step_impl(context, speaker, name):
+    context.speaker_mapping = {speaker: name}
+    response = context.client.post('/apply-speaker-mapping', json={'transcript_file': context.transcript_file,
+                                                                    'speaker_mapping': context.speaker_mapping})
+    assert response.status_code == 200, f"Unexpected status code: {response.status_code}"
+    context.modified_transcript = response.get_json()['transcript']
+
+@then('every turn of "{speaker}" should be attributed to "{name}"')
+def step_impl(context, speaker, name):
+    assert f'[{speaker} ' not in context.modified_transcript
+    assert context.modified_transcript.count(f'[{name} ') == 250
+    assert context.modified_transcript.startswith(f'[{name} 00:00]: Point number 0 of')
+
+@then('a regenerated summary should read the renamed transcript')
+def step_impl(context):
+    with patch('src.gemini_transcription_service.webapp.app.SummaryGenerator') as mock_generator:
+        generator = mock_generator.return_value
+        generator.regenerate_summary.return_value = "## Key Points\n- Alice made 250 points"
+        generator.save_summary_to_file.return_value = os.path.join(context.temp_path, 'long_meeting_summary.txt')
+        response = context.client.post('/regenerate-summary', json={
+            'transcript_file': context.transcript_file,
+            'speaker_mapping': context.speaker_mapping,
+            'previous_summary': "## Key Points\n- Many points",
+            'feedback': 'Name the speakers',
+        })
+    assert response.status_code == 200, f"Unexpected status code: {response.status_code} {response.data}"
+    assert generator.regenerate_summary.call_args.kwargs['original_transcript'] == context.modified_transcript
+
+@then('the result page should offer to edit the transcript')
+def step_impl(context):
+    content = context.response.data.decode('utf-8')
+    assert 'id="edit-transcript-btn"' in content, "No edit control"
+    # The editor is filled on demand, not with the whole transcript
+    assert re.search(r'<textarea id="transcript-content"[^>]*></textarea>', content), "Editor embeds the transcript"
+
+@when('I edit the loaded transcript and generate a summary')
+def step_impl(context):
+    context.edited_transcript = context.modified_transcript.replace('Point number 0 of', 'Opening remarks of', 1)
+    with patch('src.gemini_transcription_service.webapp.app.SummaryGenerator') as mock_generator:
+        context.summary_generator = mock_generator.return_value
+        context.summary_generator.generate_summary_sections.return_value = {'overview': 'Alice opened the meeting.'}
+        context.summary_generator.save_summary_to_file.return_value = os.path.join(context.temp_path, 'long_meeting_summary.txt')
+        # What the page sends in edit mode: the text, with the names already written into it
+        context.response = context.client.post('/generate-summary', json={
+            'transcript': context.edited_transcript,
+            'speaker_mapping': {},
+        })
+
+@then('the summary should be generated from the edited transcript')
+def step_impl(context):
+    assert context.response.status_code == 200, f"Unexpected status code: {context.response.status_code} {context.response.data}"
+    transcript, speaker_mapping = context.summary_generator.generate_summary_sections.call_args.args
+    assert transcript == context.edited_transcript and speaker_mapping == {}
+    assert transcript.startswith('[Alice 00:00]: Opening remarks of')
+
+@given('a saved transcript of {turns:d} turns in the upload folder')
+def step_impl(context, turns):
+    context.download_path = os.path.join(context.temp_path, f'board_{uuid.uuid4().hex[:8]}_transcript.txt')
+    context.saved_bytes = "\n".join(f"[Speaker {turn % 3 + 1} {turn // 60:02d}:{turn % 60:02d}]: Agenda item {turn % 7} was discussed again."
+                                    for turn in range(turns)).encode('utf-8')
+    with open(context.download_path, 'wb') as f:
+        f.write(context.saved_bytes)
+
+def get_download(context, headers=None):
+    context.download = context.client.get(f'/download/{os.path.basename(context.download_path)}', headers=headers or {})
+
+@when('I download the transcript accepting "{encodings}"')
+def step_impl(context, encodings):
+    get_download(context, {'Accept-Encoding': encodings})
+
+@when('I download the transcript without accepting compression')
+def step_impl(context):
+    get_download(context)
+
+@then('it should arrive gzip-encoded and decompress to the saved transcript')
+def step_impl(context):
+    import gzip
+    response = context.download
+    assert response.status_code == 200, f"Unexpected status code: {response.status_code}"
+    assert response.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in response.headers['Vary']
+    assert response.headers['Content-Type'].startswith('text/plain') and response.headers['ETag']
+    assert int(response.headers['Content-Length']) * 5 < len(context.saved_bytes), "Transcript hardly compressed"
+    assert gzip.decompress(response.data) == context.saved_bytes
+    context.etag = response.headers['ETag']
+
+@then('a gzip copy should be kept next to the transcript')
+def step_impl(context):
+    sidecar = context.download_path + '.gz'
+    assert os.path.exists(sidecar), "No compressed copy"
+    modified = os.stat(sidecar).st_mtime_ns
+    get_download(context, {'Accept-Encoding': 'gzip'})
+    assert os.stat(sidecar).st_mtime_ns == modified, "Transcript compressed again"
+
+@when('I download the transcript again with its ETag')
+def step_impl(context):
+    get_download(context, {'Accept-Encoding': 'gzip', 'If-None-Match': context.etag})
+
+@then('the server should answer 304 Not Modified')
+def step_impl(context):
+    assert context.download.status_code == 304, f"Unexpected status code: {context.download.status_code}"
+    assert context.download.data == b''
+
+@when('I download bytes {first:d} to {last:d} of the transcript accepting "{encodings}"')
+def step_impl(context, first, last, encodings):
+    context.byte_range = (first, last)
+    get_download(context, {'Accept-Encoding': encodings, 'Range': f'bytes={first}-{last}'})
+
+@then('I should get exactly those bytes of the saved transcript')
+def step_impl(context):
+    first, last = context.byte_range
+    response = context.download
+    assert response.status_code == 206, f"Unexpected status code: {response.status_code}"
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Content-Range'] == f'bytes {first}-{last}/{len(context.saved_bytes)}'
+    assert response.data == context.saved_bytes[first:last + 1]
+
+@then('it should arrive as stored')
+def step_impl(context):
+    response = context.download
+    assert response.status_code == 200 and 'Content-Encoding' not in response.headers
+    assert response.data == context.saved_bytes
+    assert response.headers['ETag'] != context.etag, "Encodings share an ETag"
+
+@then('with GCS_GZIP_TEXT its GCS upload should be gzip-encoded')
+def step_impl(context):
+    import gzip
+    from src.gemini_transcription_service.storage_handler import StorageHandler
+    os.environ['GCS_GZIP_TEXT'] = 'true'
+    context.add_cleanup(os.environ.pop, 'GCS_GZIP_TEXT', None)
+    blob = MagicMock()
+    size = StorageHandler('transcript')._upload_blob(blob, context.download_path)
+    data = blob.upload_from_string.call_args.args[0]
+    assert blob.content_encoding == 'gzip' and size == len(data) < len(context.saved_bytes)
+    assert blob.upload_from_string.call_args.kwargs['content_type'] == 'text/plain; charset=utf-8'
+    assert gzip.decompress(data) == context.saved_bytes
+    blob.upload_from_filename.assert_not_called()
+
+@when('the transcript is removed by the janitor')
+def step_impl(context):
+    from src.gemini_transcription_service.webapp import janitor
+    entry = janitor.Entry(context.download_path, 'transcripts', len(context.saved_bytes), 0, 0)
+    assert janitor._remove(entry, 'ttl')
+
+@then('its compressed copies should be gone')
+def step_impl(context):
+    leftovers = [name for name in os.listdir(context.temp_path) if name.startswith(os.path.basename(context.download_path))]
+    assert leftovers == [], leftovers
+
+@when('I post a speaker mapping of "{speaker}" to the number {number:d}')
+def step_impl(context, speaker, number):
+    context.response = context.client.post('/apply-speaker-mapping', json={
+        'transcript': f"[{speaker} 00:01]: Hello.", 'speaker_mapping': {speaker: number}})
+
+@then('the speaker mapping should be rejected as invalid')
+def step_impl(context):
+    assert context.response.status_code == 400, f"Unexpected status code: {context.response.status_code}"
+    assert context.response.get_json()['error'] == 'Invalid speaker mapping'
+
+@given('a worker that inherited Gemini clients from the master')
+def step_impl_inherited_clients(context):
+    # gunicorn_config imports the package as installed
+    from gemini_transcription_service import clients
+    context.clients_module = clients
+    context.inherited_client = MagicMock()
+    with clients._lock:
+        clients._gemini_clients[clients._client_key(None)] = context.inherited_client
+    context.mock_genai_client.models.get.reset_mock()
+
+@when('gunicorn runs post_worker_init in the worker')
+def step_impl_post_worker_init(context):
+    import gunicorn_config
+    context.worker = MagicMock()
+    with patch.dict(os.environ, {'WARMUP_ENABLED': 'true'}):
+        gunicorn_config.post_worker_init(context.worker)
+
+@then('the inherited clients should be dropped')
+def step_impl_inherited_dropped(context):
+    clients = context.clients_module
+    assert context.inherited_client not in clients._gemini_clients.values()
+    context.worker.log.warning.assert_not_called()
+
+@then('the transcription and summary clients should be warmed with the fake client')
+def step_impl_clients_warmed(context):
+    from gemini_transcription_service import transcribe
+    clients = context.clients_module
+    timeouts = dict.fromkeys([transcribe.TRANSCRIPTION_TIMEOUT_MS, None])
+    for timeout_ms in timeouts:
+        assert clients._gemini_clients.get(clients._client_key(timeout_ms)) is context.mock_genai_client, f"No warm client for timeout {timeout_ms}"
+    # The fake client answered the connection warm-up; httpx requests fail in tests
+    assert context.mock_genai_client.models.get.call_count == len(timeouts)
+    context.inherited_client.models.get.assert_not_called()
@@ -29,4 +29,29 @@ Feature: Transcript Summarization
     Given I have a valid transcript file
     And the summarization service is unavailable or returns an error
     When I request a summary of the transcript
-    Then I should receive an error indicating service failure 
\ No newline at end of file
+    Then I should receive an error indicating service failure 
+
+  @summary
+  Scenario: Stream a summary from the web app
+    Given I have a valid transcript file
+    When I request a streamed summary from the web app
+    Then I should receive summary chunks before the final download link
+    And the streamed summary should have the same sections as a structured one
+
+  @summary
+  Scenario: Streamed summaries are prompted for the structured sections
+    Given I have a valid transcript file
+    When I build the streaming summary prompts
+    Then every prompt should ask for each summary section heading
+
+  @summary
+  Scenario: Regenerate a single summary section
+    Given I have a valid transcript file
+    When I request regeneration of the "action_items" section from the web app
+    Then only the "action_items" section should change
+
+  @summary
+  Scenario: Reject summary sections that aren't text
+    Given I have a valid transcript file
+    When I request regeneration of the "overview" section with a list as the overview
+    Then the regeneration should be rejected with invalid summary sections
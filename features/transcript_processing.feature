@@ -38,4 +38,40 @@ Feature: Transcript Processing
   Scenario: Process well-formed transcript with unusual speakers
     Given I have a structured JSON with unusual speaker names
     When I process the transcript with the TranscriptProcessor
-    Then I should get a correctly formatted transcript with the unusual names
\ No newline at end of file
+    Then I should get a correctly formatted transcript with the unusual names
+
+  @processing
+  Scenario: Apply speaker names without touching similar speaker IDs
+    Given I have a formatted transcript with ten or more speakers
+    When I apply a speaker mapping for "Speaker 1"
+    Then only "Speaker 1" should be renamed
+
+  @processing
+  Scenario: Speaker mappings with names that aren't text are skipped
+    Given I have a formatted transcript with ten or more speakers
+    When I apply a speaker mapping that maps "Speaker 10" to a number and "Speaker 1" to "Alice"
+    Then "Speaker 10" should keep its label and "Speaker 1" should read "Alice"
+
+  @processing
+  Scenario: Speaker names mentioned in the text are not renamed
+    Given I have a formatted transcript whose text mentions the speaker IDs
+    When I apply a speaker mapping of "A" to "Alice" and "Tom" to "Thomas"
+    Then only the speaker headers should be renamed
+
+  @processing
+  Scenario: Lines whose timestamp isn't mm:ss still start their own segment
+    Given I have a formatted transcript with a missing and a fractional timestamp
+    When I split the transcript into segments
+    Then I should get these segments
+      | speaker   | timestamp | text                  |
+      | Speaker 1 | 00:01     | hi                    |
+      | Speaker 2 |           | there                 |
+      | Speaker 3 | 00:02.5   | x                     |
+      | Speaker 1 | 1:02:03   | back again, and more  |
+
+  @processing
+  Scenario: Account token usage and cost for a streamed transcription
+    Given a transcription stream whose last chunk reports 1000 prompt tokens including 800 audio tokens and 200 output tokens
+    When I stream the transcription with usage accounting for model "gemini-2.5-flash"
+    Then the usage record should contain 1000 prompt, 800 audio and 200 output tokens
+    And the estimated cost should be 0.00136 USD
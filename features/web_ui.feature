@@ -55,4 +55,252 @@ Feature: Web UI Audio Transcription
     And the Gemini API is configured to return an error for web tests
     When I upload a valid audio file
     Then I should see an appropriate error message
-    And I should be able to try again
\ No newline at end of file
+    And I should be able to try again
+
+  @web
+  Scenario: Metrics endpoint serves Prometheus text format
+    Given I access the web upload page
+    When I request the metrics endpoint
+    Then I should see the pipeline metrics
+
+  @web
+  Scenario: Profile a single request on demand
+    Given I access the web upload page
+    And request profiling is enabled with a token
+    When I request the home page with the profiling header
+    Then a pstats and a collapsed-stack profile should be written for the request
+
+  @web
+  Scenario: Saturated service sheds uploads before reading them
+    Given I access the web upload page
+    And every transcription job slot is busy
+    When I check the health and readiness endpoints
+    Then the service should be live but not ready
+    When I upload a valid audio file while saturated
+    Then the upload should be rejected with Retry-After
+
+  @web
+  Scenario Outline: Job slots default to one per request the workers can serve
+    Given gunicorn runs <workers> <worker_class> workers with <threads> threads and <connections> connections each
+    Then admission control should allow <capacity> concurrent jobs
+
+    Examples:
+      | workers | worker_class | threads | connections | capacity |
+      | 2       | sync         | 1       | 1000        | 2        |
+      | 1       | sync         | 1       | 1000        | 1        |
+      | 2       | gthread      | 8       | 1000        | 16       |
+      | 3       | gevent       | 1       | 50          | 150      |
+
+  @web
+  Scenario: Readiness probes count busy slots without taking their locks
+    Given another worker holds one of 2 job slots
+    When this worker checks its readiness
+    Then it should see 1 job in flight without locking any slot
+    And a job slot should still be free for this worker
+    When the other worker's job ends
+    Then this worker should see no jobs in flight
+
+  @web
+  Scenario: Oversized uploads are rejected while streaming
+    Given I access the web upload page
+    And the upload size limit is 1 KB
+    When I upload a 64 KB audio file
+    Then I should see an error message about the file size
+    And no partial upload should be left behind
+
+  @web
+  Scenario: Uploads are written once to the upload folder with their hash
+    Given I access the web upload page
+    When I upload a 64 KB audio file and keep it
+    Then the saved upload should match the sent bytes and hash
+    And no partial upload should be left behind
+
+  @web
+  Scenario: Pipelined uploads reach Gemini while the body is received
+    Given I access the web upload page
+    And pipelined uploads are enabled
+    And the Gemini Files API accepts resumable uploads
+    When I upload a 64 KB audio file
+    Then the job should get the pipelined Gemini file holding the sent bytes
+
+  @web
+  Scenario: Pipelined upload falls back when Gemini is unreachable
+    Given I access the web upload page
+    And pipelined uploads are enabled
+    When I upload a 64 KB audio file
+    Then the job should upload the recording itself
+    And no partial upload should be left behind
+
+  @web
+  Scenario: Resume a chunked upload after a dropped connection
+    Given I access the web upload page
+    And resumable uploads use 16 KB chunks
+    When I start a resumable upload of a 40 KB audio file
+    And I send the first chunk
+    And I send the second chunk with a corrupted checksum
+    Then the chunk should be rejected and the upload should resume from 16384 bytes
+    When I send the remaining chunks from the reported offset
+    And I finalize the resumable upload
+    Then the transcription should run on the assembled recording
+    And the upload session should be gone
+
+  @web
+  Scenario: A chunk that races finalize is refused once the upload is assembled
+    Given I access the web upload page
+    And resumable uploads use 16 KB chunks
+    When I start a resumable upload of a 40 KB audio file
+    And I send the remaining chunks from the reported offset
+    And the last chunk is sent again while the upload is being finalized
+    Then the late chunk should be refused with 409
+    And the finalized recording should hold the sent bytes
+    And finalizing the upload again should be refused with 409
+
+  @web
+  Scenario Outline: Resumable uploads with a malformed checksum are refused
+    Given I access the web upload page
+    When I start a resumable upload with the sha256 <sha256>
+    Then the upload should be refused as invalid
+
+    Examples:
+      | sha256   |
+      | 12345    |
+      | "abc"    |
+      | ["x"]    |
+
+  @web
+  Scenario: Cancelling a running job frees it at once and deletes its Gemini file
+    Given I access the web upload page
+    And the Gemini stream keeps producing chunks until it is closed
+    When I upload a valid audio file as job "0123456789abcdef0123456789abcdef"
+    And I cancel job "0123456789abcdef0123456789abcdef" while it is streaming
+    Then the upload should return to the page with "Transcription cancelled"
+    And the Gemini stream should have been closed
+    And the uploaded Gemini file should have been deleted
+
+  @web
+  Scenario: A cancel for a job in another worker is left for that worker
+    Given I access the web upload page
+    When I cancel job "fedcba9876543210fedcba9876543210" while it is not running here
+    Then the cancel should be accepted
+    And a job started as "fedcba9876543210fedcba9876543210" should see the cancel
+
+  @web
+  Scenario: A client that disconnects cancels its job
+    Given a job is watched for its client disconnecting
+    When the client closes its connection
+    Then the job should be cancelled because the client disconnected
+
+  @web
+  Scenario: Finished jobs are kept in the job history
+    Given I access the web upload page
+    And the job history is stored in a temporary database
+    And the Gemini API returns a transcript for each recording
+    When I upload "weekly_sync.wav" as job "00112233445566778899aabbccddeeff" and wait for the result
+    Then job "00112233445566778899aabbccddeeff" should be recorded as completed with the upload's hash
+    And the job's transcript should download by the name in its record
+    And the job list should show job "00112233445566778899aabbccddeeff" first
+
+  @web
+  Scenario: A reused job ID never overwrites the job recorded under it
+    Given I access the web upload page
+    And the job history is stored in a temporary database
+    And the Gemini API returns a transcript for each recording
+    When I upload "weekly_sync.wav" as job "00112233445566778899aabbccddeeff" and wait for the result
+    Then job "00112233445566778899aabbccddeeff" should be recorded as completed with the upload's hash
+    When I upload "retro.wav" as job "00112233445566778899aabbccddeeff" and wait for the result
+    Then job "00112233445566778899aabbccddeeff" should still be the record of "weekly_sync.wav"
+    And the job list should show "retro.wav" as a completed job with a fresh ID
+
+  @web
+  Scenario: Sharded layout keeps transcripts in their own dated area
+    Given I access the web upload page
+    And uploads are stored in the sharded layout
+    And the Gemini API returns a transcript for each recording
+    When I upload "standup.wav" as job "8899aabbccddeeff0011223344556677" and wait for the result
+    Then the transcript should be stored in a dated shard of the transcripts area
+    And the sharded transcript should download
+
+  @web
+  Scenario: A job that runs past midnight keeps its files under its upload's day
+    Given I access the web upload page
+    And uploads are stored in the sharded layout
+    And the Gemini API returns a transcript for each recording
+    And the day changes from "2031/01/01" to "2031/01/02" once the upload is stored
+    When I upload "late.wav" as job "99aabbccddeeff001122334455667788" and wait for the result
+    Then the transcript should be stored in the "2031/01/01" shard of the transcripts area
+    And its summary should be stored in the "2031/01/01" shard of the summaries area
+
+  @web
+  Scenario: Janitor applies retention, then evicts least recently used files over the quota
+    Given an upload folder with files of different ages
+    When the janitor runs with 24 hour audio retention and a 170 KB quota
+    Then the janitor should have removed "old_call.wav", "stale_transcript.txt" and "weekly_summary.txt"
+    And it should have kept "fresh_call.wav", "recent_call.wav", "busy_transcript.txt" and ".upload-1234.part"
+
+  @web
+  Scenario: Search returns ranked transcript segments from the index
+    Given I access the web upload page
+    And transcripts are indexed for search
+    And 300 saved transcripts of routine meetings
+    And a saved transcript where "Alice" says "We decided to move the R&D launch to March"
+    When I search for "launch marc"
+    Then the first hit should be segment 1 of the planning transcript by "Alice" at 12:34
+    And its snippet should show "move the R&amp;D <mark>launch</mark> to <mark>March</mark>"
+    And the search should have answered in under 200 ms
+    When I search for "launch" spoken by "Bob"
+    Then there should be no hits
+    When the planning transcript is removed by the janitor
+    And I search for "launch"
+    Then there should be no hits
+
+
+  @web
+  Scenario: Long transcripts are served to the viewer page by page
+    Given I access the web upload page
+    When I upload a recording of a meeting with 1000 turns
+    Then the result page should embed only the first 200 segments
+    And the transcript API should return segments 400 to 449 with speaker counts
+    And the transcript API should not serve files outside the upload folder
+    When I name "Speaker 1" "Alice" and download the modified transcript
+    Then every turn of "Speaker 1" should be attributed to "Alice"
+    And a regenerated summary should read the renamed transcript
+
+  @web
+  Scenario: The full transcript is loaded only to edit it
+    Given I access the web upload page
+    When I upload a recording of a meeting with 1000 turns
+    Then the result page should embed only the first 200 segments
+    And the result page should offer to edit the transcript
+    When I name "Speaker 1" "Alice" and download the modified transcript
+    And I edit the loaded transcript and generate a summary
+    Then the summary should be generated from the edited transcript
+
+  @web
+  Scenario: Downloads are compressed once, revalidated by ETag and resumable
+    Given I access the web upload page
+    And a saved transcript of 2000 turns in the upload folder
+    When I download the transcript accepting "gzip"
+    Then it should arrive gzip-encoded and decompress to the saved transcript
+    And a gzip copy should be kept next to the transcript
+    When I download the transcript again with its ETag
+    Then the server should answer 304 Not Modified
+    When I download bytes 100 to 199 of the transcript accepting "gzip"
+    Then I should get exactly those bytes of the saved transcript
+    When I download the transcript without accepting compression
+    Then it should arrive as stored
+    And with GCS_GZIP_TEXT its GCS upload should be gzip-encoded
+    When the transcript is removed by the janitor
+    Then its compressed copies should be gone
+
+  @web
+  Scenario: Speaker names that aren't text are rejected
+    Given I access the web upload page
+    When I post a speaker mapping of "Speaker 1" to the number 5
+    Then the speaker mapping should be rejected as invalid
+
+  @web
+  Scenario: A new gunicorn worker drops inherited clients and warms its own
+    Given a worker that inherited Gemini clients from the master
+    When gunicorn runs post_worker_init in the worker
+    Then the inherited clients should be dropped
+    And the transcription and summary clients should be warmed with the fake client
@@ -11,7 +11,14 @@ bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}"
 # Worker processes - for CPU-intensive tasks like transcription,
 # using too many workers can cause memory issues and contention
 workers = int(os.getenv('GUNICORN_WORKERS', 2))
-worker_class = 'sync'  # 'gevent' or 'eventlet' for async workers
+
+# Transcriptions mostly wait on the network, so one worker can run many of them:
+# 'gthread' with GUNICORN_THREADS threads, or 'gevent' with up to GUNICORN_WORKER_CONNECTIONS
+# requests (pip install gevent). 'sync' runs one request per worker.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 100))
+ASYNC_WORKERS = worker_class in ('gevent', 'eventlet')
 
 # Logging
 accesslog = '-'  # stdout
@@ -27,4 +34,36 @@ timeout = 900  # For long transcriptions
 keepalive = 5
 
 # Server settings
-daemon = False  # Set to True to run in background
\ No newline at end of file
+daemon = False  # Set to True to run in background
+
+# Load the app in the master so workers share imported modules copy-on-write.
+# API clients are still created per worker, in post_worker_init.
+# Not with gevent/eventlet: the app must be imported after the worker has monkey-patched sockets and locks.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'false').lower() in ['true', '1', 'yes'] and not ASYNC_WORKERS
+
+
+def on_starting(server):
+    # Per-worker metric files from a previous run would otherwise be counted again
+    from gemini_transcription_service.metrics import clear_metrics_dir
+    clear_metrics_dir()
+
+
+def post_worker_init(worker):
+    # Runs after gevent/eventlet workers have monkey-patched, so clients get cooperative sockets
+
+    # Metrics inherited from the master belong to the master
+    from gemini_transcription_service.metrics import reset_process
+    reset_process()
+
+    # Warm clients and connections so the first request runs at steady-state latency
+    try:
+        from gemini_transcription_service.warmup import warm_up
+        warm_up()
+    except Exception as e:
+        worker.log.warning(f"Worker {worker.pid} warm-up failed: {e}")
+
+def worker_abort(worker):
+    # Called on the timeout kill (SIGABRT); log every stage still running with its stack
+    from gemini_transcription_service.watchdog import dump_active
+    if not dump_active(worker.log):
+        worker.log.warning(f"Worker {worker.pid} aborted with no watched stage running")
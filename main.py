@@ -1,23 +1,53 @@
 import argparse
 import os
+import asyncio
 import logging
 from dotenv import load_dotenv
-from src.gemini_transcription_service.transcribe import TranscriptionService
+from src.gemini_transcription_service.transcribe import TranscriptionService, AsyncTranscriptionService
 
 # Load environment variables from .env file
 load_dotenv(override=True)
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(module)s - %(message)s')
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(module)s - [%(trace_id)s] - %(message)s')
 logger = logging.getLogger(__name__)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Transcribe an audio file using Gemini.')
-    parser.add_argument('file_path', type=str, help='Path to the local audio file to transcribe.')
+    parser.add_argument('file_path', type=str, nargs='+', help='Path(s) to the local audio file(s) to transcribe.')
     parser.add_argument('--summary', action='store_true', help='Generate a summary of the transcription.')
     parser.add_argument('--summary-path', type=str, help='Custom path to save the summary file.')
+    parser.add_argument('--concurrency', type=int, help='Files transcribed at once when several are given (default: ASYNC_CONCURRENCY or 16).')
     args = parser.parse_args()
 
+    # Use environment default unless --summary is specified
+    generate_summary = args.summary or os.getenv("GENERATE_SUMMARY", "false").lower() in ['true', '1', 'yes']
+
+    if len(args.file_path) > 1:
+        # Several files: one event loop drives all jobs; Ctrl+C cancels them and deletes their uploads
+        missing = [path for path in args.file_path if not os.path.exists(path)]
+        for path in missing:
+            logger.error(f"Input file not found at '{path}'")
+        paths = [path for path in args.file_path if path not in missing]
+        try:
+            results = asyncio.run(AsyncTranscriptionService().run_many(
+                paths,
+                concurrency=args.concurrency,
+                generate_summary=generate_summary,
+                summary_path=args.summary_path
+            ))
+            for path, result in zip(paths, results):
+                if isinstance(result, BaseException):
+                    logger.error(f"Transcription failed for {path}: {result}")
+                elif result[1]:
+                    logger.info(f"Transcript for {path} saved to: {result[1]}")
+            logger.info("Transcription process finished.")
+        except KeyboardInterrupt:
+            logger.info("\nTranscription process interrupted by user. Gracefully shut down.")
+        raise SystemExit(0)
+
+    args.file_path = args.file_path[0]
+
     service = None
     try:
         logger.info(f"Starting transcription process for: {args.file_path}")
@@ -27,9 +57,6 @@ if __name__ == "__main__":
         else:
             service = TranscriptionService()
 
-            # Use environment default unless --summary is specified
-            generate_summary = args.summary or os.getenv("GENERATE_SUMMARY", "false").lower() in ['true', '1', 'yes']
-
             service.run(
                 file_path=args.file_path,
                 generate_summary=generate_summary,
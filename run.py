@@ -6,10 +6,12 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-# Configure logging
+# Configure logging, with trace IDs added to every record
+from gemini_transcription_service.tracing import install_log_context
+install_log_context()
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(module)s - %(message)s'
+    format='%(asctime)s - %(levelname)s - %(module)s - [%(trace_id)s] - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
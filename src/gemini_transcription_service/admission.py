@@ -0,0 +1,163 @@
+import os
+import logging
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: admission is per process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Admission control for transcription jobs.
+# Capacity is shared by all gunicorn workers through lock files in ADMISSION_DIR: each
+# running job holds an exclusive flock on one slot file. The kernel drops the lock when
+# the process dies, so crashed or killed workers never leak slots. The holder also writes
+# its PID into the file, so readiness probes count busy slots without taking any lock.
+
+
+def default_capacity():
+    # One slot per request the workers can serve at once. No slot is held back for health
+    # checks or rejections: a worker that picks up a new request is free to answer it.
+    workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+    if os.getenv("GUNICORN_WORKER_CLASS", "sync") in ("gevent", "eventlet"):
+        per_worker = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "100"))
+    else:
+        per_worker = int(os.getenv("GUNICORN_THREADS", "1"))
+    return max(workers * per_worker, 1)
+
+
+class Slot:
+    def __init__(self, controller, index, fd=None):
+        self.controller = controller
+        self.index = index
+        self.fd = fd
+
+    def release(self):
+        self.controller._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class AdmissionController:
+    def __init__(self, capacity=None, directory=None):
+        self.capacity = capacity if capacity is not None else int(os.getenv("MAX_CONCURRENT_JOBS", default_capacity()))
+        self.directory = directory or os.getenv("ADMISSION_DIR") or os.path.join(tempfile.gettempdir(), "gts-admission")
+        self._lock = threading.Lock()
+        self._local = set()  # slot indexes held by this process
+        if fcntl:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _slot_path(self, index):
+        return os.path.join(self.directory, f"slot-{index}.lock")
+
+    def _try_lock(self, index):
+        fd = os.open(self._slot_path(index), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except OSError:
+            os.close(fd)
+            return None
+
+    def _mark(self, fd, text):
+        # Holder PID for in_flight; a failed write only makes the probe undercount
+        try:
+            os.ftruncate(fd, 0)
+            if text:
+                os.pwrite(fd, text.encode(), 0)
+        except OSError as e:
+            logger.warning(f"Failed to mark admission slot: {e}")
+
+    def _holder(self, index):
+        # PID written into a slot file by the process holding it, or None
+        try:
+            with open(self._slot_path(index), encoding="ascii") as f:
+                return int(f.read().strip() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+    def try_acquire(self):
+        # A slot if one is free, None when saturated
+        with self._lock:
+            for index in range(self.capacity):
+                if index in self._local:
+                    continue
+                fd = self._try_lock(index) if fcntl else None
+                if fcntl and fd is None:
+                    continue
+                if fd is not None:
+                    self._mark(fd, f"{os.getpid()}\n")
+                self._local.add(index)
+                return Slot(self, index, fd)
+        return None
+
+    def _release(self, slot):
+        with self._lock:
+            if slot.index not in self._local:
+                return
+            self._local.discard(slot.index)
+            if slot.fd is not None:
+                self._mark(slot.fd, "")
+                fcntl.flock(slot.fd, fcntl.LOCK_UN)
+                os.close(slot.fd)
+                slot.fd = None
+
+    def in_flight(self):
+        # Busy slots across all processes (only this one without fcntl)
+        if not fcntl:
+            with self._lock:
+                return len(self._local)
+        # Reads the holders' PIDs: probing the locks themselves would make a concurrent
+        # try_acquire in another worker skip the slot and reject its upload
+        with self._lock:
+            local = set(self._local)
+        busy = 0
+        for index in range(self.capacity):
+            if index in local:
+                busy += 1
+                continue
+            pid = self._holder(index)
+            if pid and _alive(pid):
+                busy += 1
+        return busy
+
+    def status(self):
+        in_flight = self.in_flight()
+        return {"ready": in_flight < self.capacity, "in_flight": in_flight, "capacity": self.capacity}
+
+
+def _alive(pid):
+    # A worker killed before releasing its slot leaves its PID behind
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller():
+    # Per-process controller; slots themselves are shared through ADMISSION_DIR
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController()
+            logger.info(f"Admission control: {_controller.capacity} concurrent jobs, slots in {_controller.directory}")
+        return _controller
+
+
+def reset_controller():
+    global _controller
+    with _controller_lock:
+        _controller = None
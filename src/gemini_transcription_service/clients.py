@@ -0,0 +1,133 @@
+import os
+import socket
+import asyncio
+import logging
+import threading
+import contextlib
+import weakref
+
+logger = logging.getLogger(__name__)
+
+# Per-process API clients, created lazily and reused across jobs.
+# Keys include the client class so a patched class (tests) never gets a stale instance.
+_lock = threading.Lock()
+_gemini_clients = {}
+_async_gemini_clients = weakref.WeakKeyDictionary()  # event loop -> {key: client}
+_storage_clients = {}
+_known_buckets = set()
+# Callback for the HTTP responses the Gemini clients open on this thread (see watch_responses)
+_response_watchers = threading.local()
+
+
+def _new_gemini_client(api_key, timeout_ms, base_url):
+    from google import genai
+    from google.genai import types
+
+    logger.info("Initializing Gemini client...")
+    http_options = {"client_args": {"event_hooks": {"response": [_response_opened]}}}
+    if timeout_ms:
+        http_options["timeout"] = timeout_ms
+    if base_url:
+        http_options["base_url"] = base_url
+    return genai.Client(api_key=api_key, http_options=types.HttpOptions(**http_options))
+
+
+def _response_opened(response):
+    # httpx response hook of the sync Gemini clients
+    callback = getattr(_response_watchers, "callback", None)
+    if callback is not None:
+        callback(response)
+
+
+@contextlib.contextmanager
+def watch_responses(callback):
+    # Call callback(response) with each httpx response a Gemini client opens on this thread,
+    # e.g. to keep hold of the connection of a stream
+    previous = getattr(_response_watchers, "callback", None)
+    _response_watchers.callback = callback
+    try:
+        yield
+    finally:
+        _response_watchers.callback = previous
+
+
+def abort_response(response):
+    # Shut down the connection of an httpx response. Unlike closing it, this also wakes a
+    # thread blocked reading the response, whose read then fails at once.
+    stream = response.extensions.get("network_stream")
+    sock = stream.get_extra_info("socket") if stream is not None else None
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError as e:
+        logger.debug(f"Failed to shut down connection: {e}")
+
+
+def _client_key(timeout_ms):
+    from google import genai
+
+    # GEMINI_BASE_URL points the client at another endpoint, e.g. benchmarks/fake_gemini.py
+    return (genai.Client, os.getenv("GEMINI_API_KEY"), timeout_ms, os.getenv("GEMINI_BASE_URL") or None)
+
+
+def get_gemini_client(timeout_ms=None):
+    # Shared Gemini client for this process
+    key = _client_key(timeout_ms)
+    with _lock:
+        client = _gemini_clients.get(key)
+        if client is None:
+            client = _new_gemini_client(*key[1:])
+            _gemini_clients[key] = client
+    return client
+
+
+def get_async_gemini_client(timeout_ms=None):
+    # Gemini client for the running event loop; use its .aio API.
+    # Async connection pools are bound to the loop that opened them, so clients are per loop.
+    loop = asyncio.get_running_loop()
+    key = _client_key(timeout_ms)
+    with _lock:
+        clients = _async_gemini_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = _new_gemini_client(*key[1:])
+            clients[key] = client
+    return client
+
+
+def get_storage_client():
+    # Shared GCS client for this process
+    from google.cloud import storage
+
+    key = storage.Client
+    with _lock:
+        client = _storage_clients.get(key)
+        if client is None:
+            client = storage.Client()
+            _storage_clients[key] = client
+    return client
+
+
+def bucket_exists(client, bucket_name) -> bool:
+    # Bucket existence check, cached once confirmed
+    cache_key = (id(client), bucket_name)
+    with _lock:
+        if cache_key in _known_buckets:
+            return True
+
+    if not client.bucket(bucket_name).exists():
+        return False
+
+    with _lock:
+        _known_buckets.add(cache_key)
+    return True
+
+
+def reset_clients():
+    # Drop clients inherited across fork; sockets must not be shared between processes
+    with _lock:
+        _gemini_clients.clear()
+        _async_gemini_clients.clear()
+        _storage_clients.clear()
+        _known_buckets.clear()
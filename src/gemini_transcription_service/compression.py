@@ -0,0 +1,95 @@
+import os
+import gzip
+import uuid
+import logging
+
+try:
+    import zstandard
+except ImportError:  # pip install -e .[zstd]; downloads are then offered gzip-encoded only
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Compressed copies of text outputs.
+# Transcripts and summaries compress 5-10x. The web app serves downloads from sidecar files
+# next to the original (meeting_transcript.txt.zst, meeting_transcript.txt.gz) in whichever
+# encoding the client accepts. A sidecar is written on the first request and reused while it
+# is newer than the original, so a file is compressed once however often it is fetched.
+# GCS_GZIP_TEXT stores text outputs gzip-encoded in GCS; GCS decompresses them for clients
+# that don't accept gzip.
+
+SUFFIXES = {"zstd": ".zst", "gzip": ".gz"}
+TEXT_EXTENSIONS = (".txt", ".json")
+# Below this, the headers cost more than compression saves
+MIN_SIZE = 1024
+
+
+def enabled():
+    return os.getenv("DOWNLOAD_COMPRESSION", "true").lower() in ["true", "1", "yes"]
+
+
+def gcs_enabled():
+    return os.getenv("GCS_GZIP_TEXT", "false").lower() in ["true", "1", "yes"]
+
+
+def encodings():
+    # Supported encodings, preferred first
+    return ["zstd", "gzip"] if zstandard else ["gzip"]
+
+
+def compressible(path):
+    try:
+        return path.endswith(TEXT_EXTENSIONS) and os.path.getsize(path) >= MIN_SIZE
+    except OSError:
+        return False
+
+
+def negotiate(path, accept_encodings):
+    # Encoding to send path in, or None for the file as stored; accept_encodings is request.accept_encodings
+    if not enabled() or not compressible(path):
+        return None
+    for encoding in encodings():
+        if accept_encodings.quality(encoding) > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def sidecar(path, encoding):
+    # Path of an up-to-date compressed copy of path, written if missing or older than path
+    target = path + SUFFIXES[encoding]
+    try:
+        if os.stat(target).st_mtime >= os.stat(path).st_mtime:
+            return target
+    except FileNotFoundError:
+        pass
+
+    with open(path, "rb") as f:
+        data = compress(f.read(), encoding)
+    # Hidden temporary name: the janitor skips it, and concurrent writers each replace atomically
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(target)}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    logger.info(f"Compressed {path} with {encoding}: {os.path.getsize(path)} -> {len(data)} bytes")
+    return target
+
+
+def remove_sidecars(path):
+    for suffix in SUFFIXES.values():
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Failed to remove {path + suffix}: {e}")
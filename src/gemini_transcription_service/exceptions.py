@@ -1,3 +1,7 @@
 class TranscriptionTimeoutError(Exception):
    # Custom exception for timeout 
-    pass 
\ No newline at end of file
+    pass 
+
+class JobCancelledError(Exception):
+    # Job stopped by a cancel request, client disconnect or Ctrl+C
+    pass
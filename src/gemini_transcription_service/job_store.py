@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+from . import jobs
+
+logger = logging.getLogger(__name__)
+
+# Persistent job history.
+# With JOB_STORE_ENABLED, every transcription job gets a row in a SQLite database
+# (JOB_STORE_PATH) holding its input hash, status, per-stage timings and output paths.
+# The database runs in WAL mode, so all workers write their jobs while readers list the
+# history without blocking them, and the web app finds a job's files by ID instead of
+# scanning UPLOAD_FOLDER.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    input_name TEXT NOT NULL,
+    input_sha256 TEXT,
+    status TEXT NOT NULL,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    stages TEXT NOT NULL DEFAULT '{}',
+    transcript_path TEXT,
+    summary_path TEXT,
+    usage_path TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created);
+CREATE INDEX IF NOT EXISTS jobs_input_sha256 ON jobs (input_sha256);
+"""
+
+STATUSES = ("running", "completed", "failed", "cancelled", "timeout")
+READ_SIZE = 1024 * 1024
+
+
+def enabled():
+    return os.getenv("JOB_STORE_ENABLED", "false").lower() in ["true", "1", "yes"]
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class JobStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        # One connection per thread (and per process after a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL keeps committed jobs through a process crash with NORMAL; only a power loss can drop the last ones
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _execute(self, sql, params=()):
+        return self._connection().execute(sql, params)
+
+    def start(self, job_id, input_path, input_sha256=None):
+        now = time.time()
+        self._execute(
+            "INSERT INTO jobs (id, input_name, input_sha256, status, created, updated) VALUES (?, ?, ?, 'running', ?, ?)",
+            (job_id, os.path.basename(input_path), input_sha256, now, now),
+        )
+
+    def finish(self, job_id, status, error=None, stages=None, transcript_path=None, summary_path=None, usage_path=None):
+        if status not in STATUSES:
+            raise ValueError(f"Unknown job status: {status}")
+        self._execute(
+            "UPDATE jobs SET status = ?, error = ?, stages = ?, transcript_path = ?, summary_path = ?, usage_path = ?, updated = ? WHERE id = ?",
+            (status, error, json.dumps(stages or {}), transcript_path, summary_path, usage_path, time.time(), job_id),
+        )
+
+    def get(self, job_id):
+        row = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_dict(row) if row else None
+
+    def list(self, limit=50, offset=0, status=None):
+        # Newest first
+        if status:
+            rows = self._execute("SELECT * FROM jobs WHERE status = ? ORDER BY created DESC LIMIT ? OFFSET ?", (status, limit, offset))
+        else:
+            rows = self._execute("SELECT * FROM jobs ORDER BY created DESC LIMIT ? OFFSET ?", (limit, offset))
+        return [_row_dict(row) for row in rows]
+
+    def find_by_input(self, input_sha256):
+        # Earlier jobs for the same recording, newest first
+        rows = self._execute("SELECT * FROM jobs WHERE input_sha256 = ? ORDER BY created DESC", (input_sha256,))
+        return [_row_dict(row) for row in rows]
+
+
+def _row_dict(row):
+    job = dict(row)
+    job["stages"] = json.loads(job["stages"] or "{}")
+    return job
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    # The process-wide store, or None when JOB_STORE_ENABLED is off
+    global _store
+    if not enabled():
+        return None
+    path = os.getenv("JOB_STORE_PATH", "./jobs.db")
+    with _store_lock:
+        if _store is None or _store.path != path:
+            _store = JobStore(path)
+        return _store
+
+
+def record_start(job, input_sha256=None):
+    # Store a running job; hashes the input when the caller has no hash yet
+    store = get_store()
+    if store is None:
+        return
+    try:
+        if input_sha256 is None and os.path.exists(job.file_path):
+            input_sha256 = file_sha256(job.file_path)
+        try:
+            store.start(job.id, job.file_path, input_sha256)
+        except sqlite3.IntegrityError:
+            # The ID came from a client and an earlier job, or one in another worker, has it
+            taken_id = jobs.reassign(job)
+            logger.warning(f"Job ID {taken_id} is already in the job store, recording the job as {job.id}")
+            store.start(job.id, job.file_path, input_sha256)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"Failed to record job {job.id}: {e}")
+
+
+def record_finish(job, status, error=None, transcript_path=None, summary_path=None, usage_path=None):
+    store = get_store()
+    if store is None:
+        return
+    try:
+        stages = {name: round(seconds, 3) for name, seconds in job.stages.items()}
+        store.finish(job.id, status, error=error, stages=stages, transcript_path=transcript_path,
+                     summary_path=summary_path, usage_path=usage_path)
+    except sqlite3.Error as e:
+        logger.warning(f"Failed to record result of job {job.id}: {e}")
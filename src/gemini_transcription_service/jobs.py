@@ -0,0 +1,306 @@
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import tempfile
+import threading
+import contextvars
+from dataclasses import dataclass, field
+
+try:
+    import fcntl
+except ImportError:  # Windows: leases are never treated as stale
+    fcntl = None
+
+from .exceptions import JobCancelledError
+from .metrics import JOBS_CANCELLED
+from .tracing import current_trace_id, add_listener
+
+logger = logging.getLogger(__name__)
+
+# Jobs running in this process.
+# Per-job state (client, Files API upload, ...) lives in a Job rather than on the service
+# instance, so one TranscriptionService can run jobs from many threads or greenlets at once
+# and anything that needs to see in-flight work (cleanup on Ctrl+C, status pages) can list it.
+#
+# Each job carries a CancelToken. Long-running stages check it between steps; a cancel for a
+# job running in another worker is left as a marker file in JOB_CONTROL_DIR, which the job's
+# token picks up on its next check.
+#
+# A job holding a Files API upload also holds a lease file in JOB_CONTROL_DIR naming it, with
+# an flock the kernel drops when the process dies. Sweepers in other workers read the leases to
+# tell uploads of running jobs from those left by crashed or killed ones.
+#
+# A job is also the current job of the context that registered it; spans finished there are
+# added to its stage timings.
+
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+MARKER_TTL = 3600  # markers for jobs that never showed up
+
+
+def control_dir():
+    return os.getenv("JOB_CONTROL_DIR") or os.path.join(tempfile.gettempdir(), "gts-jobs")
+
+
+def valid_job_id(job_id):
+    return bool(_JOB_ID.match(job_id or ""))
+
+
+def _marker_path(job_id):
+    return os.path.join(control_dir(), f"{job_id}.cancel")
+
+
+def _lease_path(job_id):
+    return os.path.join(control_dir(), f"{job_id}.lease")
+
+
+class CancelToken:
+    def __init__(self, marker=None):
+        self.marker = marker
+        self.reason = None
+        self._event = threading.Event()
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    @classmethod
+    def for_job(cls, job_id):
+        return cls(_marker_path(job_id))
+
+    def cancel(self, reason="request"):
+        if self._event.is_set():
+            return
+        self.reason = reason
+        with self._callbacks_lock:
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        JOBS_CANCELLED.inc(reason=reason)
+        logger.info(f"Job cancelled ({reason})")
+        for callback in callbacks:
+            self._run_callback(callback)
+
+    def add_callback(self, callback):
+        # Call callback() when the job is cancelled, at once if it already is; returns a
+        # function that unregisters it
+        with self._callbacks_lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove_callback(callback)
+        self._run_callback(callback)
+        return lambda: None
+
+    def _remove_callback(self, callback):
+        with self._callbacks_lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    @staticmethod
+    def _run_callback(callback):
+        try:
+            callback()
+        except Exception as e:
+            logger.warning(f"Cancel callback failed: {e}")
+
+    @property
+    def cancelled(self):
+        if not self._event.is_set() and self.marker and os.path.exists(self.marker):
+            self.cancel("request")
+        return self._event.is_set()
+
+    def wait(self, timeout):
+        # Sleep up to timeout seconds; returns True as soon as the job is cancelled
+        deadline = time.monotonic() + timeout
+        while not self.cancelled:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._event.wait(min(remaining, 1.0))
+        return True
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise JobCancelledError(f"Job cancelled ({self.reason})")
+
+
+@dataclass
+class Job:
+    id: str
+    file_path: str
+    trace_id: str = None
+    owner: object = None
+    client: object = None
+    uploaded_file: object = None
+    cancel: CancelToken = None
+    started: float = field(default_factory=time.time)
+    stages: dict = field(default_factory=dict)
+    _context_token: object = field(default=None, repr=False)
+    _lease: object = field(default=None, repr=False)
+
+
+_lock = threading.Lock()
+_jobs = {}
+_current_job = contextvars.ContextVar("gts_current_job", default=None)
+
+
+def current_job():
+    return _current_job.get()
+
+
+def _record_stage(span):
+    # Seconds per stage; repeated stages (e.g. several summary calls) add up
+    job = _current_job.get()
+    if job is not None and span.name != "transcription.job":
+        job.stages[span.name] = job.stages.get(span.name, 0.0) + span.duration
+
+
+add_listener(_record_stage)
+
+
+def register(file_path, owner=None, job_id=None, cancel=None):
+    # job_id may come from the client (so it can cancel); jobs started from one request or
+    # run_many() share a trace, so IDs are separate from trace IDs
+    with _lock:
+        if not valid_job_id(job_id) or job_id in _jobs:
+            job_id = uuid.uuid4().hex
+        job = Job(id=job_id, file_path=file_path, trace_id=current_trace_id(), owner=owner,
+                  cancel=cancel or CancelToken.for_job(job_id))
+        _jobs[job.id] = job
+    job._context_token = _current_job.set(job)
+    return job
+
+
+def reassign(job):
+    # Give a registered job a fresh ID and return the old one. Its cancel token still watches
+    # the marker of the ID it was started under, so a cancel sent by that ID reaches it.
+    with _lock:
+        taken_id = job.id
+        if _jobs.get(taken_id) is job:
+            del _jobs[taken_id]
+        job.id = uuid.uuid4().hex
+        _jobs[job.id] = job
+        if job._lease is not None:
+            try:
+                os.replace(_lease_path(taken_id), _lease_path(job.id))
+            except OSError as e:
+                logger.warning(f"Failed to move lease of job {taken_id}: {e}")
+    return taken_id
+
+
+def attach_upload(job, file):
+    # Set the job's Files API upload and (re)write its lease
+    job.uploaded_file = file
+    name = getattr(file, "name", None)
+    if not name or not fcntl:
+        return
+    directory = control_dir()
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # Locked before it appears under its final name, so a sweeper never sees an unlocked lease
+        tmp_path = os.path.join(directory, f".{job.id}.lease.tmp")
+        lease = open(tmp_path, "w", encoding="utf-8")
+        fcntl.flock(lease, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        json.dump({"file": name, "pid": os.getpid(), "started": job.started}, lease)
+        lease.flush()
+        os.replace(tmp_path, _lease_path(job.id))
+    except OSError as e:
+        logger.warning(f"Failed to write lease for job {job.id}: {e}")
+        return
+    _release_lease(job, remove=False)
+    job._lease = lease
+
+
+def _release_lease(job, remove=True):
+    if job._lease is None:
+        return
+    if remove:
+        try:
+            os.remove(_lease_path(job.id))
+        except OSError:
+            pass
+    job._lease.close()
+    job._lease = None
+
+
+def leased_files(remove_stale=True):
+    # Files API names in leases: (held by running jobs, left by dead processes)
+    alive, stale = set(), set()
+    try:
+        entries = [entry for entry in os.scandir(control_dir()) if entry.name.endswith(".lease")]
+    except FileNotFoundError:
+        return alive, stale
+    for entry in entries:
+        try:
+            with open(entry.path, encoding="utf-8") as lease:
+                try:
+                    if fcntl:
+                        fcntl.flock(lease, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    alive.add(json.load(lease)["file"])
+                    continue
+                name = json.load(lease)["file"]
+                if not fcntl:
+                    alive.add(name)
+                    continue
+                stale.add(name)
+                if remove_stale:
+                    os.remove(entry.path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.debug(f"Skipping unreadable lease {entry.path}: {e}")
+    return alive, stale
+
+
+def unregister(job):
+    with _lock:
+        _jobs.pop(job.id, None)
+    _release_lease(job)
+    if job._context_token is not None:
+        try:
+            _current_job.reset(job._context_token)
+        except ValueError:
+            # Unregistered from another context; that context's value ends with it
+            pass
+        job._context_token = None
+    if job.cancel and job.cancel.marker:
+        try:
+            os.remove(job.cancel.marker)
+        except OSError:
+            pass
+
+
+def get(job_id):
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def active_jobs(owner=None):
+    with _lock:
+        return [job for job in _jobs.values() if owner is None or job.owner is owner]
+
+
+def cancel(job_id, reason="request"):
+    # Cancel a job in this process, or leave a marker for the worker running it.
+    # Returns False only for malformed IDs; whether the job still runs is not known here.
+    if not valid_job_id(job_id):
+        return False
+    job = get(job_id)
+    if job:
+        job.cancel.cancel(reason)
+        return True
+
+    directory = control_dir()
+    os.makedirs(directory, exist_ok=True)
+    with open(_marker_path(job_id), "w"):
+        pass
+    _sweep_markers(directory)
+    return True
+
+
+def _sweep_markers(directory):
+    now = time.time()
+    for entry in os.scandir(directory):
+        try:
+            if entry.name.endswith(".cancel") and now - entry.stat().st_mtime > MARKER_TTL:
+                os.remove(entry.path)
+        except OSError:
+            continue
@@ -0,0 +1,245 @@
+import os
+import json
+import time
+import glob
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Minimal Prometheus-style metrics without extra dependencies.
+# With METRICS_DIR set, every process persists its own snapshot file and /metrics
+# merges all of them, so counts add up across gunicorn workers (including recycled ones).
+# The directory is cleared when gunicorn starts.
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 900)
+
+_lock = threading.RLock()
+_registry = {}
+_process_id = f"{os.getpid()}-{time.time_ns()}"
+
+
+def _label_key(labelnames, labels):
+    # Stable, JSON-safe key for a label set
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {sorted(labels)}")
+    return json.dumps([[name, str(labels[name])] for name in labelnames])
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        _persist()
+
+    def snapshot(self):
+        return dict(self.values)
+
+    def reset(self):
+        self.values = {}
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with _lock:
+            entry = self.values.setdefault(key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["buckets"][i] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+        _persist()
+
+    @contextmanager
+    def time(self, **labels):
+        # Observe the duration of the block, also when it raises
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def snapshot(self):
+        return {key: {"buckets": list(v["buckets"]), "sum": v["sum"], "count": v["count"]} for key, v in self.values.items()}
+
+    def reset(self):
+        self.values = {}
+
+
+def _register(metric):
+    with _lock:
+        _registry[metric.name] = metric
+    return metric
+
+
+def counter(name, documentation, labelnames=()):
+    return _register(Counter(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+    return _register(Histogram(name, documentation, labelnames, buckets))
+
+
+def _metrics_dir():
+    return os.getenv("METRICS_DIR")
+
+
+def _snapshot():
+    with _lock:
+        return {
+            name: {
+                "kind": metric.kind,
+                "documentation": metric.documentation,
+                "buckets": list(getattr(metric, "buckets", ())),
+                "values": metric.snapshot(),
+            }
+            for name, metric in _registry.items()
+        }
+
+
+def _write_json(path, data):
+    # Atomic replace so readers never see a partial file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _persist():
+    directory = _metrics_dir()
+    if not directory:
+        return
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with _lock:
+            _write_json(os.path.join(directory, f"{_process_id}.json"), _snapshot())
+    except OSError as e:
+        logger.warning(f"Failed to persist metrics: {e}")
+
+
+def _merge(target, snapshot):
+    # Add one process snapshot into the aggregate
+    for name, data in snapshot.items():
+        merged = target.setdefault(name, {**data, "values": {}})
+        for key, value in data["values"].items():
+            if data["kind"] == "counter":
+                merged["values"][key] = merged["values"].get(key, 0) + value
+            else:
+                entry = merged["values"].setdefault(key, {"buckets": [0] * len(value["buckets"]), "sum": 0.0, "count": 0})
+                entry["buckets"] = [a + b for a, b in zip(entry["buckets"], value["buckets"])]
+                entry["sum"] += value["sum"]
+                entry["count"] += value["count"]
+    return target
+
+
+def _read_snapshots(directory):
+    # One file per process that ever ran; finished workers keep contributing their counts
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping unreadable metrics file {path}: {e}")
+    return snapshots
+
+
+def collect():
+    # Aggregated view across all processes sharing METRICS_DIR (or just this one)
+    directory = _metrics_dir()
+    snapshots = _read_snapshots(directory) if directory else [_snapshot()]
+    aggregate = {}
+    for snapshot in snapshots:
+        _merge(aggregate, snapshot)
+    return aggregate
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = json.loads(key) + [list(pair) for pair in extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def render():
+    # Prometheus text exposition format
+    lines = []
+    for name, data in sorted(collect().items()):
+        lines.append(f"# HELP {name} {data['documentation']}")
+        lines.append(f"# TYPE {name} {data['kind']}")
+        for key, value in sorted(data["values"].items()):
+            if data["kind"] == "counter":
+                lines.append(f"{name}{_format_labels(key)} {value}")
+                continue
+            # Bucket counts are stored cumulatively already
+            for bound, count in zip(data["buckets"], value["buckets"]):
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {value['count']}")
+            lines.append(f"{name}_sum{_format_labels(key)} {value['sum']}")
+            lines.append(f"{name}_count{_format_labels(key)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def reset_process():
+    # Fresh identity and zeroed values in a newly forked worker
+    global _process_id
+    with _lock:
+        _process_id = f"{os.getpid()}-{time.time_ns()}"
+        for metric in _registry.values():
+            metric.reset()
+
+
+def clear_metrics_dir():
+    # Start each deployment from zero
+    directory = _metrics_dir()
+    if not directory or not os.path.isdir(directory):
+        return
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.remove(path)
+
+
+# Pipeline metrics
+UPLOAD_SECONDS = histogram("gts_upload_seconds", "Time spent uploading files.", ["target"])
+UPLOADED_BYTES = counter("gts_uploaded_bytes_total", "Bytes uploaded.", ["target"])
+PROCESSING_WAIT_SECONDS = histogram("gts_processing_wait_seconds", "Time the Files API spent in PROCESSING state.")
+STREAM_FIRST_CHUNK_SECONDS = histogram("gts_stream_first_chunk_seconds", "Time to first chunk of the transcription stream.")
+STREAM_SECONDS = histogram("gts_stream_seconds", "Total duration of the transcription stream.")
+TRANSCRIPT_PROCESSING_SECONDS = histogram(
+    "gts_transcript_processing_seconds", "Time spent parsing and formatting transcripts.", ["step"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+SUMMARY_SECONDS = histogram("gts_summary_seconds", "Summary generation latency.", ["mode"])
+ERRORS = counter("gts_errors_total", "Errors by pipeline stage and exception type.", ["stage", "type"])
+TOKENS = counter("gts_tokens_total", "Gemini tokens by model, operation and token kind.", ["model", "operation", "kind"])
+COST_USD = counter("gts_cost_usd_total", "Estimated Gemini cost in USD.", ["model", "operation"])
+WATCHDOG_OVERRUNS = counter("gts_watchdog_overruns_total", "Stages that ran past their watchdog threshold.", ["stage"])
+ADMISSION_REJECTIONS = counter("gts_admission_rejections_total", "Uploads rejected because all job slots were busy.")
+JOBS_CANCELLED = counter("gts_jobs_cancelled_total", "Jobs cancelled, by reason (request, disconnect, interrupt).", ["reason"])
+JANITOR_REMOVED_FILES = counter("gts_janitor_removed_files_total", "Files removed from UPLOAD_FOLDER, by area and reason (ttl, quota).", ["area", "reason"])
+JANITOR_REMOVED_BYTES = counter("gts_janitor_removed_bytes_total", "Bytes freed in UPLOAD_FOLDER, by area.", ["area"])
+ORPHANS_DELETED = counter("gts_orphaned_uploads_deleted_total", "Files API uploads deleted after their job died.")
+ORPHAN_BYTES_RECLAIMED = counter("gts_orphaned_upload_bytes_reclaimed_total", "Files API storage reclaimed from orphaned uploads.")
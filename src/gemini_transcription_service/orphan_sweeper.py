@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows: several workers may sweep at once
+    fcntl = None
+
+from .clients import get_gemini_client
+from .metrics import ORPHANS_DELETED, ORPHAN_BYTES_RECLAIMED, ERRORS
+from . import jobs
+
+logger = logging.getLogger(__name__)
+
+# Orphaned Files API uploads.
+# A job deletes its upload in its finally block, which never runs when the worker is killed
+# (gunicorn timeout, OOM, deploys). The sweeper lists the files stored under our API key and
+# deletes audio uploads that no running job holds:
+# - uploads named by a lease whose process died, at once
+# - any other audio upload older than ORPHAN_MIN_AGE_SECONDS; this also covers jobs on other
+#   hosts sharing the key, which have no lease here
+# Deletes run ORPHAN_SWEEP_CONCURRENCY at a time.
+
+LOCK_NAME = "orphan-sweep.lock"
+
+
+def enabled():
+    return os.getenv("ORPHAN_SWEEP_ENABLED", "false").lower() in ["true", "1", "yes"]
+
+
+def _age(file, now):
+    created = getattr(file, "create_time", None)
+    if not isinstance(created, datetime):
+        return None
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    return (now - created).total_seconds()
+
+
+def find_orphans(client, min_age, remove_stale=True):
+    # (orphaned files, number of uploads held by running jobs)
+    alive, stale = jobs.leased_files(remove_stale=remove_stale)
+    alive |= {job.uploaded_file.name for job in jobs.active_jobs() if job.uploaded_file}
+    now = datetime.now(timezone.utc)
+    orphans, held = [], 0
+    for file in client.files.list(config={"page_size": 100}):
+        if file.name in alive:
+            held += 1
+            continue
+        # Only recordings are ours to delete; other uploads under the key are left alone
+        if not (getattr(file, "mime_type", None) or "").startswith("audio/"):
+            continue
+        age = _age(file, now)
+        if file.name in stale or (age is not None and age > min_age):
+            orphans.append(file)
+    return orphans, held
+
+
+def _delete(client, file):
+    try:
+        client.files.delete(name=file.name)
+        return True
+    except Exception as e:
+        # Expired or deleted by its job since the listing
+        logger.warning(f"Failed to delete orphaned upload {file.name}: {e}")
+        ERRORS.inc(stage="orphan_sweep", type=type(e).__name__)
+        return False
+
+
+def sweep(client=None, min_age=None, concurrency=None, dry_run=False):
+    # One pass; returns {"files", "bytes", "failed", "in_flight"}
+    client = client or get_gemini_client()
+    min_age = min_age if min_age is not None else float(os.getenv("ORPHAN_MIN_AGE_SECONDS", "3600"))
+    concurrency = concurrency or int(os.getenv("ORPHAN_SWEEP_CONCURRENCY", "8"))
+
+    orphans, held = find_orphans(client, min_age, remove_stale=not dry_run)
+    result = {"files": 0, "bytes": 0, "failed": 0, "in_flight": held}
+    if dry_run:
+        result["files"] = len(orphans)
+        result["bytes"] = sum(getattr(file, "size_bytes", None) or 0 for file in orphans)
+        return result
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="orphan-sweep") as pool:
+        for file, deleted in zip(orphans, pool.map(lambda file: _delete(client, file), orphans)):
+            if not deleted:
+                result["failed"] += 1
+                continue
+            size = getattr(file, "size_bytes", None) or 0
+            result["files"] += 1
+            result["bytes"] += size
+            ORPHANS_DELETED.inc()
+            ORPHAN_BYTES_RECLAIMED.inc(size)
+
+    if result["files"] or result["failed"]:
+        logger.info(f"Deleted {result['files']} orphaned uploads, reclaiming {result['bytes']} bytes "
+                    f"({result['failed']} failed, {held} in flight)")
+    return result
+
+
+def _locked_sweep():
+    # Sweep unless another worker on this host is already sweeping
+    directory = jobs.control_dir()
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_NAME), "a") as lock:
+        if fcntl:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+        return sweep()
+
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def _loop(interval):
+    # First pass at startup reclaims what the previous deploy's workers left behind
+    while True:
+        try:
+            _locked_sweep()
+        except Exception as e:
+            logger.error(f"Orphaned upload sweep failed: {e}")
+        time.sleep(interval)
+
+
+def ensure_started():
+    global _sweeper
+    if not enabled():
+        return
+    with _sweeper_lock:
+        # Threads do not survive fork, so check liveness rather than existence
+        if _sweeper is None or not _sweeper.is_alive():
+            interval = float(os.getenv("ORPHAN_SWEEP_INTERVAL", "900"))
+            _sweeper = threading.Thread(target=_loop, args=(interval,), name="orphan-sweeper", daemon=True)
+            _sweeper.start()
+
+
+def main():
+    # python -m src.gemini_transcription_service.orphan_sweeper [--dry-run]
+    from dotenv import load_dotenv
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Delete Files API uploads left behind by crashed or killed jobs.")
+    parser.add_argument("--min-age", type=float, default=None, help="Seconds before an upload without a lease counts as orphaned.")
+    parser.add_argument("--concurrency", type=int, default=None, help="Deletes in flight.")
+    parser.add_argument("--dry-run", action="store_true", help="Report orphaned uploads without deleting them.")
+    args = parser.parse_args()
+    print(json.dumps(sweep(min_age=args.min_age, concurrency=args.concurrency, dry_run=args.dry_run), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Collision-free output files.
+# A transcript or summary is written to a temporary file in the target directory and then
+# linked to its final name. link() fails instead of replacing an existing file, so two jobs
+# finishing at once can never overwrite each other, and readers never see a partial file.
+# When the plain name is taken, the job ID (or a random ID) is appended to it.
+
+
+def _candidates(base_name, job_id):
+    yield base_name
+    if job_id:
+        yield f"{base_name}_{job_id}"
+    while True:
+        yield f"{base_name}_{uuid.uuid4().hex}"
+
+
+def _claim(tmp_path, path):
+    # Move tmp_path to path unless path exists; False when it does
+    try:
+        os.link(tmp_path, path)
+        return True
+    except FileExistsError:
+        return False
+    except OSError:
+        # No hard links on this filesystem: reserve the name, then replace the placeholder
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False
+        os.replace(tmp_path, path)
+        return True
+
+
+def write_output(directory, base_name, extension, content, job_id=None):
+    # Write text to directory/<base_name><extension> without replacing an existing file;
+    # returns the path actually used
+    directory = directory or ""
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".{base_name}{extension}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        for name in _candidates(base_name, job_id):
+            path = os.path.join(directory, f"{name}{extension}")
+            if _claim(tmp_path, path):
+                return path
+            logger.debug(f"{path} exists, trying another name")
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
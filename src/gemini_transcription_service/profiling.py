@@ -0,0 +1,226 @@
+import os
+import sys
+import glob
+import hmac
+import time
+import logging
+import cProfile
+import functools
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from .tracing import current_trace_id
+
+logger = logging.getLogger(__name__)
+
+# Opt-in profiling of jobs and requests.
+# A profile is taken when PROFILE_MODE is set, when a request carries X-Profile with a valid
+# X-Profile-Token, or while the per-worker admin switch is armed. "cprofile" writes a .prof
+# (pstats) file, "sampling" a wall-clock .collapsed stack file (flamegraph.pl/speedscope),
+# "all" both. Files go to PROFILE_DIR, keeping the newest PROFILE_MAX_FILES profiles.
+
+MODES = ("cprofile", "sampling", "all")
+
+_lock = threading.Lock()
+_active_threads = set()  # threads with a running profile; nested profiles are skipped
+_armed = {"mode": None, "remaining": 0}
+
+
+def _normalize(mode):
+    mode = (mode or "").strip().lower()
+    if mode in ("1", "true", "yes", "on"):
+        return "all"
+    return mode if mode in MODES else None
+
+
+def profile_dir():
+    return os.getenv("PROFILE_DIR", "./profiles")
+
+
+def arm(mode, count=1):
+    # Profile the next `count` requests/jobs in this process
+    mode = _normalize(mode)
+    with _lock:
+        _armed["mode"] = mode
+        _armed["remaining"] = max(int(count), 0) if mode else 0
+    return status()
+
+
+def status():
+    with _lock:
+        return {"env_mode": _normalize(os.getenv("PROFILE_MODE")), "armed_mode": _armed["mode"],
+                "armed_remaining": _armed["remaining"], "pid": os.getpid()}
+
+
+def _take_armed():
+    with _lock:
+        if _armed["remaining"] <= 0:
+            return None
+        _armed["remaining"] -= 1
+        return _armed["mode"]
+
+
+def header_mode(headers):
+    # X-Profile is honored only with the right X-Profile-Token
+    if not check_token(headers):
+        return None
+    return _normalize(headers.get("X-Profile"))
+
+
+def check_token(headers):
+    # Profiling controls are disabled unless PROFILE_TOKEN is set
+    token = os.getenv("PROFILE_TOKEN")
+    return bool(token) and hmac.compare_digest(headers.get("X-Profile-Token", ""), token)
+
+
+def resolve_mode(requested=None):
+    # Explicit request, then the armed switch, then PROFILE_MODE
+    return _normalize(requested) or _take_armed() or _normalize(os.getenv("PROFILE_MODE"))
+
+
+class StackSampler(threading.Thread):
+    # Samples one thread's stack at a fixed interval; counts collapsed stacks
+    def __init__(self, thread_id, interval):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class Profile:
+    def __init__(self, name, mode):
+        self.name = name
+        self.mode = mode
+        self.profiler = None
+        self.sampler = None
+        self.started = None
+        self.thread_id = threading.get_ident()
+        self.paths = []
+
+    def start(self):
+        self.started = time.monotonic()
+        if self.mode in ("cprofile", "all"):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                self.profiler = profiler
+            except ValueError as e:
+                # Only one deterministic profiler can run per interpreter
+                logger.warning(f"cProfile unavailable for {self.name}, sampling instead: {e}")
+                self.mode = "sampling"
+        if self.mode in ("sampling", "all"):
+            interval = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+            self.sampler = StackSampler(self.thread_id, interval)
+            self.sampler.start()
+        return self
+
+    def stop(self):
+        # May run on another thread than start() (streamed responses)
+        with _lock:
+            _active_threads.discard(self.thread_id)
+        if self.profiler:
+            self.profiler.disable()
+        if self.sampler:
+            self.sampler.stop()
+        try:
+            self.paths = self._write()
+            logger.info(f"Profile for {self.name} ({time.monotonic() - self.started:.2f}s) written to {', '.join(self.paths)}")
+        except OSError as e:
+            logger.warning(f"Failed to write profile for {self.name}: {e}")
+        return self.paths
+
+    def _write(self):
+        directory = profile_dir()
+        os.makedirs(directory, exist_ok=True)
+        label = "".join(c if c.isalnum() or c in "-_" else "_" for c in self.name).strip("_")[:60]
+        suffix = current_trace_id() or os.urandom(4).hex()
+        stem = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{os.getpid()}-{suffix}")
+
+        paths = []
+        if self.profiler:
+            self.profiler.dump_stats(f"{stem}.prof")
+            paths.append(f"{stem}.prof")
+        if self.sampler:
+            with open(f"{stem}.collapsed", "w", encoding="utf-8") as f:
+                for stack, count in self.sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            paths.append(f"{stem}.collapsed")
+        rotate(directory)
+        return paths
+
+
+def rotate(directory, max_files=None):
+    # Keep the newest profiles; .prof and .collapsed of one run count as one
+    max_files = max_files if max_files is not None else int(os.getenv("PROFILE_MAX_FILES", "50"))
+    runs = {}
+    for path in glob.glob(os.path.join(directory, "*.prof")) + glob.glob(os.path.join(directory, "*.collapsed")):
+        stem = os.path.splitext(path)[0]
+        try:
+            runs.setdefault(stem, []).append((os.path.getmtime(path), path))
+        except OSError:
+            continue
+    ordered = sorted(runs.values(), key=lambda files: max(mtime for mtime, _ in files), reverse=True)
+    for files in ordered[max_files:]:
+        for _, path in files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def recent_profiles(limit=20):
+    paths = glob.glob(os.path.join(profile_dir(), "*.prof")) + glob.glob(os.path.join(profile_dir(), "*.collapsed"))
+    paths.sort(key=lambda path: os.path.getmtime(path), reverse=True)
+    return [os.path.basename(path) for path in paths[:limit]]
+
+
+def start(name, mode=None):
+    # Begin a profile unless one is already running on this thread; returns None when off
+    thread_id = threading.get_ident()
+    with _lock:
+        if thread_id in _active_threads:
+            return None
+    mode = resolve_mode(mode)
+    if not mode:
+        return None
+    with _lock:
+        _active_threads.add(thread_id)
+    return Profile(name, mode).start()
+
+
+@contextmanager
+def profile(name, mode=None):
+    current = start(name, mode)
+    try:
+        yield current
+    finally:
+        if current:
+            current.stop()
+
+
+def profiled(name):
+    # Decorator form of profile()
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
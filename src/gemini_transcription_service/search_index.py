@@ -0,0 +1,210 @@
+import os
+import re
+import json
+import html
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Full-text transcript search.
+# With SEARCH_INDEX_ENABLED, every saved transcript is split into its segments and added to a
+# SQLite FTS5 index (SEARCH_INDEX_PATH) with speaker and timestamp. Indexing is incremental,
+# one transaction per transcript, and saving a transcript again replaces its entries. Searches
+# are answered from the index alone, ranked by BM25, without reading transcript files.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    job_id TEXT,
+    segment_count INTEGER NOT NULL,
+    indexed REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5(
+    text,
+    speaker,
+    timestamp UNINDEXED,
+    transcript_id UNINDEXED,
+    position UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# Snippet markers that can't occur in transcripts; replaced after HTML-escaping the text
+_MARK_START, _MARK_END = "\x02", "\x03"
+_TOKEN = re.compile(r'"[^"]*"|\S+')
+
+
+def enabled():
+    return os.getenv("SEARCH_INDEX_ENABLED", "false").lower() in ["true", "1", "yes"]
+
+
+def match_query(text):
+    # User input as an FTS5 query: every word (or "quoted phrase") must occur; the last word may be a prefix
+    terms = []
+    for token in _TOKEN.findall(text or ""):
+        words = token.strip('"').replace('"', '""').strip()
+        if words:
+            terms.append(f'"{words}"')
+    if not terms:
+        return None
+    if not text.rstrip().endswith('"'):
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+class SearchIndex:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        # One connection per thread (and per process after a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def add(self, path, segments, job_id=None):
+        # Index (or re-index) one transcript; segments are dicts with speaker, timestamp and text
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._delete(conn, path)
+            cursor = conn.execute(
+                "INSERT INTO transcripts (path, job_id, segment_count, indexed) VALUES (?, ?, ?, ?)",
+                (path, job_id, len(segments), time.time()),
+            )
+            transcript_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO segments (text, speaker, timestamp, transcript_id, position) VALUES (?, ?, ?, ?, ?)",
+                [(segment.get("text", ""), segment.get("speaker", ""), segment.get("timestamp", ""), transcript_id, position)
+                 for position, segment in enumerate(segments)],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def remove(self, path):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._delete(conn, path)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _delete(conn, path):
+        row = conn.execute("SELECT id FROM transcripts WHERE path = ?", (path,)).fetchone()
+        if row:
+            conn.execute("DELETE FROM segments WHERE transcript_id = ?", (row["id"],))
+            conn.execute("DELETE FROM transcripts WHERE id = ?", (row["id"],))
+
+    def search(self, text, limit=20, offset=0, speaker=None):
+        # Ranked segment hits; snippets are HTML-escaped with matches in <mark>
+        query = match_query(text)
+        if query is None:
+            return []
+        sql = (
+            "SELECT t.path, t.job_id, s.speaker, s.timestamp, s.position, "
+            f"snippet(segments, 0, '{_MARK_START}', '{_MARK_END}', '…', 16) AS snippet, bm25(segments) AS score "
+            "FROM segments s JOIN transcripts t ON t.id = s.transcript_id WHERE segments MATCH ?"
+        )
+        params = [query]
+        if speaker:
+            sql += " AND s.speaker = ?"
+            params.append(speaker)
+        sql += " ORDER BY rank LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        hits = []
+        for row in self._connection().execute(sql, params):
+            hit = dict(row)
+            hit["snippet"] = html.escape(hit["snippet"]).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+            hit["score"] = round(-hit["score"], 4)
+            hits.append(hit)
+        return hits
+
+    def stats(self):
+        row = self._connection().execute("SELECT COUNT(*) AS transcripts, COALESCE(SUM(segment_count), 0) AS segments FROM transcripts").fetchone()
+        return dict(row)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    # The process-wide index, or None when SEARCH_INDEX_ENABLED is off
+    global _index
+    if not enabled():
+        return None
+    path = os.getenv("SEARCH_INDEX_PATH", "./search.db")
+    with _index_lock:
+        if _index is None or _index.path != path:
+            _index = SearchIndex(path)
+        return _index
+
+
+def index_transcript(path, segments, job_id=None):
+    # Add a saved transcript; indexing problems never fail the save
+    index = get_index()
+    if index is None or not path:
+        return
+    try:
+        index.add(os.path.abspath(path), segments, job_id=job_id)
+    except sqlite3.Error as e:
+        logger.warning(f"Failed to index {path}: {e}")
+
+
+def remove_transcript(path):
+    index = get_index()
+    if index is None:
+        return
+    try:
+        index.remove(os.path.abspath(path))
+    except sqlite3.Error as e:
+        logger.warning(f"Failed to remove {path} from the search index: {e}")
+
+
+def main():
+    # python -m src.gemini_transcription_service.search_index --add transcripts/ | --query "budget"
+    from .transcript_processor import parse_transcript
+    parser = argparse.ArgumentParser(description="Build or query the transcript search index.")
+    parser.add_argument("--path", default=os.getenv("SEARCH_INDEX_PATH", "./search.db"), help="Index database.")
+    parser.add_argument("--add", nargs="+", metavar="DIR", help="Index the *_transcript*.txt files below these folders.")
+    parser.add_argument("--query", help="Search the index.")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    index = SearchIndex(args.path)
+
+    for directory in args.add or []:
+        for root, _, names in os.walk(directory):
+            for name in names:
+                if "_transcript" in name and name.endswith(".txt"):
+                    path = os.path.abspath(os.path.join(root, name))
+                    with open(path, encoding="utf-8") as f:
+                        index.add(path, parse_transcript(f.read()))
+    if args.query:
+        print(json.dumps(index.search(args.query, limit=args.limit), indent=2, ensure_ascii=False))
+    else:
+        print(json.dumps(index.stats()))
+
+
+if __name__ == "__main__":
+    main()
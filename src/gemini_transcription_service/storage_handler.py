@@ -1,15 +1,33 @@
 import os
 import time
+import asyncio
 import logging
 import mimetypes
-from google import genai
-from google.cloud import storage
-from google.cloud.exceptions import GoogleCloudError
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
+from .clients import get_storage_client, bucket_exists
+from . import compression
+from .metrics import UPLOAD_SECONDS, UPLOADED_BYTES, PROCESSING_WAIT_SECONDS, ERRORS
+from .tracing import span, traced
+from .watchdog import stage, progress
+
+# google.cloud.storage is imported by get_storage_client only when GCS storage is enabled
+if TYPE_CHECKING:
+    from google import genai
 
 logger = logging.getLogger(__name__)
 
+MIME_TYPES = {
+    '.mp3': 'audio/mpeg',
+    '.wav': 'audio/wav',
+    '.m4a': 'audio/mp4',
+    '.ogg': 'audio/ogg',
+    '.flac': 'audio/flac',
+    '.aac': 'audio/aac',
+    '.mp4': 'video/mp4',
+    '.webm': 'video/webm'
+}
+
 
 @dataclass
 class StorageConfig:
@@ -57,9 +75,9 @@ class StorageHandler:
             
         try:
             logger.info(f"Connecting to {self.config.bucket}")
-            self.client = storage.Client()
+            self.client = get_storage_client()
             
-            if not self.client.bucket(self.config.bucket).exists():
+            if not bucket_exists(self.client, self.config.bucket):
                 logger.warning(f"Bucket not found: {self.config.bucket}")
                 return False
                 
@@ -81,29 +99,52 @@ class StorageHandler:
 
         try:
             bucket = self.client.bucket(self.config.bucket)
-
-            if not dest_path:
-                name = os.path.basename(path)
-
-                # Add timestamp to filename to prevent overwriting by default
-                if prevent_overwrite:
-                    import time
-                    timestamp = time.strftime("%Y%m%d_%H%M%S")
-                    name_parts = os.path.splitext(name)
-                    name = f"{name_parts[0]}_{timestamp}{name_parts[1]}"
-
-                dest_path = f"{self.config.prefix}{name}"
-
+            dest_path = dest_path or self._destination(os.path.basename(path), prevent_overwrite)
             blob = bucket.blob(dest_path)
-            blob.upload_from_filename(path)
+            target = f"gcs_{self.file_type}"
+            with UPLOAD_SECONDS.time(target=target), span(f"upload.{target}", destination=dest_path), \
+                    stage(f"upload.{target}", bytes_total=os.path.getsize(path)):
+                size = self._upload_blob(blob, path)
+            UPLOADED_BYTES.inc(size, target=target)
 
             uri = f"gs://{self.config.bucket}/{dest_path}"
             logger.info(f"Uploaded to {uri}")
             return uri
         except Exception as e:
             logger.error(f"Upload failed: {e}")
+            ERRORS.inc(stage=f"gcs_{self.file_type}_upload", type=type(e).__name__)
             return None
 
+    def _upload_blob(self, blob, path: str) -> int:
+        # Upload path to blob; returns the bytes sent
+        if compression.gcs_enabled() and compression.compressible(path):
+            # Stored gzip-encoded: GCS serves it compressed to clients that accept gzip
+            # and decompresses it for the others
+            with open(path, "rb") as f:
+                data = compression.compress(f.read(), "gzip")
+            blob.content_encoding = "gzip"
+            blob.upload_from_string(data, content_type=f"{mimetypes.guess_type(path)[0] or 'text/plain'}; charset=utf-8")
+            return len(data)
+        blob.upload_from_filename(path)
+        return os.path.getsize(path)
+
+    def _destination(self, name: str, prevent_overwrite: bool = True) -> str:
+        # Add timestamp to filename to prevent overwriting by default
+        if prevent_overwrite:
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+            name_parts = os.path.splitext(name)
+            name = f"{name_parts[0]}_{timestamp}{name_parts[1]}"
+        return f"{self.config.prefix}{name}"
+
+    def open_writer(self, name: str, content_type: Optional[str] = None, prevent_overwrite: bool = True):
+        # Writable resumable upload to GCS for data that is still arriving; returns (writer, uri)
+        if not self.config.enabled or not self.client:
+            return None, None
+        dest_path = self._destination(name, prevent_overwrite)
+        blob = self.client.bucket(self.config.bucket).blob(dest_path)
+        writer = blob.open("wb", content_type=content_type, ignore_flush=True)
+        return writer, f"gs://{self.config.bucket}/{dest_path}"
+
     def is_enabled(self) -> bool:
         # Check if storage is enabled and client exists
         return self.config.enabled and self.client is not None
@@ -124,70 +165,166 @@ class SummaryStorageHandler(StorageHandler):
         super().__init__(file_type="summary")
 
 
-def upload_file(client: genai.Client, path: str, store_audio: Optional[bool] = None) -> Optional[genai.types.File]:
-    # Upload file to Gemini API with optional GCS backup
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"File not found: {path}")
+def guess_mime_type(path: str) -> str:
+    # MIME type from the file name, with fallbacks for audio types mimetypes may not know
+    mime_type = mimetypes.guess_type(path)[0]
+    if not mime_type:
+        ext = os.path.splitext(path)[1].lower()
+        mime_type = MIME_TYPES.get(ext, 'application/octet-stream')
+        logger.info(f"Mime type not detected automatically, using {mime_type} for {ext}")
+    return mime_type
+
 
+def backup_audio(path: str, store_audio: Optional[bool] = None) -> Optional[str]:
+    # Copy the recording to the audio bucket when enabled; returns the gs:// URI
     if store_audio is None:
         store_audio = os.getenv("AUDIO_STORAGE_ENABLED", "false").lower() in ["true", "1", "yes"]
-    
-    backup_uri = None
-    if store_audio:
-        try:
-            handler = StorageHandler(file_type="audio")
-            if handler.initialize():
-                backup_uri = handler.upload_file(path)
-        except Exception as e:
-            logger.warning(f"GCS backup failed: {e}")
+    if not store_audio:
+        return None
+
+    try:
+        handler = StorageHandler(file_type="audio")
+        if handler.initialize():
+            return handler.upload_file(path)
+    except Exception as e:
+        logger.warning(f"GCS backup failed: {e}")
+    return None
+
+
+class GeminiUploadSession:
+    # Resumable Files API upload fed piece by piece, for data whose size is not known up front.
+    # Non-final pieces must be multiples of `granularity` bytes.
+    def __init__(self, display_name: str, mime_type: str, size: Optional[int] = None):
+        self.display_name = display_name
+        self.mime_type = mime_type
+        self.size = size
+        self.upload_url = None
+        self.granularity = 8 * 1024 * 1024
+        self.offset = 0
+        self.http = None
+
+    def start(self):
+        import httpx
+
+        base_url = (os.getenv("GEMINI_BASE_URL") or "https://generativelanguage.googleapis.com").rstrip("/")
+        self.http = httpx.Client(timeout=httpx.Timeout(300.0, connect=30.0))
+        headers = {
+            "x-goog-api-key": os.getenv("GEMINI_API_KEY", ""),
+            "X-Goog-Upload-Protocol": "resumable",
+            "X-Goog-Upload-Command": "start",
+            "X-Goog-Upload-Header-Content-Type": self.mime_type,
+        }
+        if self.size:
+            headers["X-Goog-Upload-Header-Content-Length"] = str(self.size)
+        response = self.http.post(f"{base_url}/upload/v1beta/files", headers=headers,
+                                  json={"file": {"displayName": self.display_name, "mimeType": self.mime_type}})
+        response.raise_for_status()
+        self.upload_url = response.headers["X-Goog-Upload-URL"]
+        self.granularity = int(response.headers.get("X-Goog-Upload-Chunk-Granularity", self.granularity))
+        return self
+
+    def send(self, data: bytes, finalize: bool = False):
+        # Upload the next piece; the final piece returns the File resource
+        command = "upload, finalize" if finalize else "upload"
+        response = self.http.post(self.upload_url, content=bytes(data), headers={
+            "X-Goog-Upload-Command": command,
+            "X-Goog-Upload-Offset": str(self.offset),
+        })
+        response.raise_for_status()
+        self.offset += len(data)
+        status = response.headers.get("X-Goog-Upload-Status")
+        if not finalize:
+            if status != "active":
+                raise ValueError(f"Upload interrupted at byte {self.offset}: {status}")
+            return None
+
+        self.close()
+        if status != "final":
+            raise ValueError(f"Upload not finalized: {status}")
+        from google.genai import types
+        return types.File.model_validate(response.json()["file"])
+
+    def cancel(self):
+        if self.upload_url and self.http:
+            try:
+                self.http.post(self.upload_url, headers={"X-Goog-Upload-Command": "cancel"})
+            except Exception as e:
+                logger.warning(f"Cancelling upload of {self.display_name} failed: {e}")
+        self.close()
+
+    def close(self):
+        if self.http:
+            self.http.close()
+            self.http = None
+
+
+def wait_for_processing(client: "genai.Client", file: "genai.types.File", cancel=None) -> "genai.types.File":
+    # Poll until the Files API has processed the upload; failed files are deleted.
+    # With a jobs.CancelToken the wait stops as soon as the job is cancelled.
+    with PROCESSING_WAIT_SECONDS.time(), span("upload.processing_wait") as wait, \
+            stage("upload.processing_wait", file=file.name, polls=0) as watch:
+        polls = 0
+        while file.state.name == "PROCESSING":
+            if cancel is not None:
+                cancel.wait(5)
+                cancel.raise_if_cancelled()
+            else:
+                time.sleep(5)
+            file = client.files.get(name=file.name)
+            polls += 1
+            progress(watch, polls=polls, state=file.state.name)
+        wait.set_attribute("polls", polls)
+
+    if file.state.name == "ACTIVE":
+        logger.info(f"File ready: {file.name}")
+        return file
+
+    try:
+        client.files.delete(name=file.name)
+    except:
+        pass
+
+    raise ValueError(f"File processing failed: {file.state.name}")
+
+
+@traced("upload")
+def upload_file(client: "genai.Client", path: str, store_audio: Optional[bool] = None, cancel=None, on_upload=None) -> Optional["genai.types.File"]:
+    # Upload file to Gemini API with optional GCS backup.
+    # on_upload(file) runs as soon as the Files API has the file, before the processing wait,
+    # e.g. to record it for cleanup (jobs.attach_upload)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"File not found: {path}")
+
+    backup_uri = backup_audio(path, store_audio)
 
     file = None 
     try:
         name = os.path.basename(path)
         logger.info(f"Uploading {name} to Gemini")
-        
-        # Determine MIME type
-        mime_type = mimetypes.guess_type(path)[0]
-        if not mime_type:
-            ext = os.path.splitext(path)[1].lower()
-            mime_map = {
-                '.mp3': 'audio/mpeg',
-                '.wav': 'audio/wav',
-                '.m4a': 'audio/mp4',
-                '.ogg': 'audio/ogg',
-                '.flac': 'audio/flac',
-                '.aac': 'audio/aac',
-                '.mp4': 'video/mp4',
-                '.webm': 'video/webm'
-            }
-            mime_type = mime_map.get(ext, 'application/octet-stream')
-            logger.info(f"Mime type not detected automatically, using {mime_type} for {ext}")
-        
+        mime_type = guess_mime_type(path)
+
         # Use config paramer instead of passing directly
-        file = client.files.upload(
-            file=str(path),
-            config={"mime_type": mime_type}
-        )
+        with UPLOAD_SECONDS.time(target="gemini"), span("upload.gemini", mime_type=mime_type, bytes=os.path.getsize(path)), \
+                stage("upload.gemini", bytes_total=os.path.getsize(path)):
+            file = client.files.upload(
+                file=str(path),
+                config={"mime_type": mime_type}
+            )
+        UPLOADED_BYTES.inc(os.path.getsize(path), target="gemini")
+        if on_upload:
+            on_upload(file)
 
         # Wait for file processing to complete
-        while file.state.name == "PROCESSING":
-            time.sleep(5)  
-            file = client.files.get(name=file.name)
-
-        if file.state.name == "ACTIVE":
-            logger.info(f"File ready: {file.name}")
-            if backup_uri:
-                logger.info(f"Backup at: {backup_uri}")
-            return file
-        
-        try:
-            client.files.delete(name=file.name)
-        except:
-            pass
-        
-        raise ValueError(f"File processing failed: {file.state.name}")
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        file = wait_for_processing(client, file, cancel)
+        if backup_uri:
+            logger.info(f"Backup at: {backup_uri}")
+        return file
     except Exception as e:
-        logger.error(f"Upload error: {e}")
+        if cancel is None or not cancel.cancelled:
+            logger.error(f"Upload error: {e}")
+            ERRORS.inc(stage="gemini_upload", type=type(e).__name__)
         if file:
             try:
                 client.files.delete(name=file.name)
@@ -196,7 +333,7 @@ def upload_file(client: genai.Client, path: str, store_audio: Optional[bool] = N
         raise
 
 
-def delete_uploaded_file(client: genai.Client, file: genai.types.File):
+def delete_uploaded_file(client: "genai.Client", file: "genai.types.File"):
     # Clean up file from Gemini API
     if not file or not file.name:
         return
@@ -205,4 +342,75 @@ def delete_uploaded_file(client: genai.Client, file: genai.types.File):
         client.files.delete(name=file.name)
         logger.info(f"Deleted {file.name}")
     except Exception as e:
-        logger.warning(f"Delete failed: {e}")
\ No newline at end of file
+        logger.warning(f"Delete failed: {e}")
+
+# Async counterparts on the SDK's async client (client.aio). GCS has no async client, so the
+# audio backup runs in a worker thread.
+
+async def wait_for_processing_async(client: "genai.Client", file: "genai.types.File") -> "genai.types.File":
+    # Async wait_for_processing
+    with PROCESSING_WAIT_SECONDS.time(), span("upload.processing_wait") as wait, \
+            stage("upload.processing_wait", file=file.name, polls=0) as watch:
+        polls = 0
+        while file.state.name == "PROCESSING":
+            await asyncio.sleep(5)
+            file = await client.aio.files.get(name=file.name)
+            polls += 1
+            progress(watch, polls=polls, state=file.state.name)
+        wait.set_attribute("polls", polls)
+
+    if file.state.name == "ACTIVE":
+        logger.info(f"File ready: {file.name}")
+        return file
+
+    await delete_uploaded_file_async(client, file)
+    raise ValueError(f"File processing failed: {file.state.name}")
+
+
+@traced("upload")
+async def upload_file_async(client: "genai.Client", path: str, store_audio: Optional[bool] = None, on_upload=None) -> Optional["genai.types.File"]:
+    # Async upload_file; the GCS backup runs alongside the Gemini upload
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"File not found: {path}")
+
+    backup = asyncio.create_task(asyncio.to_thread(backup_audio, path, store_audio))
+    file = None
+    try:
+        logger.info(f"Uploading {os.path.basename(path)} to Gemini")
+        mime_type = guess_mime_type(path)
+        size = os.path.getsize(path)
+        with UPLOAD_SECONDS.time(target="gemini"), span("upload.gemini", mime_type=mime_type, bytes=size), \
+                stage("upload.gemini", bytes_total=size):
+            file = await client.aio.files.upload(file=str(path), config={"mime_type": mime_type})
+        UPLOADED_BYTES.inc(size, target="gemini")
+        if on_upload:
+            on_upload(file)
+
+        file = await wait_for_processing_async(client, file)
+        backup_uri = await backup
+        if backup_uri:
+            logger.info(f"Backup at: {backup_uri}")
+        return file
+    except BaseException as e:
+        if not isinstance(e, asyncio.CancelledError):
+            logger.error(f"Upload error: {e}")
+            ERRORS.inc(stage="gemini_upload", type=type(e).__name__)
+        if file:
+            await delete_uploaded_file_async(client, file)
+        raise
+    finally:
+        # The backup thread cannot be interrupted; let it finish in the background
+        if not backup.done():
+            backup.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+
+async def delete_uploaded_file_async(client: "genai.Client", file: "genai.types.File"):
+    # Async delete_uploaded_file
+    if not file or not file.name:
+        return
+
+    try:
+        await client.aio.files.delete(name=file.name)
+        logger.info(f"Deleted {file.name}")
+    except Exception as e:
+        logger.warning(f"Delete failed: {e}")
@@ -1,19 +1,134 @@
 import os
 import logging
 import json
+import re
 import time
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
 
 from .config import SAFETY_SETTINGS
 from .transcription_logic import configure_generation
 from .storage_handler import SummaryStorageHandler
+from .transcript_processor import apply_speaker_mapping
+from .clients import get_gemini_client
+from .metrics import SUMMARY_SECONDS, ERRORS
+from .usage import UsageRecord
+from .outputs import write_output
+from .tracing import span
+from .watchdog import stage
 
-# Load environment variables from .env file
-load_dotenv(override=True)
 logger = logging.getLogger(__name__)
 
+# Summary sections: key -> (heading, is_list)
+SUMMARY_SECTIONS = {
+    "overview": ("Meeting Overview", False),
+    "discussion_points": ("Key Discussion Points", True),
+    "decisions": ("Decisions Made", True),
+    "action_items": ("Action Items", True),
+    "follow_up": ("Follow-up", True),
+}
+
+SECTION_DESCRIPTIONS = {
+    "overview": "A brief 1-2 sentence overview",
+    "discussion_points": "Main topics discussed",
+    "decisions": "Decisions made",
+    "action_items": "Tasks with assignees, e.g. 'Send the report (Alice)'",
+    "follow_up": "Recommendations for next steps",
+}
+
+
+def summary_schema(keys=None):
+    # JSON schema for the whole summary or a subset of its sections
+    keys = list(keys or SUMMARY_SECTIONS)
+    properties = {}
+    for key in keys:
+        _, is_list = SUMMARY_SECTIONS[key]
+        if is_list:
+            properties[key] = {"type": "ARRAY", "description": SECTION_DESCRIPTIONS[key], "items": {"type": "STRING"}}
+        else:
+            properties[key] = {"type": "STRING", "description": SECTION_DESCRIPTIONS[key]}
+    return {"type": "OBJECT", "properties": properties, "required": keys}
+
+
+def section_format():
+    # Text layout for summaries generated as text (streamed and free-form regenerated ones); the
+    # same sections as summary_schema, written the way format_summary renders them
+    lines = []
+    for key, (heading, is_list) in SUMMARY_SECTIONS.items():
+        lines.append(f"## {heading}")
+        lines.append(f"- {SECTION_DESCRIPTIONS[key]}, one per bullet" if is_list else SECTION_DESCRIPTIONS[key])
+    return "\n".join(lines)
+
+
+def valid_sections(sections):
+    # Sections as sent by a client: known keys with text, or lists of text for list sections
+    if not isinstance(sections, dict):
+        return False
+    for key, value in sections.items():
+        if key not in SUMMARY_SECTIONS:
+            return False
+        if isinstance(value, str):
+            continue
+        if SUMMARY_SECTIONS[key][1] and isinstance(value, list) and all(isinstance(item, str) for item in value):
+            continue
+        return False
+    return True
+
+
+def format_summary(sections):
+    # Render structured sections as the plain text summary
+    blocks = []
+    for key, (heading, is_list) in SUMMARY_SECTIONS.items():
+        value = sections.get(key)
+        if not value:
+            continue
+        if is_list:
+            items = [value] if isinstance(value, str) else value
+            body = "\n".join(f"- {item.strip()}" for item in items if item and item.strip())
+        else:
+            body = value.strip()
+        blocks.append(f"## {heading}\n{body}")
+    return "\n\n".join(blocks)
+
+
+_HEADING_KEYS = {heading.lower(): key for key, (heading, _) in SUMMARY_SECTIONS.items()}
+_HEADING_RE = re.compile(r"^\s*(?:#+\s*|-\s*)?\**\s*(" + "|".join(re.escape(h) for h in _HEADING_KEYS) + r")\s*\**\s*:?\s*\**\s*$", re.IGNORECASE)
+_BULLET_RE = re.compile(r"^\s*(?:[-*\u2022]|\d+[.)])\s+")
+
+
+def parse_summary(summary):
+    # Split a text summary back into sections by its headings
+    sections = {}
+    current = None
+    lines = []
+
+    def flush():
+        if current is None:
+            return
+        if SUMMARY_SECTIONS[current][1]:
+            sections[current] = [_BULLET_RE.sub("", line).strip() for line in lines if line.strip()]
+        else:
+            sections[current] = " ".join(line.strip() for line in lines if line.strip())
+
+    for line in summary.splitlines():
+        match = _HEADING_RE.match(line)
+        if match:
+            flush()
+            current = _HEADING_KEYS[match.group(1).lower()]
+            lines = []
+        elif current is not None:
+            lines.append(line)
+    flush()
+    return sections
+
+
+def normalize_summary(summary):
+    # (text, sections) of a text summary, re-rendered by format_summary so every path gives the
+    # same layout; text the headings can't be found in is kept as it is
+    sections = parse_summary(summary or "")
+    if not sections:
+        return (summary or "").strip(), {}
+    return format_summary(sections), sections
+
+
 class SummaryGenerator:
     def __init__(self, client=None):
         # Reuse client or create new one
@@ -23,79 +138,74 @@ class SummaryGenerator:
             api_key = os.getenv("GEMINI_API_KEY")
             if not api_key:
                 raise ValueError("GEMINI_API_KEY environment variable not set")
-            self.client = genai.Client(api_key=api_key)
+            self.client = get_gemini_client()
 
         # Model params
         self.model_name = os.getenv("MODEL_NAME", "gemini-2.5-flash-preview-04-17")
         self.temperature = float(os.getenv("TEMPERATURE", "1.0"))
         self.max_tokens = int(os.getenv("MAX_OUTPUT_TOKENS", "32768"))
 
-    def generate_summary(self, transcript, speaker_mapping=None):
-        if not transcript or not transcript.strip():
-            logger.warning("Cannot generate summary: Empty transcript provided")
-            return ""
+        # Token usage of every call made by this generator
+        self.usage = UsageRecord(model=self.model_name)
 
-        try:
-            # Replace speaker IDs with names if provided
-            processed_transcript = transcript
-            if speaker_mapping and isinstance(speaker_mapping, dict):
-                for speaker_id, real_name in speaker_mapping.items():
-                    if real_name and f"[{speaker_id}]" in processed_transcript:
-                         processed_transcript = processed_transcript.replace(f"[{speaker_id}]", f"[{real_name}]")
-                    elif real_name and speaker_id in processed_transcript:
-                        processed_transcript = processed_transcript.replace(speaker_id, real_name)
-
-            # Prompt for meeting summary
-            prompt = f"""Create a comprehensive meeting summary based on the transcript below.
+    def _summary_prompt(self, transcript, speaker_mapping=None):
+        # Replace speaker IDs with names if provided
+        processed_transcript = apply_speaker_mapping(transcript, speaker_mapping)
+
+        # Prompt for meeting summary
+        return f"""Create a comprehensive meeting summary based on the transcript below.
 
             Follow these guidelines:
             1. Identify the key discussion points, decisions made, and action items
             2. Maintain a professional, objective tone
-            3. Structure the summary with clear headings for main topics
-            4. Include who was responsible for each action item when mentioned
-            5. Keep the summary complete but avoid including unnecessary details
+            3. Include who was responsible for each action item when mentioned
+            4. Keep the summary complete but avoid including unnecessary details
+            5. Write every section below, with exactly these headings; write "- None" when nothing applies
 
             Transcript:
             {processed_transcript}
 
-            Format the summary with these sections:
-            - Meeting Overview: A brief 1-2 sentence overview
-            - Key Discussion Points: Bulleted list of main topics discussed
-            - Decisions Made: Bulleted list of decisions
-            - Action Items: Bulleted list of tasks with assignees
-            - Follow-up: Recommendations for next steps
+            Format:
+{section_format()}
             """
 
-            # Config
-            gen_config = configure_generation(
-                temperature=self.temperature,
-                max_tokens=self.max_tokens
-            )
+    def _structured_prompt(self, transcript, speaker_mapping=None):
+        # Prompt for summary sections as JSON
+        processed_transcript = apply_speaker_mapping(transcript, speaker_mapping)
 
-            gen_config.response_schema = None
-            gen_config.response_mime_type = "text/plain"
+        return f"""Create a comprehensive meeting summary based on the transcript below.
 
-            # API call
-            response = self.client.models.generate_content(
-                model=f"models/{self.model_name}",
-                contents=prompt,
-                config=gen_config
-            )
+            Follow these guidelines:
+            1. Identify the key discussion points, decisions made, and action items
+            2. Maintain a professional, objective tone
+            3. Include who was responsible for each action item when mentioned
+            4. Keep the summary complete but avoid including unnecessary details
+            5. Fill every field of the response schema; use an empty list when nothing applies
 
-            return response.text.strip() if hasattr(response, 'text') else ""
+            Transcript:
+            {processed_transcript}
+            """
 
-        except Exception as e:
-            logger.error(f"Error generating summary: {e}", exc_info=True)
-            return ""
+    def _section_prompt(self, original_transcript, sections, section, feedback):
+        # Prompt for a single section, with the rest of the summary as context
+        heading, _ = SUMMARY_SECTIONS[section]
+        return f"""Rewrite only the "{heading}" section of the meeting summary based on the provided feedback.
 
-    def regenerate_summary(self, original_transcript, previous_summary, feedback):
-        if not all([original_transcript, previous_summary, feedback]):
-            logger.warning("Cannot regenerate summary: Missing required inputs")
-            return ""
+            Original Meeting Transcript:
+            {original_transcript}
 
-        try:
-            # Prompt for improved summary
-            prompt = f"""Improve the meeting summary based on the provided feedback.
+            Current Summary:
+            {format_summary(sections)}
+
+            User Feedback on the "{heading}" section:
+            {feedback}
+
+            Return only the improved "{heading}" section.
+            """
+
+    def _regenerate_prompt(self, original_transcript, previous_summary, feedback):
+        # Prompt for improved summary
+        return f"""Improve the meeting summary based on the provided feedback.
 
             Original Meeting Transcript:
             {original_transcript}
@@ -106,30 +216,209 @@ class SummaryGenerator:
             User Feedback:
             {feedback}
 
-            Create an improved summary that addresses the feedback while maintaining the same structure.
+            Create an improved summary that addresses the feedback, with exactly these headings:
+{section_format()}
             """
 
-            gen_config = configure_generation(
-                temperature=self.temperature,
-                max_tokens=self.max_tokens
+    def _text_config(self):
+        # Plain text output, no transcript schema
+        gen_config = configure_generation(
+            temperature=self.temperature,
+            max_tokens=self.max_tokens
+        )
+
+        gen_config.response_schema = None
+        gen_config.response_mime_type = "text/plain"
+        return gen_config
+
+    def _json_config(self, schema):
+        # Output constrained to a JSON schema
+        gen_config = configure_generation(
+            temperature=self.temperature,
+            max_tokens=self.max_tokens
+        )
+        gen_config.response_schema = schema
+        return gen_config
+
+    def _generate_json(self, prompt, schema):
+        # Blocking API call constrained to a JSON schema
+        with SUMMARY_SECONDS.time(mode="structured"), span("summary.generate", mode="structured"), stage("summary"):
+            response = self.client.models.generate_content(
+                model=f"models/{self.model_name}",
+                contents=prompt,
+                config=self._json_config(schema)
             )
+        return self._parse_json(response)
 
-            gen_config.response_schema = None
-            gen_config.response_mime_type = "text/plain"
-
+    async def _generate_json_async(self, prompt, schema):
+        # _generate_json on the async client
+        with SUMMARY_SECONDS.time(mode="structured"), span("summary.generate", mode="structured"), stage("summary"):
+            response = await self.client.aio.models.generate_content(
+                model=f"models/{self.model_name}",
+                contents=prompt,
+                config=self._json_config(schema)
+            )
+        return self._parse_json(response)
+
+    def _parse_json(self, response):
+        self.usage.add(getattr(response, "usage_metadata", None), model=self.model_name)
+        text = response.text if hasattr(response, 'text') else None
+        data = json.loads(text) if text else {}
+        if not isinstance(data, dict):
+            raise ValueError(f"Expected a JSON object, got {type(data).__name__}")
+        return data
+
+    def _generate_text(self, prompt):
+        # Blocking API call
+        with SUMMARY_SECONDS.time(mode="text"), span("summary.generate", mode="text"), stage("summary"):
             response = self.client.models.generate_content(
                 model=f"models/{self.model_name}",
                 contents=prompt,
-                config=gen_config
+                config=self._text_config()
+            )
+
+        self.usage.add(getattr(response, "usage_metadata", None), model=self.model_name)
+        return response.text.strip() if hasattr(response, 'text') else ""
+
+    def _stream_text(self, prompt):
+        # Streaming API call, yields text as it arrives
+        # Not activated: the caller's context changes between yields
+        with SUMMARY_SECONDS.time(mode="stream"), span("summary.generate", activate=False, mode="stream"):
+            stream = self.client.models.generate_content_stream(
+                model=f"models/{self.model_name}",
+                contents=prompt,
+                config=self._text_config()
+            )
+            usage_metadata = None
+            for chunk in stream:
+                if getattr(chunk, "usage_metadata", None) is not None:
+                    usage_metadata = chunk.usage_metadata
+                if chunk.text:
+                    yield chunk.text
+            self.usage.add(usage_metadata, model=self.model_name)
+
+    async def _stream_text_async(self, prompt):
+        # _stream_text on the async client
+        with SUMMARY_SECONDS.time(mode="stream"), span("summary.generate", activate=False, mode="stream"):
+            stream = await self.client.aio.models.generate_content_stream(
+                model=f"models/{self.model_name}",
+                contents=prompt,
+                config=self._text_config()
             )
+            usage_metadata = None
+            async for chunk in stream:
+                if getattr(chunk, "usage_metadata", None) is not None:
+                    usage_metadata = chunk.usage_metadata
+                if chunk.text:
+                    yield chunk.text
+            self.usage.add(usage_metadata, model=self.model_name)
+
+    def generate_summary_sections(self, transcript, speaker_mapping=None):
+        # Structured summary keyed by SUMMARY_SECTIONS
+        if not transcript or not transcript.strip():
+            logger.warning("Cannot generate summary: Empty transcript provided")
+            return {}
+
+        try:
+            data = self._generate_json(self._structured_prompt(transcript, speaker_mapping), summary_schema())
+            return {key: data[key] for key in SUMMARY_SECTIONS if key in data}
+        except Exception as e:
+            logger.error(f"Error generating summary: {e}", exc_info=True)
+            ERRORS.inc(stage="summary", type=type(e).__name__)
+            return {}
+
+    def generate_summary(self, transcript, speaker_mapping=None):
+        # Text rendering of the structured summary
+        return format_summary(self.generate_summary_sections(transcript, speaker_mapping))
+
+    async def generate_summary_sections_async(self, transcript, speaker_mapping=None):
+        # generate_summary_sections on the async client
+        if not transcript or not transcript.strip():
+            logger.warning("Cannot generate summary: Empty transcript provided")
+            return {}
+
+        try:
+            data = await self._generate_json_async(self._structured_prompt(transcript, speaker_mapping), summary_schema())
+            return {key: data[key] for key in SUMMARY_SECTIONS if key in data}
+        except Exception as e:
+            logger.error(f"Error generating summary: {e}", exc_info=True)
+            ERRORS.inc(stage="summary", type=type(e).__name__)
+            return {}
+
+    async def generate_summary_async(self, transcript, speaker_mapping=None):
+        return format_summary(await self.generate_summary_sections_async(transcript, speaker_mapping))
+
+    def generate_summary_stream(self, transcript, speaker_mapping=None):
+        # Streaming variant; errors propagate so the caller can report them mid-stream
+        if not transcript or not transcript.strip():
+            logger.warning("Cannot generate summary: Empty transcript provided")
+            return
 
-            return response.text.strip() if hasattr(response, 'text') else ""
+        yield from self._stream_text(self._summary_prompt(transcript, speaker_mapping))
 
+    async def generate_summary_stream_async(self, transcript, speaker_mapping=None):
+        # Async iterator variant of generate_summary_stream
+        if not transcript or not transcript.strip():
+            logger.warning("Cannot generate summary: Empty transcript provided")
+            return
+
+        async for text in self._stream_text_async(self._summary_prompt(transcript, speaker_mapping)):
+            yield text
+
+    def regenerate_summary(self, original_transcript, previous_summary, feedback, section=None):
+        if not all([original_transcript, previous_summary, feedback]):
+            logger.warning("Cannot regenerate summary: Missing required inputs")
+            return ""
+
+        if section:
+            sections = self.regenerate_summary_section(original_transcript, previous_summary, feedback, section)
+            return format_summary(sections)
+
+        try:
+            if isinstance(previous_summary, dict):
+                previous_summary = format_summary(previous_summary)
+            summary, _ = normalize_summary(self._generate_text(self._regenerate_prompt(original_transcript, previous_summary, feedback)))
+            return summary
         except Exception as e:
             logger.error(f"Error regenerating summary: {e}", exc_info=True)
+            ERRORS.inc(stage="summary", type=type(e).__name__)
             return ""
 
-    def save_summary_to_file(self, summary, input_path=None, output_dir=None):
+    def regenerate_summary_section(self, original_transcript, previous_summary, feedback, section):
+        # Regenerate one section and merge it into the previous summary
+        if not all([original_transcript, previous_summary, feedback]):
+            logger.warning("Cannot regenerate summary: Missing required inputs")
+            return {}
+
+        if section not in SUMMARY_SECTIONS:
+            raise ValueError(f"Unknown summary section: {section}")
+
+        sections = dict(previous_summary) if isinstance(previous_summary, dict) else parse_summary(previous_summary)
+
+        try:
+            data = self._generate_json(
+                self._section_prompt(original_transcript, sections, section, feedback),
+                summary_schema([section])
+            )
+            if section not in data:
+                logger.error(f"Regenerated summary is missing section: {section}")
+                return {}
+            sections[section] = data[section]
+            return sections
+        except Exception as e:
+            logger.error(f"Error regenerating summary section {section}: {e}", exc_info=True)
+            ERRORS.inc(stage="summary", type=type(e).__name__)
+            return {}
+
+    def regenerate_summary_stream(self, original_transcript, previous_summary, feedback):
+        # Streaming variant of regenerate_summary
+        if not all([original_transcript, previous_summary, feedback]):
+            logger.warning("Cannot regenerate summary: Missing required inputs")
+            return
+
+        yield from self._stream_text(self._regenerate_prompt(original_transcript, previous_summary, feedback))
+
+    def save_summary_to_file(self, summary, input_path=None, output_dir=None, job_id=None):
         if not summary:
             logger.warning("No summary content to save")
             return None
@@ -145,18 +434,8 @@ class SummaryGenerator:
 
             effective_output_dir = output_dir if output_dir is not None else os.getenv("SUMMARY_PATH", os.getenv("OUTPUT_DIR", "./summaries"))
 
-            if effective_output_dir and effective_output_dir != ".":
-                os.makedirs(effective_output_dir, exist_ok=True)
-            
-            current_output_path = os.path.join(effective_output_dir, f"{base_output_name}{output_extension}")
-            final_output_path = current_output_path
-
-            if input_path and os.path.exists(final_output_path):
-                timestamp = time.strftime("%Y%m%d_%H%M%S")
-                final_output_path = os.path.join(effective_output_dir, f"{base_output_name}_{timestamp}{output_extension}")
-            
-            with open(final_output_path, 'w', encoding='utf-8') as f:
-                f.write(summary)
+            # Regenerated summaries and concurrent jobs get a suffix instead of replacing a saved summary
+            final_output_path = write_output(effective_output_dir, base_output_name, output_extension, summary, job_id=job_id)
             logger.info(f"Summary saved to {final_output_path}")
 
             store_summary = os.getenv("SUMMARY_STORAGE_ENABLED", "false").lower() in ["true", "1", "yes"]
@@ -174,11 +453,7 @@ class SummaryGenerator:
             return final_output_path
         except IOError as e:
             path_for_logging = "<unknown path>"
-            if 'final_output_path' in locals() and final_output_path:
-                path_for_logging = final_output_path
-            elif 'current_output_path' in locals() and current_output_path:
-                path_for_logging = current_output_path
-            elif 'effective_output_dir' in locals() and 'base_output_name' in locals() and 'output_extension' in locals():
+            if 'effective_output_dir' in locals() and 'base_output_name' in locals() and 'output_extension' in locals():
                 path_for_logging = os.path.join(effective_output_dir, f"{base_output_name}{output_extension}")
             
             logger.error(f"Error saving summary to {path_for_logging}: {e}")
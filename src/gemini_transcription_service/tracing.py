@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import queue
+import inspect
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Lightweight tracing without extra dependencies.
+# Spans nest through a context variable; the root span's trace ID doubles as the job
+# correlation ID and is added to every log record. Finished spans are appended to
+# TRACE_EXPORT_PATH (JSONL) and/or sent to OTEL_EXPORTER_OTLP_ENDPOINT (OTLP/HTTP JSON).
+
+SERVICE_NAME = "gemini-transcription-service"
+
+_current_span = contextvars.ContextVar("gts_current_span", default=None)
+# Callbacks run for every finished span, e.g. to collect a job's stage timings
+_listeners = []
+_export_lock = threading.Lock()
+_otlp_queue = queue.Queue(maxsize=1000)
+_otlp_worker = None
+
+
+class Span:
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = "OK"
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    @property
+    def duration(self):
+        end_ns = self.end_ns or time.time_ns()
+        return (end_ns - self.start_ns) / 1e9
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "duration": round(self.duration, 6),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+@contextmanager
+def span(name, activate=True, **attributes):
+    # Child of the current span, or the root of a new trace.
+    # Pass activate=False inside generators so the span never leaks into the caller's context.
+    parent = _current_span.get()
+    current = Span(
+        name,
+        trace_id=parent.trace_id if parent else os.urandom(16).hex(),
+        parent_id=parent.span_id if parent else None,
+        attributes=attributes,
+    )
+    token = _current_span.set(current) if activate else None
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "ERROR"
+        current.set_attribute("error.type", type(e).__name__)
+        current.set_attribute("error.message", str(e)[:500])
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        if token is not None:
+            _current_span.reset(token)
+        _export(current)
+
+
+def traced(name):
+    # Decorator form of span() for whole functions, sync or async
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span():
+    return _current_span.get()
+
+
+def current_trace_id():
+    current = _current_span.get()
+    return current.trace_id if current else None
+
+
+def add_listener(callback):
+    # callback(span) runs in the thread that finished the span; exceptions are logged and ignored
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+
+def _export(finished):
+    for callback in _listeners:
+        try:
+            callback(finished)
+        except Exception as e:
+            logger.warning(f"Span listener failed for {finished.name}: {e}")
+
+    path = os.getenv("TRACE_EXPORT_PATH")
+    if path:
+        try:
+            with _export_lock, open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(finished.to_dict(), default=str) + "\n")
+        except OSError as e:
+            logger.warning(f"Failed to export span {finished.name}: {e}")
+
+    if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        _start_otlp_worker()
+        try:
+            _otlp_queue.put_nowait(finished)
+        except queue.Full:
+            logger.warning("Trace export queue full, dropping span")
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_payload(spans):
+    # OTLP/HTTP JSON encoding of a batch of spans
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{
+                "scope": {"name": "gemini_transcription_service"},
+                "spans": [{
+                    "traceId": s.trace_id,
+                    "spanId": s.span_id,
+                    **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                    "name": s.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(s.start_ns),
+                    "endTimeUnixNano": str(s.end_ns),
+                    "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                    "status": {"code": 2 if s.status == "ERROR" else 1},
+                } for s in spans],
+            }],
+        }]
+    }
+
+
+def _send_otlp(spans):
+    import urllib.request
+
+    endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "").rstrip("/")
+    if not endpoint:
+        return
+    request = urllib.request.Request(
+        f"{endpoint}/v1/traces",
+        data=json.dumps(_otlp_payload(spans)).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+    except Exception as e:
+        logger.warning(f"Failed to send {len(spans)} spans to {endpoint}: {e}")
+
+
+def _otlp_loop():
+    # Batch spans so export never blocks the pipeline
+    while True:
+        batch = [_otlp_queue.get()]
+        deadline = time.monotonic() + 1.0
+        while len(batch) < 100:
+            try:
+                batch.append(_otlp_queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        _send_otlp(batch)
+
+
+def _start_otlp_worker():
+    global _otlp_worker
+    with _export_lock:
+        # Threads do not survive fork, so check liveness rather than existence
+        if _otlp_worker is None or not _otlp_worker.is_alive():
+            _otlp_worker = threading.Thread(target=_otlp_loop, name="otlp-exporter", daemon=True)
+            _otlp_worker.start()
+
+
+def install_log_context():
+    # Add trace_id/span_id to every log record ("-" outside a span)
+    factory = logging.getLogRecordFactory()
+    if getattr(factory, "_gts_tracing", False):
+        return
+
+    def record_factory(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        current = _current_span.get()
+        record.trace_id = current.trace_id if current else "-"
+        record.span_id = current.span_id if current else "-"
+        return record
+
+    record_factory._gts_tracing = True
+    logging.setLogRecordFactory(record_factory)
+
+
+install_log_context()
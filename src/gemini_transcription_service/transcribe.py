@@ -1,93 +1,181 @@
 import argparse
 import os
+import asyncio
 import logging
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-import httpx
-from gemini_transcription_service.storage_handler import upload_file, delete_uploaded_file
-from gemini_transcription_service.transcription_logic import prepare_content, configure_generation, stream_transcription
-from gemini_transcription_service.transcript_processor import TranscriptProcessor
-from gemini_transcription_service.summary_generator import SummaryGenerator
-from .exceptions import TranscriptionTimeoutError
-
-# Ensure environment variables are loaded
-load_dotenv()
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(module)s - %(message)s')
+from .storage_handler import (
+    upload_file, delete_uploaded_file, backup_audio, wait_for_processing,
+    upload_file_async, delete_uploaded_file_async, wait_for_processing_async,
+)
+from .transcription_logic import prepare_content, configure_generation, stream_transcription, stream_transcription_async
+from .transcript_processor import TranscriptProcessor
+from .exceptions import TranscriptionTimeoutError, JobCancelledError
+from .clients import get_gemini_client, get_async_gemini_client
+from .metrics import ERRORS
+from .usage import UsageRecord, record_usage, save_usage_sidecar
+from .tracing import traced, current_span, current_trace_id
+from .profiling import profiled
+from . import jobs, job_store
+
+# Environment variables are loaded by the entry points (main.py, run.py, gunicorn_config.py)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(module)s - [%(trace_id)s] - %(message)s')
 logger = logging.getLogger(__name__)
 
+TRANSCRIPTION_TIMEOUT_MS = 900000  # 15 minutes
+
+
+# Steps shared by TranscriptionService and AsyncTranscriptionService; the async service runs
+# the ones that touch the disk or GCS in a worker thread
+
+def _generation_request(file):
+    # Model, contents and config of the transcription request for an uploaded file
+    return {
+        "model": os.getenv("MODEL_NAME", "gemini-2.5-flash-preview-04-17"),
+        "contents": prepare_content(file),
+        "config": configure_generation(
+            temperature=float(os.getenv("TEMPERATURE", "1.0")),
+            max_tokens=int(os.getenv("MAX_OUTPUT_TOKENS", "32768"))
+        ),
+    }
+
+
+def _output_dir(output_dir_override):
+    return output_dir_override if output_dir_override is not None else os.getenv("OUTPUT_DIR", None)
+
+
+def _save_transcript(raw_response, file_path, output_dir, usage, job_id=None):
+    # Format and save the transcript; returns (transcript, path)
+    logger.debug(f"Raw response content: {raw_response}")
+    logger.info("Processing and saving transcript...")
+    processor = TranscriptProcessor()
+    formatted_transcript = processor.process_response(raw_response)
+    output_file_path = processor.save_transcript_to_file(
+        transcript=formatted_transcript,
+        input_path=file_path,
+        output_dir=output_dir,
+        job_id=job_id
+    )
+    record_usage(usage, "transcription", source=file_path, transcript_path=output_file_path)
+    return formatted_transcript, output_file_path
+
+
+def _save_summary(summary_generator, summary, usage, file_path, transcript_path, output_dir, job_id=None):
+    # Account the summary's tokens and save it; returns its path, None if there is none
+    record_usage(summary_generator.usage, "summary", source=file_path, transcript_path=transcript_path)
+    usage.merge(summary_generator.usage)
+    if not summary:
+        logger.error("Failed to generate meeting summary")
+        return None
+    summary_file_path = summary_generator.save_summary_to_file(
+        summary=summary,
+        input_path=file_path,
+        output_dir=output_dir,
+        job_id=job_id
+    )
+    if summary_file_path:
+        logger.info(f"Meeting summary saved to: {summary_file_path}")
+    else:
+        logger.error("Failed to save meeting summary")
+    return summary_file_path
+
+
+def _finish_outputs(usage, output_file_path):
+    # Per-job token usage and cost next to the transcript; returns (usage path, status, error)
+    usage_file_path = save_usage_sidecar(usage, output_file_path)
+    if output_file_path:
+        return usage_file_path, "completed", None
+    return usage_file_path, "failed", "transcript not saved"
+
 
 class TranscriptionService:
+    # Re-entrant: per-job state lives in a jobs.Job, so one instance can run jobs from
+    # several threads (gthread) or greenlets (gevent) at once
     def __init__(self):
         self.client = None
-        self.uploaded_file = None
 
     def _initialize(self):
-        # Init client
-        logger.info("Loading application configuration...")
-        logger.info("Initializing Gemini client...")
-        http_options = types.HttpOptions(timeout=900000) # 15 minutes
-        self.client = genai.Client(
-            api_key=os.getenv("GEMINI_API_KEY"),
-            http_options=http_options
-        )
-
-    def _cleanup(self):
-        try:
-            # Clean temp resources
-            if self.client and self.uploaded_file:
-                logger.info(f"Cleaning up uploaded file: {self.uploaded_file.name}")
-                delete_uploaded_file(self.client, self.uploaded_file)
-            elif not self.client:
-                logger.warning("Cleanup skipped: Client not initialized.")
-            elif not self.uploaded_file:
-                logger.info("Cleanup: No file needed deleting.")
-
-            # Reset state
-            self.uploaded_file = None
-        except Exception as e:
-            logger.error(f"Error during cleanup: {e}")
-            # Continue with cleanup even if there's an error
+        # Reuse the process-wide client; warm workers skip construction entirely
+        self.client = get_gemini_client(timeout_ms=TRANSCRIPTION_TIMEOUT_MS)
+        return self.client
+
+    def _cleanup(self, job=None):
+        # Delete the Files API upload of one job, or of every job still running on this service
+        for current in [job] if job else jobs.active_jobs(owner=self):
+            try:
+                if current.client and current.uploaded_file:
+                    logger.info(f"Cleaning up uploaded file: {current.uploaded_file.name}")
+                    delete_uploaded_file(current.client, current.uploaded_file)
+                elif not current.client:
+                    logger.warning("Cleanup skipped: Client not initialized.")
+                else:
+                    logger.info("Cleanup: No file needed deleting.")
 
+                # Reset state
+                current.uploaded_file = None
+            except Exception as e:
+                logger.error(f"Error during cleanup: {e}")
+                # Continue with cleanup even if there's an error
 
-    def run(self, file_path: str, output_dir_override: str | None = None, store_audio: bool = None, generate_summary: bool = False, summary_path: str = None):
+    @traced("transcription.job")
+    @profiled("job")
+    def run(self, file_path: str, output_dir_override: str | None = None, store_audio: bool = None, generate_summary: bool = False, summary_path: str = None, uploaded_file=None, job_id: str = None, cancel=None, input_sha256: str = None):
+        # uploaded_file: a Files API upload of file_path made while it was received (pipelined uploads)
+        # job_id/cancel: ID for jobs.cancel() and an existing jobs.CancelToken; a cancelled job
+        # stops at once, deletes its upload and raises JobCancelledError
+        # input_sha256: hash of file_path if already known, for the job store
         formatted_transcript = None
         output_file_path = None
         summary_file_path = None
+        usage_file_path = None
+        status, error = "failed", None
 
         if summary_path is None:
             summary_path = os.getenv("SUMMARY_PATH", "./summaries")
 
         api_error = False
+        usage = UsageRecord()
+        current_span().set_attribute("file", os.path.basename(file_path))
+        logger.info(f"Job {current_trace_id()} started for {file_path}")
+        job = jobs.register(file_path, owner=self, job_id=job_id, cancel=cancel)
+        cancel = job.cancel
+        # Recording the job may give it a fresh ID if a client reused one
+        job_store.record_start(job, input_sha256)
+        current_span().set_attribute("job_id", job.id)
         try:
-            self._initialize()
+            client = job.client = self._initialize()
+            cancel.raise_if_cancelled()
 
-            # Upload file
-            self.uploaded_file = upload_file(self.client, file_path, store_audio)
-            if not self.uploaded_file:
+            # Upload file, unless it was already streamed to the Files API
+            if uploaded_file is not None:
+                jobs.attach_upload(job, uploaded_file)
+                backup_audio(file_path, store_audio)
+                jobs.attach_upload(job, wait_for_processing(client, uploaded_file, cancel))
+            else:
+                # Leased as soon as Gemini has it, so the orphan sweeper leaves it alone while it processes
+                jobs.attach_upload(job, upload_file(client, file_path, store_audio, cancel,
+                                                    on_upload=lambda file: jobs.attach_upload(job, file)))
+            if not job.uploaded_file:
                 logger.error(f"File upload failed for {file_path}. Aborting.")
+                error = "upload failed"
                 return None, None, None
 
             # Prep API request
-            contents = prepare_content(self.uploaded_file)
-
-            # Set params
-            gen_config = configure_generation(
-                temperature= float(os.getenv("TEMPERATURE", "1.0")),
-                max_tokens=int(os.getenv("MAX_OUTPUT_TOKENS", "32768"))
-            )
+            request = _generation_request(job.uploaded_file)
 
             logger.info(f"Starting transcription stream for: {file_path}")
 
+            import httpx
+
             try:
                 # Call API
                 raw_response = stream_transcription(
-                    client=self.client,
-                    model= os.getenv("MODEL_NAME", "gemini-2.5-flash-preview-04-17"),
-                    contents=contents,
-                    config=gen_config,
+                    client=client,
+                    **request,
                     file_path=file_path,
+                    usage=usage,
+                    cancel=cancel,
                 )
+            except JobCancelledError:
+                raise
             except (httpx.RemoteProtocolError, httpx.ReadTimeout) as http_timeout_err:
                 logger.error(f"HTTP timeout/disconnect during transcription stream: {http_timeout_err}")
                 api_error = True
@@ -99,57 +187,186 @@ class TranscriptionService:
                 api_error = True
                 raw_response = None
 
+            # Nobody will read the transcript of a cancelled job
+            cancel.raise_if_cancelled()
+
             # Process valid responses
             if raw_response and not api_error:
-                logger.debug(f"Raw response content: {raw_response}")
-                logger.info("Processing and saving transcript...")
-                processor = TranscriptProcessor()
-                formatted_transcript = processor.process_response(raw_response)
-
-                # Get output location
-                effective_output_dir = output_dir_override if output_dir_override is not None else os.getenv("OUTPUT_DIR", None)
-
-                # Save transcript
-                output_file_path = processor.save_transcript_to_file(
-                    transcript=formatted_transcript,
-                    input_path=file_path,
-                    output_dir=effective_output_dir
+                effective_output_dir = _output_dir(output_dir_override)
+                formatted_transcript, output_file_path = _save_transcript(
+                    raw_response, file_path, effective_output_dir, usage, job.id
                 )
 
                 # Generate summary if needed
                 if generate_summary and formatted_transcript:
+                    cancel.raise_if_cancelled()
                     logger.info("Generating meeting summary...")
-                    summary_generator = SummaryGenerator(client=self.client)
+                    # Only pay for the summary module when a summary is requested
+                    from .summary_generator import SummaryGenerator
+                    summary_generator = SummaryGenerator(client=client)
                     summary = summary_generator.generate_summary(formatted_transcript)
+                    summary_file_path = _save_summary(
+                        summary_generator, summary, usage, file_path, output_file_path,
+                        summary_path if summary_path else effective_output_dir, job.id
+                    )
 
-                    if summary:
-                        # Save summary
-                        effective_summary_dir = summary_path if summary_path else effective_output_dir
-                        summary_file_path = summary_generator.save_summary_to_file(
-                            summary=summary,
-                            input_path=file_path,
-                            output_dir=effective_summary_dir
-                        )
-
-                        if summary_file_path:
-                            logger.info(f"Meeting summary saved to: {summary_file_path}")
-                        else:
-                            logger.error("Failed to save meeting summary")
-                    else:
-                        logger.error("Failed to generate meeting summary")
+                usage_file_path, status, error = _finish_outputs(usage, output_file_path)
             else:
                 error_reason = "API error occurred" if api_error else "empty response"
                 logger.warning(f"Skipping processing and saving due to {error_reason}.")
+                error = error_reason
 
-        except TranscriptionTimeoutError:
+        except TranscriptionTimeoutError as e:
+            status, error = "timeout", str(e)
+            raise
+        except JobCancelledError:
+            status, error = "cancelled", cancel.reason
+            logger.info(f"Transcription of {file_path} cancelled ({cancel.reason})")
+            raise
+        except KeyboardInterrupt:
+            status, error = "cancelled", "interrupt"
+            cancel.cancel("interrupt")
             raise
         except Exception as e:
+            error = str(e)
             logger.error(f"An error occurred during transcription for {file_path}: {e}", exc_info=True)
+            ERRORS.inc(stage="transcription", type=type(e).__name__)
         finally:
-            self._cleanup()
+            self._cleanup(job)
+            jobs.unregister(job)
+            job_store.record_finish(job, status, error=error, transcript_path=output_file_path,
+                                    summary_path=summary_file_path, usage_path=usage_file_path)
 
         # Return None on API errors
         if api_error:
             return None, None, None
 
         return formatted_transcript, output_file_path, summary_file_path
+
+
+class AsyncTranscriptionService:
+    # asyncio counterpart of TranscriptionService on the SDK's async client (client.aio).
+    # Job state is local to run(), so one instance can drive many concurrent jobs; cancel the
+    # task or pass timeout= to stop a job, and its Files API upload is still deleted.
+    def __init__(self, client=None):
+        self.client = client
+
+    def _client(self):
+        return self.client or get_async_gemini_client(timeout_ms=TRANSCRIPTION_TIMEOUT_MS)
+
+    @traced("transcription.job")
+    async def run(self, file_path: str, output_dir_override: str | None = None, store_audio: bool = None, generate_summary: bool = False, summary_path: str = None, uploaded_file=None, timeout: float | None = None, input_sha256: str = None):
+        # Same results as TranscriptionService.run; timeout (seconds) covers the whole job
+        import httpx
+
+        formatted_transcript = None
+        output_file_path = None
+        summary_file_path = None
+        usage_file_path = None
+        status, error = "failed", None
+
+        if summary_path is None:
+            summary_path = os.getenv("SUMMARY_PATH", "./summaries")
+
+        usage = UsageRecord()
+        current_span().set_attribute("file", os.path.basename(file_path))
+        logger.info(f"Job {current_trace_id()} started for {file_path}")
+        client = self._client()
+        file = uploaded_file
+        job = jobs.register(file_path, owner=self)
+        job.client = client
+        jobs.attach_upload(job, uploaded_file)
+        try:
+            await asyncio.to_thread(job_store.record_start, job, input_sha256)
+            async with asyncio.timeout(timeout):
+                if uploaded_file is not None:
+                    await asyncio.to_thread(backup_audio, file_path, store_audio)
+                    file = await wait_for_processing_async(client, uploaded_file)
+                else:
+                    file = await upload_file_async(client, file_path, store_audio,
+                                                   on_upload=lambda file: jobs.attach_upload(job, file))
+                jobs.attach_upload(job, file)
+                if not file:
+                    logger.error(f"File upload failed for {file_path}. Aborting.")
+                    error = "upload failed"
+                    return None, None, None
+
+                logger.info(f"Starting transcription stream for: {file_path}")
+                try:
+                    raw_response = await stream_transcription_async(
+                        client=client,
+                        **_generation_request(file),
+                        file_path=file_path,
+                        usage=usage,
+                    )
+                except (httpx.RemoteProtocolError, httpx.ReadTimeout):
+                    raise
+                except Exception as api_e:
+                    logger.error(f"API error during transcription: {api_e}")
+                    error = "API error occurred"
+                    return None, None, None
+
+                if not raw_response:
+                    logger.warning("Skipping processing and saving due to empty response.")
+                    error = "empty response"
+                    return None, None, None
+
+                # Parsing and saving touch the disk and GCS, so they run in a worker thread
+                effective_output_dir = _output_dir(output_dir_override)
+                formatted_transcript, output_file_path = await asyncio.to_thread(
+                    _save_transcript, raw_response, file_path, effective_output_dir, usage, job.id
+                )
+
+                if generate_summary and formatted_transcript:
+                    logger.info("Generating meeting summary...")
+                    from .summary_generator import SummaryGenerator
+                    summary_generator = SummaryGenerator(client=client)
+                    summary = await summary_generator.generate_summary_async(formatted_transcript)
+                    summary_file_path = await asyncio.to_thread(
+                        _save_summary, summary_generator, summary, usage, file_path, output_file_path,
+                        summary_path if summary_path else effective_output_dir, job.id
+                    )
+
+                usage_file_path, status, error = await asyncio.to_thread(_finish_outputs, usage, output_file_path)
+        except (TimeoutError, httpx.RemoteProtocolError, httpx.ReadTimeout) as http_timeout_err:
+            status, error = "timeout", repr(http_timeout_err)
+            logger.error(f"Timeout/disconnect during transcription of {file_path}: {http_timeout_err!r}")
+            ERRORS.inc(stage="transcription", type=type(http_timeout_err).__name__)
+            raise TranscriptionTimeoutError(
+                "Transcription timed out, recording might be too long and consider splitting it into smaller segments."
+            ) from http_timeout_err
+        except asyncio.CancelledError:
+            status, error = "cancelled", "task cancelled"
+            logger.info(f"Transcription of {file_path} cancelled")
+            raise
+        except Exception as e:
+            error = str(e)
+            logger.error(f"An error occurred during transcription for {file_path}: {e}", exc_info=True)
+            ERRORS.inc(stage="transcription", type=type(e).__name__)
+        finally:
+            try:
+                if file is not None:
+                    logger.info(f"Cleaning up uploaded file: {file.name}")
+                    # Shielded so cleanup completes even when the job itself was cancelled
+                    await asyncio.shield(delete_uploaded_file_async(client, file))
+            finally:
+                jobs.unregister(job)
+                # Shielded like the delete: a cancelled task still records its result
+                await asyncio.shield(asyncio.to_thread(
+                    job_store.record_finish, job, status, error=error, transcript_path=output_file_path,
+                    summary_path=summary_file_path, usage_path=usage_file_path
+                ))
+
+        return formatted_transcript, output_file_path, summary_file_path
+
+    async def run_many(self, file_paths, concurrency: int | None = None, **kwargs):
+        # Run one job per path with at most `concurrency` in flight (ASYNC_CONCURRENCY, default 16).
+        # Results are in input order; a failed job's entry is its exception.
+        concurrency = concurrency or int(os.getenv("ASYNC_CONCURRENCY", "16"))
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def job(path):
+            async with semaphore:
+                return await self.run(path, **kwargs)
+
+        return await asyncio.gather(*(job(path) for path in file_paths), return_exceptions=True)
@@ -2,11 +2,75 @@ import os
 import json
 import logging
 import re
-import time
-from gemini_transcription_service.storage_handler import GCSHandler
+from .storage_handler import GCSHandler
+from .outputs import write_output
+from .search_index import index_transcript
+from .metrics import TRANSCRIPT_PROCESSING_SECONDS, ERRORS
+from .tracing import traced
 
 logger = logging.getLogger(__name__)
 
+
+def valid_speaker_mapping(speaker_mapping):
+    # A mapping of speaker IDs to names, both strings (as posted by the web UI)
+    return isinstance(speaker_mapping, dict) and all(
+        isinstance(speaker_id, str) and isinstance(real_name, str) for speaker_id, real_name in speaker_mapping.items())
+
+
+def apply_speaker_mapping(transcript, speaker_mapping):
+    # Rename speakers in the "[speaker ts]:" headers only; names mentioned in the text are left alone
+    if not transcript or not speaker_mapping or not isinstance(speaker_mapping, dict):
+        return transcript
+    return format_segments(apply_speaker_mapping_to_segments(parse_transcript(transcript), speaker_mapping))
+
+
+def apply_speaker_mapping_to_segments(segments, speaker_mapping):
+    # Rename the speaker field of parsed segments, leaving the text untouched.
+    # Entries that aren't a pair of non-empty strings are skipped.
+    if not speaker_mapping or not isinstance(speaker_mapping, dict):
+        return segments
+
+    renamed = []
+    for entry in segments:
+        real_name = speaker_mapping.get(entry.get("speaker"))
+        renamed.append({**entry, "speaker": real_name} if real_name and isinstance(real_name, str) else entry)
+    return renamed
+
+
+# One formatted line: "[Speaker 1 01:23]: text"
+# "[<speaker> <timestamp>]: <text>" as format_transcript writes it. The model's timestamps
+# aren't always mm:ss (00:02.5, 1:02:03.4) and may be missing, so any "[...]: " header starts
+# a segment and a trailing number with ":" or "." in it is taken as its timestamp.
+_LINE = re.compile(r"^\[(?P<speaker>.*?)(?: (?P<timestamp>\d+(?:[:.,]\d+)+))?\s*\]:\s?(?P<text>.*)$")
+
+
+def parse_transcript(transcript):
+    # Segments of a formatted transcript (the inverse of format_transcript); continuation lines join the segment above
+    segments = []
+    for line in (transcript or "").splitlines():
+        match = _LINE.match(line)
+        if match:
+            segments.append(match.groupdict(default=""))
+        elif line.strip() and segments:
+            segments[-1]["text"] += "\n" + line.strip()
+        elif line.strip():
+            segments.append({"speaker": "", "timestamp": "", "text": line.strip()})
+    return segments
+
+
+def format_segments(segments):
+    # Text of parsed segments as parse_transcript reads it back
+    lines = []
+    for segment in segments:
+        if not segment["speaker"]:
+            lines.append(segment["text"])
+        elif segment["timestamp"]:
+            lines.append(f"[{segment['speaker']} {segment['timestamp']}]: {segment['text']}")
+        else:
+            lines.append(f"[{segment['speaker']}]: {segment['text']}")
+    return "\n".join(lines)
+
+
 class TranscriptProcessor:
     def __init__(self):
         # Init GCS handler
@@ -24,37 +88,20 @@ class TranscriptProcessor:
                 lines.append(f"[{speaker} {timestamp}]: {text}")
         return "\n".join(lines)
 
-    def save_transcript_to_file(self, transcript, input_path, output_dir):
-        # Save locally and to GCS
+    @traced("transcript.save")
+    def save_transcript_to_file(self, transcript, input_path, output_dir, job_id=None):
+        # Save locally and to GCS; an existing transcript of the same name is never replaced
         if not transcript:
             logger.warning("No content to save")
             return None
 
         try:
             name, _ = os.path.splitext(os.path.basename(input_path))
-            base_output_name = f"{name}_transcript"
-            output_extension = ".txt"
 
-            # Determine initial path
-            if output_dir:
-                os.makedirs(output_dir, exist_ok=True)
-                current_output_path = os.path.join(output_dir, f"{base_output_name}{output_extension}")
-            else:
-                current_output_path = f"{base_output_name}{output_extension}"
-
-            final_output_path = current_output_path
-            # If exists, append timestamp to make unique
-            if os.path.exists(final_output_path):
-                timestamp = time.strftime("%Y%m%d_%H%M%S")
-                if output_dir:
-                    final_output_path = os.path.join(output_dir, f"{base_output_name}_{timestamp}{output_extension}")
-                else:
-                    final_output_path = f"{base_output_name}_{timestamp}{output_extension}"
-            
-            # Local save
-            with open(final_output_path, 'w', encoding='utf-8') as f:
-                f.write(transcript)
+            # Local save, suffixed with the job ID if the name is taken
+            final_output_path = write_output(output_dir, f"{name}_transcript", ".txt", transcript, job_id=job_id)
             logger.info(f"Saved to {final_output_path}")
+            index_transcript(final_output_path, parse_transcript(transcript), job_id=job_id)
             
             # GCS upload
             if self.TRANSCRIPT_STORAGE_ENABLED:
@@ -71,6 +118,7 @@ class TranscriptProcessor:
             logger.error(f"Error saving transcript: {e}")
             return None
 
+    @traced("transcript.process")
     def process_response(self, response):
         # Parse API response
         if not response or not response.strip():
@@ -83,9 +131,11 @@ class TranscriptProcessor:
                 preview += "..."
                 
             if response.strip().startswith(("[", "{")):
-                data = json.loads(response)
+                with TRANSCRIPT_PROCESSING_SECONDS.time(step="parse"):
+                    data = json.loads(response)
                 if isinstance(data, list):
-                    result = self.format_transcript(data)
+                    with TRANSCRIPT_PROCESSING_SECONDS.time(step="format"):
+                        result = self.format_transcript(data)
                     logger.info("Transcript processed successfully")
                     return result
                 else:
@@ -95,7 +145,9 @@ class TranscriptProcessor:
                 
         except json.JSONDecodeError as e:
             logger.error(f"JSON error: {e}")
+            ERRORS.inc(stage="process", type=type(e).__name__)
         except Exception as e:
             logger.error(f"Process error: {e}")
+            ERRORS.inc(stage="process", type=type(e).__name__)
             
         return ""
\ No newline at end of file
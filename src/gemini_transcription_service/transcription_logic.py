@@ -2,9 +2,16 @@ from google import genai
 from google.genai import types
 import os
 import json
+import time
+import queue
 import logging
+import threading
 
 from .config import SAFETY_SETTINGS
+from .clients import watch_responses, abort_response
+from .metrics import STREAM_FIRST_CHUNK_SECONDS, STREAM_SECONDS, ERRORS
+from .tracing import traced, current_span
+from .watchdog import stage, progress
 
 logger = logging.getLogger(__name__)
 
@@ -51,26 +58,160 @@ def configure_generation(temperature: float, max_tokens: int) -> types.GenerateC
         response_schema=schema,
     )
 
-def stream_transcription(client, model, contents, config, file_path):
-    # Handle streaming response
-    output = ""
+_END = object()
 
+
+def _close(stream):
+    close = getattr(stream, "close", None)
+    if not close:
+        return
+    try:
+        close()
+    except ValueError:
+        # A generator can't be closed while another thread is inside it; its connection is
+        # shut down instead (see _cancellable)
+        logger.debug("Transcription stream is busy, shutting down its connection")
+
+
+def _cancellable(stream, cancel):
+    # Read the stream on a helper thread so that a cancel interrupts the wait for the next
+    # chunk at once. The cancel also closes the stream and shuts down the HTTP connection it
+    # reads from, which wakes the helper thread and ends generation on Gemini's side.
+    chunks = queue.Queue()
+    stop = threading.Event()
+    responses = []
+
+    def opened(response):
+        responses.append(response)
+        if cancel.cancelled:
+            abort_response(response)
+
+    def abort():
+        _close(stream)
+        for response in list(responses):
+            abort_response(response)
+
+    def pump():
+        # The SDK sends the request from here, on the first step of its generator
+        with watch_responses(opened):
+            try:
+                for chunk in stream:
+                    chunks.put(chunk)
+                    if stop.is_set() or cancel.cancelled:
+                        break
+            except Exception as e:
+                chunks.put(e)
+            finally:
+                _close(stream)
+                chunks.put(_END)
+
+    remove_callback = cancel.add_callback(abort)
+    threading.Thread(target=pump, name="transcription-stream", daemon=True).start()
+    try:
+        while True:
+            try:
+                item = chunks.get(timeout=0.5)
+            except queue.Empty:
+                cancel.raise_if_cancelled()
+                continue
+            # A stream closed by the cancel ends or fails; either way the job was cancelled
+            cancel.raise_if_cancelled()
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        remove_callback()
+        stop.set()
+
+
+def _check_forced_error():
     # Test error path if env var set
     if os.getenv('FORCE_API_ERROR', 'false').lower() in ['true', '1', 'yes']:
         logger.error("Forced API error for testing")
         raise Exception("Forced API error for testing")
 
+
+class _StreamOutput:
+    # Text, token usage and timings collected from the chunks of one transcription stream.
+    # Chunk texts are joined once at the end: appending to an attribute copies the whole text
+    # on every chunk, which is quadratic for a long meeting.
+    def __init__(self):
+        self.parts = []
+        self.chars = 0
+        self.usage_metadata = None
+        self.chunks = 0
+        self.started = time.monotonic()
+
+    def add(self, chunk, watch):
+        if not self.chunks:
+            STREAM_FIRST_CHUNK_SECONDS.observe(time.monotonic() - self.started)
+            current_span().set_attribute("first_chunk_seconds", round(time.monotonic() - self.started, 3))
+        if chunk.text is not None:
+            self.parts.append(chunk.text)
+            self.chars += len(chunk.text)
+        # Counts are cumulative, the last chunk carries the totals
+        if getattr(chunk, "usage_metadata", None) is not None:
+            self.usage_metadata = chunk.usage_metadata
+        self.chunks += 1
+        progress(watch, chunks=self.chunks, chars=self.chars)
+
+    def finish(self, model, usage):
+        STREAM_SECONDS.observe(time.monotonic() - self.started)
+        current_span().set_attribute("output_chars", self.chars)
+        if usage is not None:
+            usage.add(self.usage_metadata, model=model)
+        return "".join(self.parts)
+
+
+def _stream_failed(e):
+    logger.error(f"Transcription error: {e}")
+    ERRORS.inc(stage="stream", type=type(e).__name__)
+
+
+@traced("transcription.stream")
+def stream_transcription(client, model, contents, config, file_path, usage=None, cancel=None):
+    # Handle streaming response; token counts are added to `usage` when given.
+    # With a jobs.CancelToken the stream is abandoned as soon as the job is cancelled.
+    _check_forced_error()
+    output = _StreamOutput()
     try:
-        stream = client.models.generate_content_stream(
-            model=model,
-            contents=contents,
-            config=config,
-        )
-        for chunk in stream:
-            if chunk.text is not None:
-                output += chunk.text
-        return output
+        with stage("transcription.stream", file=os.path.basename(file_path), chunks=0, chars=0) as watch:
+            stream = client.models.generate_content_stream(
+                model=model,
+                contents=contents,
+                config=config,
+            )
+            if cancel is not None:
+                stream = _cancellable(stream, cancel)
+            for chunk in stream:
+                output.add(chunk, watch)
+        return output.finish(model, usage)
     except Exception as e:
-        logger.error(f"Transcription error: {e}")
+        if cancel is not None and cancel.cancelled:
+            logger.info(f"Transcription stream for {os.path.basename(file_path)} abandoned: job cancelled")
+            raise
+        _stream_failed(e)
         # Propagate error to caller
-        raise
\ No newline at end of file
+        raise
+
+
+@traced("transcription.stream")
+async def stream_transcription_async(client, model, contents, config, file_path, usage=None):
+    # stream_transcription on the async client (client.aio)
+    _check_forced_error()
+    output = _StreamOutput()
+    try:
+        with stage("transcription.stream", file=os.path.basename(file_path), chunks=0, chars=0) as watch:
+            stream = await client.aio.models.generate_content_stream(
+                model=model,
+                contents=contents,
+                config=config,
+            )
+            async for chunk in stream:
+                output.add(chunk, watch)
+        return output.finish(model, usage)
+    except Exception as e:
+        _stream_failed(e)
+        raise
@@ -0,0 +1,175 @@
+import os
+import time
+import queue
+import logging
+import threading
+
+from .metrics import UPLOAD_SECONDS, UPLOADED_BYTES, ERRORS
+from .storage_handler import StorageHandler, GeminiUploadSession
+
+logger = logging.getLogger(__name__)
+
+# Pipelined uploads.
+# While /upload is still receiving a recording, each block written to local disk is also
+# handed to one thread per destination (Gemini Files API, GCS audio backup). Queues are
+# bounded, so a slow destination slows down reading the request instead of buffering the
+# whole file in memory. A destination that fails is dropped; the job then uploads to it
+# from the local copy as before.
+
+QUEUE_BLOCKS = 256  # werkzeug hands over ~64 KB blocks, so ~16 MB per destination
+_DONE = object()
+_ABORT = object()
+
+
+class Sink(threading.Thread):
+    target = None
+
+    def __init__(self):
+        super().__init__(name=f"upload-tee-{self.target}", daemon=True)
+        self.queue = queue.Queue(maxsize=QUEUE_BLOCKS)
+        self.error = None
+        self.result = None
+        self.bytes = 0
+        self.started_at = time.monotonic()
+
+    def put(self, data):
+        if self.error is None:
+            self.queue.put(data)
+
+    def run(self):
+        try:
+            self.open()
+            while True:
+                item = self.queue.get()
+                if item is _ABORT:
+                    self.abort()
+                    return
+                if item is _DONE:
+                    self.result = self.close()
+                    UPLOAD_SECONDS.observe(time.monotonic() - self.started_at, target=self.target)
+                    UPLOADED_BYTES.inc(self.bytes, target=self.target)
+                    return
+                self.write(item)
+                self.bytes += len(item)
+        except Exception as e:
+            self.error = e
+            logger.warning(f"Pipelined upload to {self.target} failed, falling back to uploading after receipt: {e}")
+            ERRORS.inc(stage=f"tee_{self.target}", type=type(e).__name__)
+            try:
+                self.abort()
+            except Exception:
+                pass
+            # Keep draining so the request thread never blocks on a full queue
+            while self.queue.get() not in (_DONE, _ABORT):
+                pass
+
+    def open(self):
+        raise NotImplementedError
+
+    def write(self, data):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def abort(self):
+        pass
+
+
+class GeminiSink(Sink):
+    target = "gemini"
+
+    def __init__(self, display_name, mime_type):
+        super().__init__()
+        self.session = GeminiUploadSession(display_name, mime_type)
+        self.buffer = bytearray()
+        self.chunk_size = None
+
+    def open(self):
+        self.session.start()
+        # Send whole multiples of the server's chunk granularity
+        wanted = int(float(os.getenv("UPLOAD_TEE_CHUNK_MB", "8")) * 1024 * 1024)
+        self.chunk_size = max(wanted // self.session.granularity, 1) * self.session.granularity
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.chunk_size:
+            self.session.send(self.buffer[:self.chunk_size])
+            del self.buffer[:self.chunk_size]
+
+    def close(self):
+        file = self.session.send(self.buffer, finalize=True)
+        logger.info(f"Pipelined upload to Gemini finished: {file.name} ({self.bytes} bytes)")
+        return file
+
+    def abort(self):
+        self.session.cancel()
+
+
+class GCSSink(Sink):
+    target = "gcs_audio"
+
+    def __init__(self, handler, name, mime_type):
+        super().__init__()
+        self.handler = handler
+        self.name = name
+        self.mime_type = mime_type
+        self.writer = None
+        self.uri = None
+
+    def open(self):
+        self.writer, self.uri = self.handler.open_writer(self.name, content_type=self.mime_type)
+
+    def write(self, data):
+        self.writer.write(data)
+
+    def close(self):
+        self.writer.close()
+        logger.info(f"Pipelined upload to {self.uri} finished ({self.bytes} bytes)")
+        return self.uri
+
+    def abort(self):
+        # An unclosed resumable session is never finalized, so no partial object appears
+        self.writer = None
+
+
+class TeeUpload:
+    def __init__(self, sinks):
+        self.sinks = sinks
+        self.finished = False
+        for sink in sinks:
+            sink.start()
+
+    def write(self, data):
+        for sink in self.sinks:
+            sink.put(data)
+
+    def finish(self):
+        # Wait for every destination; returns {target: result} for those that succeeded
+        self.finished = True
+        for sink in self.sinks:
+            sink.queue.put(_DONE)
+        results = {}
+        for sink in self.sinks:
+            sink.join()
+            if sink.error is None:
+                results[sink.target] = sink.result
+        return results
+
+    def abort(self):
+        if self.finished:
+            return
+        self.finished = True
+        for sink in self.sinks:
+            sink.queue.put(_ABORT)
+
+
+def start_tee(name, mime_type, store_audio=False):
+    # Begin forwarding an incoming upload to Gemini and, when enabled, the audio bucket
+    sinks = [GeminiSink(name, mime_type)]
+    if store_audio:
+        handler = StorageHandler(file_type="audio")
+        if handler.initialize():
+            sinks.append(GCSSink(handler, name, mime_type))
+    logger.info(f"Pipelining upload of {name} to {', '.join(sink.target for sink in sinks)}")
+    return TeeUpload(sinks)
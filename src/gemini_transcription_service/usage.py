@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from dataclasses import dataclass, asdict, fields
+
+from .metrics import TOKENS, COST_USD
+from .tracing import current_trace_id
+
+logger = logging.getLogger(__name__)
+
+# USD per 1M tokens. Override with GEMINI_PRICE_TABLE (path to a JSON file with the same shape).
+DEFAULT_PRICES = {
+    "gemini-2.5-pro": {"input": 1.25, "audio_input": 1.25, "cached_input": 0.31, "output": 10.00},
+    "gemini-2.5-flash-lite": {"input": 0.10, "audio_input": 0.30, "cached_input": 0.025, "output": 0.40},
+    "gemini-2.5-flash-preview-04-17": {"input": 0.15, "audio_input": 1.00, "cached_input": 0.0375, "output": 3.50},
+    "gemini-2.5-flash": {"input": 0.30, "audio_input": 1.00, "cached_input": 0.075, "output": 2.50},
+    "gemini-2.0-flash": {"input": 0.10, "audio_input": 0.70, "cached_input": 0.025, "output": 0.40},
+}
+
+_ledger_lock = threading.Lock()
+
+
+def _count(value):
+    # Usage fields are optional ints; anything else counts as zero
+    return value if isinstance(value, int) else 0
+
+
+@dataclass
+class UsageRecord:
+    model: str = ""
+    prompt_tokens: int = 0
+    audio_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    thoughts_tokens: int = 0
+    total_tokens: int = 0
+    calls: int = 0
+
+    def add(self, usage_metadata, model=None):
+        # Accumulate one response's usage_metadata (for streams: the last chunk's)
+        if usage_metadata is None:
+            return
+        if model and not self.model:
+            self.model = model
+        self.prompt_tokens += _count(getattr(usage_metadata, "prompt_token_count", None))
+        self.cached_tokens += _count(getattr(usage_metadata, "cached_content_token_count", None))
+        self.output_tokens += _count(getattr(usage_metadata, "candidates_token_count", None))
+        self.thoughts_tokens += _count(getattr(usage_metadata, "thoughts_token_count", None))
+        self.total_tokens += _count(getattr(usage_metadata, "total_token_count", None))
+        details = getattr(usage_metadata, "prompt_tokens_details", None)
+        for detail in details if isinstance(details, list) else []:
+            if "AUDIO" in str(getattr(detail, "modality", "")).upper():
+                self.audio_tokens += _count(getattr(detail, "token_count", None))
+        self.calls += 1
+
+    def merge(self, other):
+        # Combine two records, e.g. transcription and summary of one job
+        for field in fields(self):
+            if field.name != "model":
+                setattr(self, field.name, getattr(self, field.name) + getattr(other, field.name))
+        if not self.model:
+            self.model = other.model
+        return self
+
+    def cost(self, prices=None):
+        # Estimated USD cost from the price table
+        price = find_price(self.model, prices)
+        if not price:
+            return 0.0
+        text_tokens = max(self.prompt_tokens - self.audio_tokens - self.cached_tokens, 0)
+        return (
+            text_tokens * price.get("input", 0)
+            + self.audio_tokens * price.get("audio_input", price.get("input", 0))
+            + self.cached_tokens * price.get("cached_input", price.get("input", 0))
+            + (self.output_tokens + self.thoughts_tokens) * price.get("output", 0)
+        ) / 1_000_000
+
+    def to_dict(self, prices=None):
+        return {**asdict(self), "cost_usd": round(self.cost(prices), 6)}
+
+
+def load_price_table():
+    # Default prices, overridden per model by GEMINI_PRICE_TABLE
+    prices = dict(DEFAULT_PRICES)
+    path = os.getenv("GEMINI_PRICE_TABLE")
+    if path:
+        try:
+            with open(path, encoding="utf-8") as f:
+                prices.update(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to load price table {path}: {e}")
+    return prices
+
+
+def find_price(model, prices=None):
+    # Exact model match first, then the longest matching prefix
+    prices = prices if prices is not None else load_price_table()
+    name = (model or "").removeprefix("models/")
+    if name in prices:
+        return prices[name]
+    matches = [key for key in prices if name.startswith(key)]
+    return prices[max(matches, key=len)] if matches else None
+
+
+def record_usage(usage, operation, source=None, transcript_path=None):
+    # Export to metrics and append to the daily ledger (USAGE_LOG_DIR)
+    if not isinstance(usage, UsageRecord) or not usage.calls:
+        return None
+
+    prices = load_price_table()
+    entry = usage.to_dict(prices)
+    model = usage.model or "unknown"
+    for kind in ("prompt", "audio", "cached", "output", "thoughts"):
+        tokens = entry[f"{kind}_tokens"]
+        if tokens:
+            TOKENS.inc(tokens, model=model, operation=operation, kind=kind)
+    COST_USD.inc(entry["cost_usd"], model=model, operation=operation)
+
+    log_dir = os.getenv("USAGE_LOG_DIR")
+    if log_dir:
+        entry = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "operation": operation,
+            "trace_id": current_trace_id(),
+            "source": os.path.basename(source) if source else None,
+            "transcript": transcript_path,
+            **entry,
+        }
+        try:
+            os.makedirs(log_dir, exist_ok=True)
+            ledger_path = os.path.join(log_dir, f"usage-{time.strftime('%Y-%m-%d')}.jsonl")
+            with _ledger_lock, open(ledger_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            logger.warning(f"Failed to write usage ledger: {e}")
+    return entry
+
+
+def save_usage_sidecar(usage, transcript_path):
+    # <transcript>.usage.json next to the transcript
+    if not isinstance(usage, UsageRecord) or not usage.calls or not transcript_path:
+        return None
+    sidecar_path = f"{os.path.splitext(transcript_path)[0]}.usage.json"
+    try:
+        with open(sidecar_path, "w", encoding="utf-8") as f:
+            json.dump(usage.to_dict(load_price_table()), f, indent=2)
+        return sidecar_path
+    except OSError as e:
+        logger.warning(f"Failed to save usage for {transcript_path}: {e}")
+        return None
+
+
+def daily_report(log_dir, day, top=10):
+    # Totals for one day plus the most expensive recordings
+    ledger_path = os.path.join(log_dir, f"usage-{day}.jsonl")
+    if not os.path.exists(ledger_path):
+        return None
+
+    totals = {"calls": 0, "prompt_tokens": 0, "audio_tokens": 0, "cached_tokens": 0,
+              "output_tokens": 0, "thoughts_tokens": 0, "cost_usd": 0.0}
+    by_source = {}
+    with open(ledger_path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            for key in totals:
+                totals[key] += entry.get(key, 0)
+            source = entry.get("source") or "<unknown>"
+            by_source[source] = by_source.get(source, 0.0) + entry.get("cost_usd", 0.0)
+
+    cached_share = totals["cached_tokens"] / totals["prompt_tokens"] if totals["prompt_tokens"] else 0.0
+    expensive = sorted(by_source.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {"day": day, **totals, "cost_usd": round(totals["cost_usd"], 6),
+            "cached_prompt_share": round(cached_share, 4),
+            "most_expensive": [{"source": source, "cost_usd": round(cost, 6)} for source, cost in expensive]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-day Gemini usage and cost report.")
+    parser.add_argument("--day", default=time.strftime("%Y-%m-%d"), help="Day to report (YYYY-MM-DD), default today.")
+    parser.add_argument("--log-dir", default=os.getenv("USAGE_LOG_DIR", "./usage"), help="Usage ledger directory.")
+    parser.add_argument("--top", type=int, default=10, help="Number of most expensive recordings to list.")
+    args = parser.parse_args()
+
+    report = daily_report(args.log_dir, args.day, top=args.top)
+    if report is None:
+        print(f"No usage recorded for {args.day} in {args.log_dir}")
+        return
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import os
+import time
+import logging
+
+from .clients import get_gemini_client, reset_clients
+from .storage_handler import StorageHandler
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up():
+    # Pay first-request costs (imports, clients, TLS, bucket checks) up front in each worker
+    if os.getenv("WARMUP_ENABLED", "true").lower() not in ["true", "1", "yes"]:
+        return
+
+    started = time.monotonic()
+    reset_clients()
+
+    # Import the request-path modules so the first request doesn't
+    from . import transcribe, summary_generator, transcript_processor  # noqa: F401
+
+    # The clients transcription and summaries use; each has its own connection pool
+    for timeout_ms in dict.fromkeys([transcribe.TRANSCRIPTION_TIMEOUT_MS, None]):
+        try:
+            client = get_gemini_client(timeout_ms=timeout_ms)
+            if os.getenv("GEMINI_API_KEY"):
+                # Cheap authenticated call to open the TLS connection
+                model_name = os.getenv("MODEL_NAME", "gemini-2.5-flash-preview-04-17")
+                client.models.get(model=model_name)
+        except Exception as e:
+            logger.warning(f"Gemini warm-up failed: {e}")
+
+    for file_type in ("audio", "transcript", "summary"):
+        handler = StorageHandler(file_type=file_type)
+        if handler.config.enabled:
+            try:
+                handler.initialize()
+            except Exception as e:
+                logger.warning(f"{file_type} storage warm-up failed: {e}")
+
+    logger.info(f"Worker warm-up finished in {time.monotonic() - started:.2f}s")
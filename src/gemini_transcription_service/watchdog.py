@@ -0,0 +1,147 @@
+import os
+import sys
+import time
+import logging
+import threading
+import traceback
+from contextlib import contextmanager
+
+from .metrics import WATCHDOG_OVERRUNS
+from .tracing import current_trace_id
+
+logger = logging.getLogger(__name__)
+
+# Slow-stage watchdog.
+# Long-running stages register themselves with stage(); a daemon thread checks them every
+# WATCHDOG_INTERVAL seconds and, when one overruns its threshold, logs the stuck thread's
+# stack, the elapsed time and the progress reported so far. The report repeats at twice,
+# four times, ... the threshold.
+
+DEFAULT_THRESHOLDS = {
+    "upload.gemini": 300,
+    "upload.processing_wait": 300,
+    "upload.gcs": 300,
+    "transcription.stream": 600,
+    "summary": 180,
+}
+
+_lock = threading.Lock()
+_stages = {}
+_watcher = None
+
+
+class Stage:
+    def __init__(self, name, threshold, info):
+        self.name = name
+        self.threshold = threshold
+        self.thread = threading.current_thread()
+        self.trace_id = current_trace_id()
+        self.started = time.monotonic()
+        self.progress = dict(info)
+        self.reports = 0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def describe(self):
+        progress = ", ".join(f"{key}={value}" for key, value in self.progress.items()) or "none"
+        return (f"Stage {self.name} running for {self.elapsed:.1f}s (threshold {self.threshold:.1f}s) "
+                f"on thread {self.thread.name} [trace {self.trace_id or '-'}], progress: {progress}")
+
+    def stack(self):
+        frame = sys._current_frames().get(self.thread.ident)
+        return "".join(traceback.format_stack(frame)) if frame else "  <thread finished>\n"
+
+
+def enabled():
+    return os.getenv("WATCHDOG_ENABLED", "true").lower() in ["true", "1", "yes"]
+
+
+def thresholds():
+    # Defaults overridden by WATCHDOG_THRESHOLDS="transcription.stream=900,upload.gcs=120"
+    result = dict(DEFAULT_THRESHOLDS)
+    for item in os.getenv("WATCHDOG_THRESHOLDS", "").split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            try:
+                result[name.strip()] = float(value)
+            except ValueError:
+                logger.warning(f"Ignoring invalid watchdog threshold: {item}")
+    return result
+
+
+def threshold_for(name):
+    # Exact stage name, then its prefix ("upload.gcs_audio" -> "upload.gcs")
+    table = thresholds()
+    matches = [key for key in table if name == key or name.startswith(key)]
+    if matches:
+        return table[max(matches, key=len)]
+    return float(os.getenv("WATCHDOG_DEFAULT_THRESHOLD", "600"))
+
+
+def _check():
+    with _lock:
+        stages = list(_stages.values())
+    for current in stages:
+        due = current.threshold * (2 ** current.reports)
+        if current.elapsed < due:
+            continue
+        current.reports += 1
+        WATCHDOG_OVERRUNS.inc(stage=current.name)
+        logger.warning(f"{current.describe()}\n{current.stack()}")
+
+
+def _watch():
+    interval = float(os.getenv("WATCHDOG_INTERVAL", "10"))
+    while True:
+        time.sleep(interval)
+        try:
+            _check()
+        except Exception as e:
+            logger.error(f"Watchdog check failed: {e}")
+
+
+def _ensure_watcher():
+    global _watcher
+    with _lock:
+        # Threads do not survive fork, so check liveness rather than existence
+        if _watcher is None or not _watcher.is_alive():
+            _watcher = threading.Thread(target=_watch, name="stage-watchdog", daemon=True)
+            _watcher.start()
+
+
+@contextmanager
+def stage(name, **info):
+    # Register a stage for the watchdog; report progress with progress(**values)
+    if not enabled():
+        yield None
+        return
+
+    current = Stage(name, threshold_for(name), info)
+    _ensure_watcher()
+    with _lock:
+        _stages[id(current)] = current
+    try:
+        yield current
+    finally:
+        with _lock:
+            _stages.pop(id(current), None)
+        if current.reports:
+            logger.info(f"Stage {name} finished after {current.elapsed:.1f}s")
+
+
+def progress(current, **values):
+    # Update what the stage has done so far (bytes, chunks, polls, ...)
+    if current is not None:
+        current.progress.update(values)
+
+
+def dump_active(log=None):
+    # Log every running stage with its stack, e.g. right before gunicorn kills the worker
+    log = log or logger
+    with _lock:
+        stages = list(_stages.values())
+    for current in stages:
+        log.warning(f"{current.describe()}\n{current.stack()}")
+    return len(stages)
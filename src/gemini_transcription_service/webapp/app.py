@@ -1,19 +1,44 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, jsonify
+from flask import Flask, Response, g, render_template, request, redirect, url_for, flash, send_file, jsonify, stream_with_context
 import os
+import time
 import uuid
 import json
+import fnmatch
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 
 # Try both relative and absolute imports to work in different contexts
 try:
     from ..transcribe import TranscriptionService
-    from ..summary_generator import SummaryGenerator
-    from ..exceptions import TranscriptionTimeoutError
+    from ..summary_generator import SummaryGenerator, SUMMARY_SECTIONS, format_summary, normalize_summary, parse_summary, valid_sections
+    from ..exceptions import TranscriptionTimeoutError, JobCancelledError
+    from ..transcript_processor import apply_speaker_mapping, valid_speaker_mapping
+    from ..usage import record_usage
+    from .. import metrics, profiling, jobs, job_store, orphan_sweeper, search_index, compression
+    from ..admission import get_controller
+    from .uploads import StreamingRequest, max_upload_bytes, save_upload, finish_tee
+    from .resumable import UploadSession, UploadError, parse_content_range, sweep_sessions
+    from ..upload_tee import start_tee
+    from ..storage_handler import guess_mime_type
+    from .disconnect import watch_disconnect
+    from .storage_layout import area_dir, area_of, day_of, download_name
+    from . import janitor, transcript_pages
 except ImportError:
     # Fallback to absolute imports for Docker environment
     from src.gemini_transcription_service.transcribe import TranscriptionService
-    from src.gemini_transcription_service.summary_generator import SummaryGenerator
-    from src.gemini_transcription_service.exceptions import TranscriptionTimeoutError
+    from src.gemini_transcription_service.summary_generator import SummaryGenerator, SUMMARY_SECTIONS, format_summary, normalize_summary, parse_summary, valid_sections
+    from src.gemini_transcription_service.exceptions import TranscriptionTimeoutError, JobCancelledError
+    from src.gemini_transcription_service.transcript_processor import apply_speaker_mapping, valid_speaker_mapping
+    from src.gemini_transcription_service.usage import record_usage
+    from src.gemini_transcription_service import metrics, profiling, jobs, job_store, orphan_sweeper, search_index, compression
+    from src.gemini_transcription_service.admission import get_controller
+    from src.gemini_transcription_service.webapp.uploads import StreamingRequest, max_upload_bytes, save_upload, finish_tee
+    from src.gemini_transcription_service.webapp.resumable import UploadSession, UploadError, parse_content_range, sweep_sessions
+    from src.gemini_transcription_service.upload_tee import start_tee
+    from src.gemini_transcription_service.storage_handler import guess_mime_type
+    from src.gemini_transcription_service.webapp.disconnect import watch_disconnect
+    from src.gemini_transcription_service.webapp.storage_layout import area_dir, area_of, day_of, download_name
+    from src.gemini_transcription_service.webapp import janitor, transcript_pages
     
 import logging
 from dotenv import load_dotenv
@@ -25,16 +50,21 @@ UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
 ALLOWED_EXTENSIONS = {'wav', 'mp3', 'm4a', 'flac'}
 
 app = Flask(__name__)
+app.request_class = StreamingRequest
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Uploads are written straight into UPLOAD_FOLDER; the body limit leaves room for multipart framing
+app.config['MAX_UPLOAD_BYTES'] = max_upload_bytes()
+app.config['MAX_CONTENT_LENGTH'] = app.config['MAX_UPLOAD_BYTES'] + 1024 * 1024
 app.secret_key = os.urandom(24)
 
 # Feature flags from env vars
 app.config['AUDIO_STORAGE_ENABLED'] = os.getenv('AUDIO_STORAGE_ENABLED', 'false').lower() in ['true', '1', 'yes']
 app.config['KEEP_LOCAL_AUDIO'] = os.getenv('KEEP_LOCAL_AUDIO', 'false').lower() in ['true', '1', 'yes']
 app.config['GENERATE_SUMMARY'] = os.getenv('GENERATE_SUMMARY', 'false').lower() in ['true', '1', 'yes']
+app.config['PIPELINED_UPLOAD'] = os.getenv('PIPELINED_UPLOAD_ENABLED', 'false').lower() in ['true', '1', 'yes']
 
 # Setup logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(module)s - %(message)s')
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(module)s - [%(trace_id)s] - %(message)s')
 app.logger.setLevel(logging.INFO)
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -43,6 +73,18 @@ def allowed_file(filename):
     # Check if file extension is supported
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def start_upload_tee(filename, content_type):
+    # Forward /upload bodies to Gemini (and the audio bucket) while the browser is still sending
+    if not app.config['PIPELINED_UPLOAD'] or request.endpoint != 'upload_file' or not allowed_file(filename or ''):
+        return None
+    try:
+        return start_tee(secure_filename(filename), guess_mime_type(filename), store_audio=app.config['AUDIO_STORAGE_ENABLED'])
+    except Exception as e:
+        app.logger.warning(f"Pipelined upload unavailable, uploading after receipt: {e}")
+        return None
+
+app.config['UPLOAD_TEE_FACTORY'] = start_upload_tee
+
 def cleanup_file(path):
     # Delete temp files
     if os.path.exists(path):
@@ -52,6 +94,59 @@ def cleanup_file(path):
         except OSError as e:
             app.logger.error(f"Failed to remove {path}: {e}")
 
+@app.before_request
+def start_request_profile():
+    # Opt-in profiling: PROFILE_MODE, X-Profile header with token, or the admin switch
+    if request.endpoint in ('static', 'metrics_endpoint', 'profiling_admin', 'healthz', 'readyz'):
+        return
+    g.profile = profiling.start(f"{request.method} {request.path}", profiling.header_mode(request.headers))
+
+@app.teardown_request
+def stop_request_profile(exc):
+    # Runs after streamed responses finish, so the whole stream is covered
+    profile = g.pop('profile', None)
+    if profile:
+        profile.stop()
+
+@app.before_request
+def start_background_tasks():
+    # Retention and the orphaned upload sweeper run in the workers; each is a no-op unless configured
+    janitor.ensure_started(app.config['UPLOAD_FOLDER'])
+    orphan_sweeper.ensure_started()
+
+@app.before_request
+def admit_upload():
+    # Take a job slot before the body is read, so a saturated service rejects in milliseconds
+    if request.endpoint not in ('upload_file', 'finalize_upload'):
+        return
+    slot = get_controller().try_acquire()
+    if slot is None:
+        metrics.ADMISSION_REJECTIONS.inc()
+        retry_after = os.getenv('ADMISSION_RETRY_AFTER', '30')
+        app.logger.warning(f"Upload rejected: all {get_controller().capacity} job slots busy")
+        return jsonify({'success': False, 'error': 'Service is busy, please retry later',
+                        'retry_after': int(retry_after)}), 503, {'Retry-After': retry_after, 'Connection': 'close'}
+    g.admission_slot = slot
+
+@app.teardown_request
+def release_upload_slot(exc):
+    slot = g.pop('admission_slot', None)
+    if slot:
+        slot.release()
+    request.discard_uploads()
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    limit_mb = app.config['MAX_UPLOAD_BYTES'] / (1024 * 1024)
+    app.logger.warning(f"Rejected upload larger than {limit_mb:.0f} MB")
+    flash(f'File is too large. The limit is {limit_mb:.0f} MB.', 'error')
+    return redirect(url_for('index'))
+
+@app.context_processor
+def inject_summary_sections():
+    # Section choices for targeted summary regeneration
+    return {'summary_sections': SUMMARY_SECTIONS}
+
 @app.route('/')
 def index():
     # Main page
@@ -74,61 +169,280 @@ def upload_file():
     if file and allowed_file(file.filename):
         # Save with unique name
         filename = secure_filename(file.filename)
-        uid = str(uuid.uuid4())
-        name, ext = os.path.splitext(filename)
-        unique_name = f"{name}_{uid}{ext}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_name)
-        file.save(filepath)
+        filepath = unique_upload_path(filename)
+        size, digest = save_upload(file, filepath)
+        app.logger.info(f"Saved upload {filename}: {size} bytes, sha256 {digest}")
+        piped = finish_tee(file)
         flash(f'File "{filename}" uploaded successfully. Processing...')
+        return transcribe_upload(filepath, piped, input_sha256=digest)
+    else:
+        flash('File type not allowed')
+        return redirect(request.url)
 
-        try:
-            app.logger.info(f"Processing: {filepath}")
-            
-            # Run transcription
-            service = TranscriptionService()
-            transcript, output_path, _ = service.run(
-                filepath,
-                output_dir_override=app.config['UPLOAD_FOLDER'],
-                store_audio=app.config['AUDIO_STORAGE_ENABLED'],
-                generate_summary=False
-            )
-            
-            if transcript is None or output_path is None:
-                app.logger.error(f"Transcription failed for {filepath}")
-                flash('Transcription failed')
-                cleanup_file(filepath)
-                return redirect(url_for('index'))
+def unique_upload_path(filename):
+    uid = str(uuid.uuid4())
+    name, ext = os.path.splitext(filename)
+    unique_name = f"{name}_{uid}{ext}"
+    return os.path.join(area_dir(app.config['UPLOAD_FOLDER'], 'audio', unique_name), unique_name)
 
-            app.logger.info(f"Transcription complete: {output_path}")
-            
-            # Clean up if needed
-            if not app.config['KEEP_LOCAL_AUDIO']:
-                cleanup_file(filepath)
-            
-            download_name = os.path.basename(output_path)
-            return render_template('index.html', transcript=transcript, download_filename=download_name, 
-                                  original_filepath=filepath)
+def summary_dir(input_path):
+    # Summaries go to the day and shard of the recording they summarize
+    return area_dir(app.config['UPLOAD_FOLDER'], 'summaries', input_path, day_of(app.config['UPLOAD_FOLDER'], input_path))
 
-        except TranscriptionTimeoutError as t_e:
-            app.logger.error(f"TranscriptionTimeoutError for {filepath}: {t_e}")
-            flash(f"{t_e} Please split the file into smaller parts and try again.", "error")
+def transcribe_upload(filepath, piped=None, input_sha256=None):
+    # Transcribe a received upload and render the result page
+    piped = piped or {}
+    # The page picks the job ID so it can cancel the job while waiting for this response
+    job_id = request.form.get('job_id')
+    if not jobs.valid_job_id(job_id):
+        job_id = uuid.uuid4().hex
+    cancel = jobs.CancelToken.for_job(job_id)
+    watcher = watch_disconnect(request.environ, cancel)
+    try:
+        app.logger.info(f"Processing: {filepath}")
+        
+        # Run transcription
+        service = TranscriptionService()
+        transcript, output_path, _ = service.run(
+            filepath,
+            output_dir_override=area_dir(app.config['UPLOAD_FOLDER'], 'transcripts', filepath,
+                                         day_of(app.config['UPLOAD_FOLDER'], filepath)),
+            store_audio=app.config['AUDIO_STORAGE_ENABLED'] and not piped.get('gcs_audio'),
+            generate_summary=False,
+            uploaded_file=piped.get('gemini'),
+            job_id=job_id,
+            cancel=cancel,
+            input_sha256=input_sha256
+        )
+        
+        if transcript is None or output_path is None:
+            app.logger.error(f"Transcription failed for {filepath}")
+            flash('Transcription failed')
             cleanup_file(filepath)
             return redirect(url_for('index'))
-        except Exception as e:
-            app.logger.error(f"Error: {e}")
-            flash(f'An error occurred: {e}')
+
+        app.logger.info(f"Transcription complete: {output_path}")
+        
+        # Clean up if needed
+        if not app.config['KEEP_LOCAL_AUDIO']:
             cleanup_file(filepath)
+        
+        # The page gets the first segments; its viewer fetches the rest as they scroll into view
+        return render_template('index.html',
+                              transcript_file=download_name(app.config['UPLOAD_FOLDER'], output_path),
+                              transcript_page=transcript_pages.page(output_path, text=transcript),
+                              transcript_page_size=transcript_pages.PAGE_SIZE,
+                              download_filename=download_name(app.config['UPLOAD_FOLDER'], output_path),
+                              original_filepath=filepath)
+
+    except TranscriptionTimeoutError as t_e:
+        app.logger.error(f"TranscriptionTimeoutError for {filepath}: {t_e}")
+        flash(f"{t_e} Please split the file into smaller parts and try again.", "error")
+        cleanup_file(filepath)
+        return redirect(url_for('index'))
+    except JobCancelledError:
+        app.logger.info(f"Transcription of {filepath} cancelled ({cancel.reason})")
+        flash('Transcription cancelled')
+        cleanup_file(filepath)
+        return redirect(url_for('index'))
+    except Exception as e:
+        app.logger.error(f"Error: {e}")
+        flash(f'An error occurred: {e}')
+        cleanup_file(filepath)
+        return redirect(url_for('index'))
+    finally:
+        if watcher:
+            watcher.stop()
+
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    # Start a resumable upload: {"filename", "size", optional "sha256"}
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    size = data.get('size')
+    if not filename or not allowed_file(filename):
+        return jsonify({'success': False, 'error': 'File type not allowed'}), 400
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({'success': False, 'error': 'Invalid file size'}), 400
+    if size > app.config['MAX_UPLOAD_BYTES']:
+        return jsonify({'success': False, 'error': 'File is too large'}), 413
+
+    sweep_sessions(app.config['UPLOAD_FOLDER'])
+    try:
+        session = UploadSession.create(app.config['UPLOAD_FOLDER'], filename, size, data.get('sha256'))
+    except UploadError as e:
+        return upload_error(e)
+    return jsonify({'success': True, **session.status()}), 201
+
+@app.route('/uploads/<upload_id>', methods=['GET', 'PUT', 'DELETE'])
+def upload_chunk(upload_id):
+    # GET: offset to resume from; PUT: next chunk with Content-Range and X-Chunk-SHA256; DELETE: abandon
+    try:
+        session = UploadSession(app.config['UPLOAD_FOLDER'], upload_id)
+        if request.method == 'DELETE':
+            session.meta  # 404 for unknown uploads
+            session.delete()
+            return jsonify({'success': True})
+        if request.method == 'PUT':
+            start, end, total = parse_content_range(request.headers.get('Content-Range'))
+            if request.content_length != end - start:
+                raise UploadError('Content-Length does not match Content-Range')
+            session.write_chunk(request.stream, start, end, total, request.headers.get('X-Chunk-SHA256'))
+        return jsonify({'success': True, **session.status()})
+    except UploadError as e:
+        return upload_error(e)
+
+@app.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    # Assemble the upload and transcribe it; a form post, so the result page renders as with /upload
+    try:
+        session = UploadSession(app.config['UPLOAD_FOLDER'], upload_id)
+        filename = session.meta['filename']
+        filepath = unique_upload_path(filename)
+        size, digest = session.finalize(filepath)
+    except UploadError as e:
+        if request.accept_mimetypes.accept_html:
+            flash(f'Upload failed: {e}', 'error')
             return redirect(url_for('index'))
-    else:
-        flash('File type not allowed')
-        return redirect(request.url)
+        return upload_error(e)
+
+    app.logger.info(f"Saved upload {filename}: {size} bytes, sha256 {digest}")
+    flash(f'File "{filename}" uploaded successfully. Processing...')
+    return transcribe_upload(filepath, input_sha256=digest)
+
+def job_summary(job):
+    # Job row for the API; outputs as names for /download, never as server paths
+    downloads = {kind: download_name(app.config['UPLOAD_FOLDER'], job[f'{kind}_path'])
+                 for kind in ('transcript', 'summary', 'usage') if job[f'{kind}_path']}
+    return {key: value for key, value in job.items() if not key.endswith('_path')} | {'downloads': downloads}
+
+@app.route('/jobs')
+def list_jobs():
+    # Job history, newest first: ?limit=50&offset=0&status=completed
+    store = job_store.get_store()
+    if store is None:
+        return jsonify({'success': False, 'error': 'Job history is not enabled'}), 404
+    status = request.args.get('status')
+    if status and status not in job_store.STATUSES:
+        return jsonify({'success': False, 'error': f'Unknown status: {status}'}), 400
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    return jsonify({'success': True, 'jobs': [job_summary(job) for job in store.list(limit, offset, status)]})
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    store = job_store.get_store()
+    job = store.get(job_id) if store and jobs.valid_job_id(job_id) else None
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return jsonify({'success': True, 'job': job_summary(job)})
+
+@app.route('/search')
+def search_transcripts():
+    # Ranked transcript segments: ?q=budget decision&speaker=Alice&limit=20&offset=0
+    index = search_index.get_index()
+    if index is None:
+        return jsonify({'success': False, 'error': 'Search is not enabled'}), 404
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'No query provided'}), 400
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+
+    started = time.perf_counter()
+    hits = index.search(query, limit=limit, offset=offset, speaker=request.args.get('speaker') or None)
+    results = [{
+        'transcript': download_name(app.config['UPLOAD_FOLDER'], hit['path']),
+        'job_id': hit['job_id'],
+        'segment': hit['position'],
+        'speaker': hit['speaker'],
+        'timestamp': hit['timestamp'],
+        'snippet': hit['snippet'],
+        'score': hit['score'],
+    } for hit in hits]
+    return jsonify({'success': True, 'query': query, 'results': results,
+                    'took_ms': round((time.perf_counter() - started) * 1000, 2)})
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    # Stop a running transcription; also sent by the page when its tab is closed.
+    # Accepted rather than confirmed: the job may run in another worker.
+    if not jobs.cancel(job_id):
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return jsonify({'success': True, 'job_id': job_id}), 202
+
+def upload_error(e):
+    body = {'success': False, 'error': str(e)}
+    if e.offset is not None:
+        body['offset'] = e.offset
+    return jsonify(body), e.status
+
+def upload_folder_path(filename):
+    # Absolute path of a file below UPLOAD_FOLDER, or None when the name points outside it
+    safe_dir = os.path.abspath(app.config['UPLOAD_FOLDER'])
+    path = os.path.abspath(os.path.join(safe_dir, filename))
+    return path if path.startswith(safe_dir + os.sep) else None
+
+def saved_transcript_path(filename):
+    # Path of a transcript the app saved, or None for any other name: these are read whole,
+    # so recordings, partial uploads and session files must never be
+    path = upload_folder_path(filename) if isinstance(filename, str) else None
+    if not path or area_of(app.config['UPLOAD_FOLDER'], path) != 'transcripts':
+        return None
+    if not fnmatch.fnmatch(os.path.basename(path), '*_transcript*.txt') or not os.path.isfile(path):
+        return None
+    return path
+
+def request_transcript(data, key='transcript', speaker_mapping=None):
+    # Transcript text sent by the page, or the saved transcript it names in transcript_file
+    if data.get(key):
+        return data[key]
+    path = saved_transcript_path(data.get('transcript_file'))
+    if not path:
+        return ''
+    with open(path, encoding='utf-8') as f:
+        transcript = f.read()
+    return apply_speaker_mapping(transcript, speaker_mapping) if speaker_mapping else transcript
+
+@app.route('/transcripts/<path:filename>/segments')
+def transcript_segments(filename):
+    # One page of a saved transcript: ?offset=0&limit=200
+    path = saved_transcript_path(filename)
+    if not path:
+        return jsonify({'success': False, 'error': 'Transcript not found'}), 404
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', transcript_pages.PAGE_SIZE, type=int)
+    try:
+        page = transcript_pages.page(path, offset=offset, limit=limit)
+    except (OSError, UnicodeDecodeError) as e:
+        app.logger.error(f"Failed to read transcript {filename}: {e}")
+        return jsonify({'success': False, 'error': 'Transcript could not be read'}), 500
+    janitor.touch(path)
+    return jsonify({'success': True, **page})
+
+@app.route('/apply-speaker-mapping', methods=['POST'])
+def apply_speaker_names():
+    # Rename speakers server-side so display and download share one result
+    data = request.get_json(silent=True) or {}
+    transcript = request_transcript(data)
+    speaker_mapping = data.get('speaker_mapping', {})
+
+    if not transcript:
+        return jsonify({'success': False, 'error': 'No transcript provided'}), 400
+    if not valid_speaker_mapping(speaker_mapping):
+        return jsonify({'success': False, 'error': 'Invalid speaker mapping'}), 400
+
+    return jsonify({
+        'success': True,
+        'transcript': apply_speaker_mapping(transcript, speaker_mapping)
+    })
 
 @app.route('/generate-summary', methods=['POST'])
 def generate_summary():
     # Generate summary from transcript
     try:
         data = request.get_json()
-        transcript = data.get('transcript', '')
+        transcript = request_transcript(data)
         speaker_mapping = data.get('speaker_mapping', {})
         
         if not transcript:
@@ -136,14 +450,16 @@ def generate_summary():
         
         app.logger.info("Generating meeting summary...")
         summary_generator = SummaryGenerator()
-        summary = summary_generator.generate_summary(transcript, speaker_mapping)
+        sections = summary_generator.generate_summary_sections(transcript, speaker_mapping)
+        record_usage(summary_generator.usage, "summary", source=data.get('input_path'))
+        summary = format_summary(sections)
         
         if not summary:
             return jsonify({'success': False, 'error': 'Failed to generate summary'}), 500
             
         # Save summary file
         input_path = data.get('input_path')
-        output_dir = app.config['UPLOAD_FOLDER']
+        output_dir = summary_dir(input_path)
         summary_path = summary_generator.save_summary_to_file(
             summary=summary,
             input_path=input_path,
@@ -151,11 +467,11 @@ def generate_summary():
         )
         
         if summary_path:
-            download_name = os.path.basename(summary_path)
             return jsonify({
                 'success': True, 
                 'summary': summary,
-                'download_filename': download_name
+                'sections': sections,
+                'download_filename': download_name(app.config['UPLOAD_FOLDER'], summary_path)
             })
         else:
             return jsonify({'success': False, 'error': 'Failed to save summary file'}), 500
@@ -169,27 +485,46 @@ def regenerate_summary():
     # Regenerate summary based on feedback
     try:
         data = request.get_json()
-        original_transcript = data.get('original_transcript', '')
+        # Names chosen on the page apply to a transcript read from its file
+        original_transcript = request_transcript(data, 'original_transcript', data.get('speaker_mapping'))
         previous_summary = data.get('previous_summary', '')
         feedback = data.get('feedback', '')
+        section = data.get('section') or None
         
         if not original_transcript or not previous_summary or not feedback:
             return jsonify({'success': False, 'error': 'Missing required information'}), 400
+        if section and section not in SUMMARY_SECTIONS:
+            return jsonify({'success': False, 'error': f'Unknown summary section: {section}'}), 400
+        if not isinstance(previous_summary, str) or (data.get('sections') is not None and not valid_sections(data['sections'])):
+            return jsonify({'success': False, 'error': 'Invalid summary sections'}), 400
         
-        app.logger.info("Regenerating meeting summary based on feedback...")
         summary_generator = SummaryGenerator()
-        new_summary = summary_generator.regenerate_summary(
-            original_transcript=original_transcript,
-            previous_summary=previous_summary,
-            feedback=feedback
-        )
+        if section:
+            # Only the targeted section is regenerated and merged
+            app.logger.info(f"Regenerating summary section '{section}' based on feedback...")
+            sections = summary_generator.regenerate_summary_section(
+                original_transcript=original_transcript,
+                previous_summary=data.get('sections') or previous_summary,
+                feedback=feedback,
+                section=section
+            )
+            new_summary = format_summary(sections)
+        else:
+            app.logger.info("Regenerating meeting summary based on feedback...")
+            new_summary = summary_generator.regenerate_summary(
+                original_transcript=original_transcript,
+                previous_summary=previous_summary,
+                feedback=feedback
+            )
+            sections = parse_summary(new_summary) if new_summary else {}
+        record_usage(summary_generator.usage, "summary", source=data.get('input_path'))
         
         if not new_summary:
             return jsonify({'success': False, 'error': 'Failed to regenerate summary'}), 500
             
         # Save updated summary
         input_path = data.get('input_path')
-        output_dir = app.config['UPLOAD_FOLDER']
+        output_dir = summary_dir(input_path)
         summary_path = summary_generator.save_summary_to_file(
             summary=new_summary,
             input_path=input_path,
@@ -197,11 +532,11 @@ def regenerate_summary():
         )
         
         if summary_path:
-            download_name = os.path.basename(summary_path)
             return jsonify({
                 'success': True, 
                 'summary': new_summary,
-                'download_filename': download_name
+                'sections': sections,
+                'download_filename': download_name(app.config['UPLOAD_FOLDER'], summary_path)
             })
         else:
             return jsonify({'success': False, 'error': 'Failed to save regenerated summary file'}), 500
@@ -210,20 +545,142 @@ def regenerate_summary():
         app.logger.error(f"Error regenerating summary: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/download/<filename>')
+def stream_summary_events(summary_generator, chunks, input_path):
+    # NDJSON events: text chunks as they arrive, then the saved file
+    parts = []
+    try:
+        for text in chunks:
+            parts.append(text)
+            yield json.dumps({'type': 'chunk', 'text': text}) + "\n"
+    except Exception as e:
+        app.logger.error(f"Error streaming summary: {e}")
+        yield json.dumps({'type': 'error', 'error': str(e)}) + "\n"
+        return
+    finally:
+        record_usage(summary_generator.usage, "summary", source=input_path)
+
+    # Same layout and sections as the blocking endpoints return
+    summary, sections = normalize_summary("".join(parts))
+    if not summary:
+        yield json.dumps({'type': 'error', 'error': 'Failed to generate summary'}) + "\n"
+        return
+
+    summary_path = summary_generator.save_summary_to_file(
+        summary=summary,
+        input_path=input_path,
+        output_dir=summary_dir(input_path)
+    )
+    if not summary_path:
+        yield json.dumps({'type': 'error', 'error': 'Failed to save summary file'}) + "\n"
+        return
+
+    yield json.dumps({
+        'type': 'done',
+        'summary': summary,
+        'sections': sections,
+        'download_filename': download_name(app.config['UPLOAD_FOLDER'], summary_path)
+    }) + "\n"
+
+@app.route('/generate-summary/stream', methods=['POST'])
+def generate_summary_stream():
+    # Stream summary text to the client as it is generated
+    data = request.get_json(silent=True) or {}
+    transcript = request_transcript(data)
+    speaker_mapping = data.get('speaker_mapping', {})
+
+    if not transcript:
+        return jsonify({'success': False, 'error': 'No transcript provided'}), 400
+
+    app.logger.info("Streaming meeting summary...")
+    summary_generator = SummaryGenerator()
+    chunks = summary_generator.generate_summary_stream(transcript, speaker_mapping)
+    events = stream_summary_events(summary_generator, chunks, data.get('input_path'))
+    return Response(stream_with_context(events), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+@app.route('/regenerate-summary/stream', methods=['POST'])
+def regenerate_summary_stream():
+    # Stream regenerated summary text to the client
+    data = request.get_json(silent=True) or {}
+    original_transcript = request_transcript(data, 'original_transcript', data.get('speaker_mapping'))
+    previous_summary = data.get('previous_summary', '')
+    feedback = data.get('feedback', '')
+
+    if not original_transcript or not previous_summary or not feedback:
+        return jsonify({'success': False, 'error': 'Missing required information'}), 400
+
+    app.logger.info("Streaming regenerated meeting summary...")
+    summary_generator = SummaryGenerator()
+    chunks = summary_generator.regenerate_summary_stream(
+        original_transcript=original_transcript,
+        previous_summary=previous_summary,
+        feedback=feedback
+    )
+    events = stream_summary_events(summary_generator, chunks, data.get('input_path'))
+    return Response(stream_with_context(events), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+@app.route('/healthz')
+def healthz():
+    # Liveness: the worker answers; no disk or API checks
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    # Readiness: in-flight jobs across workers against capacity
+    status = get_controller().status()
+    if status['ready']:
+        return jsonify(status)
+    return jsonify(status), 503, {'Retry-After': os.getenv('ADMISSION_RETRY_AFTER', '30')}
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus scrape target, aggregated across workers when METRICS_DIR is set
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/profiling', methods=['GET', 'POST'])
+def profiling_admin():
+    # Arm profiling for the next N requests of this worker; requires X-Profile-Token
+    if not profiling.check_token(request.headers):
+        return jsonify({'success': False, 'error': 'Not found'}), 404
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        profiling.arm(data.get('mode', 'all'), data.get('count', 1))
+    return jsonify({'success': True, **profiling.status(), 'recent': profiling.recent_profiles()})
+
+@app.route('/download/<path:filename>')
 def download_file(filename):
-    # Secure file download
-    safe_dir = os.path.abspath(app.config['UPLOAD_FOLDER'])
-    safe_path = os.path.join(safe_dir, filename)
-    if not os.path.abspath(safe_path).startswith(safe_dir):
+    # Secure file download; filename is relative to UPLOAD_FOLDER (a shard path with STORAGE_LAYOUT=sharded)
+    safe_path = upload_folder_path(filename)
+    if not safe_path:
         flash("Invalid path")
         return redirect(url_for('index'))
-
-    try:
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename, as_attachment=True)
-    except FileNotFoundError:
+    if not os.path.isfile(safe_path):
         flash("File not found")
         return redirect(url_for('index'))
 
+    # Text files go out as a cached zstd/gzip copy when the client accepts one. Ranges refer to
+    # the file as stored, so resumed downloads get the original.
+    encoding = None
+    if 'Range' not in request.headers:
+        encoding = compression.negotiate(safe_path, request.accept_encodings)
+    path = safe_path
+    if encoding:
+        try:
+            path = compression.sidecar(safe_path, encoding)
+        except OSError as e:
+            app.logger.warning(f"Serving {filename} uncompressed: {e}")
+            encoding = None
+
+    # send_file answers If-None-Match/If-Modified-Since with 304 and serves Range requests;
+    # each encoding has its own ETag, as the sidecar is a different file
+    response = send_file(path, as_attachment=True, download_name=os.path.basename(safe_path), conditional=True, etag=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if compression.compressible(safe_path):
+        response.vary.add('Accept-Encoding')
+    janitor.touch(safe_path)
+    return response
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
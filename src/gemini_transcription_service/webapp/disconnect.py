@@ -0,0 +1,70 @@
+import os
+import ssl
+import socket
+import select
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Client disconnect detection for long synchronous requests.
+# gunicorn exposes the client socket as environ["gunicorn.socket"]. Once the request body has
+# been read, a socket that turns readable with nothing to read (EOF) belongs to a client that
+# went away, e.g. a closed browser tab. The watcher then cancels the job's CancelToken.
+
+
+def enabled():
+    return os.getenv("CANCEL_ON_DISCONNECT", "true").lower() in ["true", "1", "yes"]
+
+
+def client_socket(environ):
+    sock = environ.get("gunicorn.socket")
+    # TLS terminated by gunicorn: peeking would read encrypted records, so don't watch
+    if sock is None or isinstance(sock, ssl.SSLSocket):
+        return None
+    return sock
+
+
+def disconnected(sock):
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        # Readable with data is a pipelined request; readable at EOF is a closed connection
+        return sock.recv(1, socket.MSG_PEEK) == b""
+    except BlockingIOError:
+        return False
+    except (OSError, ValueError):
+        return True
+
+
+class DisconnectWatcher(threading.Thread):
+    def __init__(self, sock, token, interval=1.0):
+        super().__init__(name="disconnect-watcher", daemon=True)
+        self.sock = sock
+        self.token = token
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            # Checking the token also picks up cancel requests handled by other workers
+            if self.token.cancelled:
+                return
+            if disconnected(self.sock):
+                logger.info("Client disconnected, cancelling its job")
+                self.token.cancel("disconnect")
+                return
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def watch_disconnect(environ, token):
+    # Start a watcher for this request's client; None when it can't be watched
+    sock = client_socket(environ) if enabled() else None
+    if sock is None:
+        return None
+    watcher = DisconnectWatcher(sock, token)
+    watcher.start()
+    return watcher
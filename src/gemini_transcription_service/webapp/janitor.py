@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from dataclasses import dataclass
+
+try:
+    import fcntl
+except ImportError:  # Windows: sweeps from several workers are not serialized
+    fcntl = None
+
+from ..metrics import JANITOR_REMOVED_FILES, JANITOR_REMOVED_BYTES
+from ..search_index import remove_transcript
+from ..compression import remove_sidecars
+from .storage_layout import AREAS, area_of
+
+logger = logging.getLogger(__name__)
+
+# Retention for UPLOAD_FOLDER.
+# Every JANITOR_INTERVAL seconds one worker (whichever gets the lock file) walks the folder and
+# deletes files older than their area's retention (RETENTION_<AREA>_HOURS). It then deletes
+# the least recently used files until usage is back under STORAGE_QUOTA_MB. Downloads refresh a
+# file's access time, so files people still fetch are evicted last. Files modified in the
+# last JANITOR_GRACE_SECONDS may belong to a running job and are never removed.
+
+LOCK_NAME = ".janitor.lock"
+SKIP_DIRS = {".sessions"}
+
+
+@dataclass
+class Entry:
+    path: str
+    area: str
+    size: int
+    modified: float
+    last_used: float
+
+
+def retention(area):
+    # Seconds to keep files of an area, or None to keep them
+    hours = os.getenv(f"RETENTION_{area.upper()}_HOURS")
+    return float(hours) * 3600 if hours else None
+
+
+def quota_bytes():
+    quota = os.getenv("STORAGE_QUOTA_MB")
+    return int(float(quota) * 1024 * 1024) if quota else None
+
+
+def enabled():
+    return quota_bytes() is not None or any(retention(area) is not None for area in AREAS)
+
+
+def touch(path):
+    # Mark a file as used; explicit because relatime/noatime mounts rarely update atime
+    try:
+        os.utime(path, (time.time(), os.stat(path).st_mtime))
+    except OSError:
+        pass
+
+
+def scan(root):
+    # Every managed file under root
+    pending = [root]
+    while pending:
+        try:
+            entries = list(os.scandir(pending.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in SKIP_DIRS and not entry.name.startswith("."):
+                    pending.append(entry.path)
+                continue
+            area = area_of(root, entry.path)
+            if area is None:
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            yield Entry(entry.path, area, stat.st_size, stat.st_mtime, max(stat.st_atime, stat.st_mtime))
+
+
+def _remove(entry, reason):
+    try:
+        os.remove(entry.path)
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logger.warning(f"Failed to remove {entry.path}: {e}")
+        return False
+    remove_sidecars(entry.path)
+    if entry.area == "transcripts" and entry.path.endswith(".txt"):
+        remove_transcript(entry.path)
+    JANITOR_REMOVED_FILES.inc(area=entry.area, reason=reason)
+    JANITOR_REMOVED_BYTES.inc(entry.size, area=entry.area)
+    return True
+
+
+def _prune_dirs(root, grace, now):
+    # Drop shard directories left empty; recent ones may be about to receive a file
+    for area in AREAS:
+        for directory, subdirs, files in os.walk(os.path.join(root, area), topdown=False):
+            if files or subdirs or directory == os.path.join(root, area):
+                continue
+            try:
+                if now - os.stat(directory).st_mtime > grace:
+                    os.rmdir(directory)
+            except OSError:
+                continue
+
+
+def sweep(root, now=None, dry_run=False):
+    # One retention pass; returns {"files", "bytes", "by_area"} or None when another worker is sweeping
+    now = now or time.time()
+    grace = float(os.getenv("JANITOR_GRACE_SECONDS", "3600"))
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, LOCK_NAME), "a") as lock:
+        if fcntl:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+
+        removed = []
+        kept = []
+        for entry in scan(root):
+            ttl = retention(entry.area)
+            if ttl is not None and now - entry.modified > max(ttl, grace):
+                removed.append((entry, "ttl"))
+            else:
+                kept.append(entry)
+
+        quota = quota_bytes()
+        usage = sum(entry.size for entry in kept)
+        if quota is not None and usage > quota:
+            for entry in sorted(kept, key=lambda entry: entry.last_used):
+                if usage <= quota:
+                    break
+                if now - entry.modified <= grace:
+                    continue
+                removed.append((entry, "quota"))
+                usage -= entry.size
+
+        result = {"files": 0, "bytes": 0, "by_area": {}}
+        for entry, reason in removed:
+            if dry_run or _remove(entry, reason):
+                result["files"] += 1
+                result["bytes"] += entry.size
+                result["by_area"][entry.area] = result["by_area"].get(entry.area, 0) + 1
+        if not dry_run:
+            _prune_dirs(root, grace, now)
+        result["usage_bytes"] = usage
+
+    if result["files"]:
+        logger.info(f"Janitor removed {result['files']} files ({result['bytes']} bytes) from {root}")
+    return result
+
+
+_janitor = None
+_janitor_lock = threading.Lock()
+
+
+def _loop(root, interval):
+    while True:
+        try:
+            sweep(root)
+        except Exception as e:
+            logger.error(f"Janitor sweep of {root} failed: {e}")
+        time.sleep(interval)
+
+
+def ensure_started(root):
+    # Start this process's janitor thread once retention is configured
+    global _janitor
+    if not enabled():
+        return
+    with _janitor_lock:
+        # Threads do not survive fork, so check liveness rather than existence
+        if _janitor is None or not _janitor.is_alive():
+            interval = float(os.getenv("JANITOR_INTERVAL", "600"))
+            _janitor = threading.Thread(target=_loop, args=(root, interval), name="storage-janitor", daemon=True)
+            _janitor.start()
+
+
+def main():
+    # python -m src.gemini_transcription_service.webapp.janitor [--dry-run]
+    parser = argparse.ArgumentParser(description="Apply retention and the storage quota to UPLOAD_FOLDER once.")
+    parser.add_argument("--root", default=os.getenv("UPLOAD_FOLDER", "uploads"), help="Folder to clean.")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be removed without removing it.")
+    args = parser.parse_args()
+    print(json.dumps(sweep(args.root, dry_run=args.dry_run), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent writes to one session are not serialized
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Resumable chunked uploads.
+# A session lives in UPLOAD_FOLDER/.sessions/<id>/ as meta.json plus data.part, so any worker
+# can serve any chunk. Chunks are appended in order; each carries its SHA-256 and is rolled
+# back if the bytes on disk do not match. The client can always ask for the current offset
+# and continue from there after a dropped connection.
+
+SESSION_DIR = ".sessions"
+READ_SIZE = 1024 * 1024
+_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+_SHA256 = re.compile(r"^[0-9a-fA-F]{64}$")
+# Writers in this process queue here before taking the flock: under gevent, a greenlet
+# blocking in flock() on a lock held by another greenlet would stall the whole worker
+_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+class UploadError(Exception):
+    # Rejected session request; status is the HTTP status to answer with
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def chunk_size():
+    return int(float(os.getenv("UPLOAD_CHUNK_MB", "8")) * 1024 * 1024)
+
+
+def parse_content_range(header):
+    # "bytes start-end/total" -> (start, end exclusive, total)
+    match = _RANGE.match(header or "")
+    if not match:
+        raise UploadError("Content-Range must be 'bytes start-end/total'")
+    start, last, total = (int(value) for value in match.groups())
+    if last < start or last >= total:
+        raise UploadError(f"Invalid Content-Range: {header}")
+    return start, last + 1, total
+
+
+class UploadSession:
+    def __init__(self, root, upload_id):
+        if not _UPLOAD_ID.match(upload_id or ""):
+            raise UploadError("Unknown upload", status=404)
+        self.id = upload_id
+        self.path = os.path.join(root, SESSION_DIR, upload_id)
+        self.data_path = os.path.join(self.path, "data.part")
+        self.meta_path = os.path.join(self.path, "meta.json")
+        self._meta = None
+
+    @classmethod
+    def create(cls, root, filename, size, sha256=None):
+        if sha256 is not None and not (isinstance(sha256, str) and _SHA256.match(sha256)):
+            raise UploadError("sha256 must be 64 hexadecimal characters")
+        session = cls(root, uuid.uuid4().hex)
+        os.makedirs(session.path)
+        open(session.data_path, "wb").close()
+        session._meta = {"filename": filename, "size": size, "sha256": sha256 and sha256.lower(), "created": time.time()}
+        tmp = f"{session.meta_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(session._meta, f)
+        os.replace(tmp, session.meta_path)
+        logger.info(f"Upload session {session.id} created for {filename} ({size} bytes)")
+        return session
+
+    @property
+    def meta(self):
+        if self._meta is None:
+            try:
+                with open(self.meta_path, encoding="utf-8") as f:
+                    self._meta = json.load(f)
+            except FileNotFoundError:
+                raise UploadError("Unknown upload", status=404)
+        return self._meta
+
+    @property
+    def offset(self):
+        try:
+            return os.path.getsize(self.data_path)
+        except FileNotFoundError:
+            raise UploadError("Unknown upload", status=404)
+
+    def status(self):
+        return {"upload_id": self.id, "filename": self.meta["filename"], "size": self.meta["size"],
+                "offset": self.offset, "chunk_size": chunk_size()}
+
+    @contextmanager
+    def _locked_data(self):
+        # data.part opened for update, held against every other writer of this session.
+        # A session finalized or abandoned while we waited is gone, not just incomplete.
+        with _LOCKS[int(self.id[:8], 16) % len(_LOCKS)]:
+            try:
+                f = open(self.data_path, "r+b")
+            except FileNotFoundError:
+                raise UploadError("Upload is already finished or abandoned", status=409)
+            with f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    current = os.stat(self.data_path)
+                except FileNotFoundError:
+                    current = None
+                if current is None or current.st_ino != os.fstat(f.fileno()).st_ino:
+                    raise UploadError("Upload is already finished or abandoned", status=409)
+                yield f
+
+    def write_chunk(self, stream, start, end, total, sha256=None):
+        # Append bytes [start, end) read from stream; returns the new offset
+        if total != self.meta["size"]:
+            raise UploadError(f"Upload size is {self.meta['size']}, not {total}")
+        if end - start > chunk_size():
+            raise UploadError(f"Chunks are at most {chunk_size()} bytes", status=413)
+
+        with self._locked_data() as f:
+            offset = os.fstat(f.fileno()).st_size
+            if start > offset:
+                raise UploadError(f"Expected a chunk starting at {offset}", status=409, offset=offset)
+            # A chunk sent again after a lost response replaces what followed its start
+            f.truncate(start)
+            f.seek(start)
+
+            digest = hashlib.sha256()
+            remaining = end - start
+            while remaining:
+                data = stream.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                digest.update(data)
+                f.write(data)
+                remaining -= len(data)
+
+            if remaining or (sha256 and digest.hexdigest() != sha256.lower()):
+                f.truncate(start)
+                reason = "incomplete chunk" if remaining else "checksum mismatch"
+                raise UploadError(f"Chunk {start}-{end - 1} rejected: {reason}", status=422, offset=start)
+            f.flush()
+            os.fsync(f.fileno())
+            return end
+
+    def finalize(self, final_path):
+        # Move the complete upload to final_path; returns (size, sha256)
+        meta = self.meta
+        with self._locked_data() as f:
+            size = os.fstat(f.fileno()).st_size
+            if size != meta["size"]:
+                raise UploadError(f"Upload incomplete: {size} of {meta['size']} bytes", status=409, offset=size)
+
+            digest = hashlib.sha256()
+            for block in iter(lambda: f.read(READ_SIZE), b""):
+                digest.update(block)
+            expected = meta.get("sha256")
+            if expected and digest.hexdigest() != expected.lower():
+                raise UploadError("Checksum of the assembled upload does not match", status=422)
+
+            # Still locked, so a writer waiting on this session finds it gone
+            os.replace(self.data_path, final_path)
+        self.delete()
+        logger.info(f"Upload session {self.id} finalized to {final_path}")
+        return size, digest.hexdigest()
+
+    def delete(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def sweep_sessions(root, max_age=None):
+    # Remove sessions abandoned for longer than UPLOAD_SESSION_TTL_HOURS; returns the count
+    max_age = max_age if max_age is not None else float(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24")) * 3600
+    directory = os.path.join(root, SESSION_DIR)
+    removed = 0
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    now = time.time()
+    for entry in entries:
+        try:
+            # The data file changes with every chunk, so its mtime is the last activity
+            data_path = os.path.join(entry.path, "data.part")
+            last_active = os.path.getmtime(data_path) if os.path.exists(data_path) else entry.stat().st_mtime
+        except OSError:
+            continue
+        if now - last_active > max_age:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    if removed:
+        logger.info(f"Removed {removed} abandoned upload sessions")
+    return removed
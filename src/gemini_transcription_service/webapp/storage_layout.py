@@ -0,0 +1,82 @@
+import os
+import re
+import time
+import hashlib
+
+from ..compression import SUFFIXES
+
+# Where the web app keeps files under UPLOAD_FOLDER.
+# STORAGE_LAYOUT=flat (default) keeps audio, transcripts and summaries side by side in
+# UPLOAD_FOLDER. STORAGE_LAYOUT=sharded gives each artifact type its own area, split by day
+# and by the first byte of a hash of the upload's name:
+#   UPLOAD_FOLDER/transcripts/2025/06/01/3f/meeting_<uuid>_transcript.txt
+# so no directory grows past a few hundred entries and whole days can be expired or backed
+# up at once. Files of one job share a shard, as their key is the upload's unique name, and
+# a day: the one the upload was stored under, even when the job finishes after midnight.
+
+AREAS = ("audio", "transcripts", "summaries")
+_DAY = re.compile(r"^\d{4}/\d{2}/\d{2}$")
+
+
+def sharded():
+    return os.getenv("STORAGE_LAYOUT", "flat").lower() == "sharded"
+
+
+def today():
+    return time.strftime("%Y/%m/%d", time.gmtime())
+
+
+def day_of(root, path):
+    # Day (YYYY/MM/DD) a job's files are sharded under: that of path when it is in a sharded
+    # area, e.g. the job's upload, otherwise today
+    if path:
+        parts = os.path.relpath(os.path.abspath(path), os.path.abspath(root)).split(os.sep)
+        if len(parts) == 6 and parts[0] in AREAS and _DAY.match("/".join(parts[1:4])):
+            return "/".join(parts[1:4])
+    return today()
+
+
+def area_dir(root, area, key=None, day=None):
+    # Directory for a new file of the given area, created if needed; day is the job's
+    # (day_of), today when not given
+    if area not in AREAS:
+        raise ValueError(f"Unknown storage area: {area}")
+    if not sharded():
+        return root
+    shard = hashlib.sha1(os.path.basename(key or "").encode("utf-8")).hexdigest()[:2] if key else "00"
+    directory = os.path.join(root, area, *(day or today()).split("/"), shard)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def area_of(root, path):
+    # Area holding an existing file, or None for files the web app doesn't manage
+    relative = os.path.relpath(path, root)
+    top = relative.split(os.sep, 1)[0]
+    if top in AREAS and top != relative:
+        return top
+    name = os.path.basename(path)
+    if name.startswith(".") or os.sep in relative:
+        # Partial uploads, temporary files, upload sessions, ...
+        return None
+    # Compressed download copies belong with their original
+    for suffix in SUFFIXES.values():
+        name = name.removesuffix(suffix)
+    # Flat layout: tell types apart by name
+    if "_transcript" in name and name.endswith((".txt", ".usage.json")):
+        return "transcripts"
+    if "_summary" in name and name.endswith(".txt"):
+        return "summaries"
+    if name.startswith("meeting_summary_") and name.endswith(".txt"):
+        return "summaries"
+    if os.path.splitext(name)[1].lower() in (".wav", ".mp3", ".m4a", ".flac"):
+        return "audio"
+    return None
+
+
+def download_name(root, path):
+    # Name of a file for /download/<path:filename>; just the file name outside root, as before
+    relative = os.path.relpath(os.path.abspath(path), os.path.abspath(root))
+    if relative.startswith(os.pardir + os.sep):
+        return os.path.basename(path)
+    return relative.replace(os.sep, "/")
@@ -0,0 +1,65 @@
+import os
+import threading
+from collections import Counter, OrderedDict
+
+from ..transcript_processor import parse_transcript
+
+# Transcripts served a page of segments at a time.
+# The result page no longer embeds the transcript; its viewer asks for the segments it is about
+# to show. Parsed transcripts are cached per file and keyed by modification time and size,
+# so scrolling through an 8-hour meeting parses its file once.
+
+PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+CACHE_SIZE = 16
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def load(path, text=None):
+    # {"segments", "speakers"} of a saved transcript; raises OSError when it can't be read.
+    # text is the transcript's content when the caller has it, which saves reading the file.
+    try:
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        if text is None:
+            raise
+        key = None
+    with _cache_lock:
+        cached = _cache.get(path)
+        if key and cached and cached[0] == key:
+            _cache.move_to_end(path)
+            return cached[1]
+
+    if text is None:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    segments = parse_transcript(text)
+    transcript = {
+        "segments": segments,
+        "speakers": dict(Counter(segment["speaker"] for segment in segments if segment["speaker"])),
+    }
+    if key is None:
+        return transcript
+    with _cache_lock:
+        _cache[path] = (key, transcript)
+        _cache.move_to_end(path)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return transcript
+
+
+def page(path, offset=0, limit=PAGE_SIZE, text=None):
+    # Segments offset..offset+limit with their positions, the segment count and speaker counts
+    transcript = load(path, text)
+    segments = transcript["segments"]
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    offset = max(offset, 0)
+    return {
+        "total": len(segments),
+        "offset": offset,
+        "segments": [dict(segment, index=index) for index, segment in enumerate(segments[offset:offset + limit], offset)],
+        "speakers": transcript["speakers"],
+    }
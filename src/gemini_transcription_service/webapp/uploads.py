@@ -0,0 +1,122 @@
+import os
+import uuid
+import hashlib
+import logging
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+
+logger = logging.getLogger(__name__)
+
+# Streaming uploads.
+# Werkzeug normally spools file parts to a temp file that /upload then copies into
+# UPLOAD_FOLDER. StreamingRequest hands the multipart parser a file that already lives in
+# UPLOAD_FOLDER instead, hashing and counting bytes as they arrive and failing with 413 as
+# soon as the size cap is crossed. Keeping the upload is then a rename, not a copy.
+# The app may also attach a tee (UPLOAD_TEE_FACTORY) that receives every block as it is
+# written, to forward the upload elsewhere while it arrives.
+
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def max_upload_bytes():
+    # Gemini's Files API takes at most 2 GB per file
+    return int(float(os.getenv("MAX_UPLOAD_SIZE_MB", "2048")) * 1024 * 1024)
+
+
+class HashingFile:
+    # Readable/writable upload file that tracks its size and SHA-256 while being written
+    def __init__(self, directory, limit=None, tee=None):
+        self.tee = tee
+        self.path = os.path.join(directory, f".upload-{uuid.uuid4().hex}.part")
+        self.limit = limit
+        self.size = 0
+        self.committed = False
+        self._hash = hashlib.sha256()
+        self._file = open(self.path, "w+b", buffering=WRITE_BUFFER_SIZE)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.limit is not None and self.size > self.limit:
+            raise RequestEntityTooLarge(f"Upload exceeds {self.limit} bytes")
+        self._hash.update(data)
+        written = self._file.write(data)
+        if self.tee:
+            self.tee.write(data)
+        return written
+
+    def __getattr__(self, name):
+        # read, readline, seek, tell, flush, ... go to the underlying file
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def commit(self, final_path):
+        # Move the finished upload to its final name; same directory, so no copy
+        self._file.close()
+        os.replace(self.path, final_path)
+        self.path = final_path
+        self.committed = True
+        return final_path
+
+    def discard(self):
+        if self.tee:
+            self.tee.abort()
+        if not self._file.closed:
+            self._file.close()
+        if not self.committed and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class StreamingRequest(Request):
+    @property
+    def upload_streams(self):
+        if "_upload_streams" not in self.__dict__:
+            self.__dict__["_upload_streams"] = []
+        return self.__dict__["_upload_streams"]
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        factory = current_app.config.get("UPLOAD_TEE_FACTORY")
+        tee = factory(filename, content_type) if factory else None
+        stream = HashingFile(current_app.config["UPLOAD_FOLDER"], limit=current_app.config.get("MAX_UPLOAD_BYTES"), tee=tee)
+        self.upload_streams.append(stream)
+        return stream
+
+    def discard_uploads(self):
+        # Remove file parts the view did not keep (rejected, failed or aborted uploads)
+        for stream in self.__dict__.pop("_upload_streams", []):
+            try:
+                stream.discard()
+            except OSError as e:
+                logger.error(f"Failed to remove partial upload {stream.path}: {e}")
+
+
+def save_upload(file, path):
+    # Keep an uploaded FileStorage at path; returns (size, sha256)
+    stream = file.stream
+    if isinstance(stream, HashingFile):
+        stream.commit(path)
+        return stream.size, stream.sha256
+
+    # Not streamed (e.g. a request built outside StreamingRequest): copy and hash
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "wb") as f:
+        for chunk in iter(lambda: stream.read(WRITE_BUFFER_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+            f.write(chunk)
+    return size, digest.hexdigest()
+
+
+def finish_tee(file):
+    # Results of a tee attached to an upload ({target: result}); empty when none was
+    stream = file.stream
+    if isinstance(stream, HashingFile) and stream.tee:
+        return stream.tee.finish()
+    return {}